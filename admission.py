@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+import metrics
+
+
+UPSTREAM_BUDGET = int(os.getenv("ADMISSION_UPSTREAM", 8))       # concurrent LLM calls
+QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE", 32))              # requests waiting for one
+QUEUE_SLO_MS = float(os.getenv("ADMISSION_QUEUE_SLO_MS", 2000))  # longest acceptable wait
+
+IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", 120))  # campus NAT: many users
+IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", 30))
+SESSION_PER_MINUTE = float(os.getenv("RATE_LIMIT_SESSION_PER_MINUTE", 20))
+SESSION_BURST = int(os.getenv("RATE_LIMIT_SESSION_BURST", 10))
+MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", 100000))   # buckets kept per kind
+TRUST_PROXY = os.getenv("TRUST_PROXY", "0") == "1"               # use X-Forwarded-For
+
+
+class Overloaded(Exception):
+    """No upstream slot within the queue SLO; answer without the LLM."""
+
+
+# ----------------- RATE LIMITING -----------------
+
+class TokenBuckets:
+    """One token bucket per key, refilled at ``per_minute``.
+
+    Buckets live in an LRU map capped at ``max_keys``; an evicted client
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, per_minute, burst, max_keys=MAX_CLIENTS):
+        self.rate = per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """0.0 if a token was taken, else seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Per-IP and per-session token buckets.
+
+    IP limits are looser than session limits because a campus network
+    puts many students behind one address.
+    """
+
+    def __init__(self, ip_per_minute=IP_PER_MINUTE, ip_burst=IP_BURST,
+                 session_per_minute=SESSION_PER_MINUTE, session_burst=SESSION_BURST,
+                 trust_proxy=TRUST_PROXY):
+        self.ips = TokenBuckets(ip_per_minute, ip_burst)
+        self.sessions = TokenBuckets(session_per_minute, session_burst)
+        self.trust_proxy = trust_proxy
+        self.stats = {"limited_ip": 0, "limited_session": 0}
+        self._lock = threading.Lock()
+
+    def client_ip(self, req):
+        if self.trust_proxy:
+            forwarded = req.headers.get("X-Forwarded-For", "")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return req.remote_addr or "unknown"
+
+    def check(self, req, sid):
+        """0.0 if the request may proceed, else the Retry-After seconds."""
+        wait = self.ips.take(self.client_ip(req))
+        kind = "limited_ip"
+        if not wait:
+            wait = self.sessions.take(sid)
+            kind = "limited_session"
+        if wait:
+            with self._lock:
+                self.stats[kind] += 1
+        return wait
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, ips=len(self.ips), sessions=len(self.sessions))
+
+
+# ----------------- UPSTREAM BUDGET (THREADED) -----------------
+
+class Admission:
+    """At most ``budget`` upstream LLM calls at once.
+
+    Up to ``queue_size`` requests wait for a slot; more are shed at once.
+    A request still waiting after ``slo_ms`` is shed too, so a spike
+    turns into fast degraded answers instead of a queue of timeouts.
+    Time spent waiting is recorded as the "queue" stage.
+    """
+
+    def __init__(self, budget=UPSTREAM_BUDGET, queue_size=QUEUE_SIZE, slo_ms=QUEUE_SLO_MS):
+        self.budget = budget
+        self.queue_size = queue_size
+        self.slo = slo_ms / 1000.0
+        self._slots = threading.Semaphore(budget)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "shed_queue_full": 0, "shed_slo": 0,
+                      "degraded": 0, "rejected": 0}
+
+    def enter(self):
+        """Take an upstream slot or raise Overloaded."""
+        with self._lock:
+            if self.waiting >= self.queue_size:
+                self.stats["shed_queue_full"] += 1
+                raise Overloaded("queue full")
+            self.waiting += 1
+
+        start = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.slo)
+        metrics.observe_stage("queue", time.monotonic() - start)
+
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.stats["shed_slo"] += 1
+                raise Overloaded("queue wait over SLO")
+            self.stats["admitted"] += 1
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def count(self, key):
+        """Record how a shed request was answered: degraded or rejected."""
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, waiting=self.waiting, in_flight=self.in_flight,
+                        budget=self.budget, queue_size=self.queue_size,
+                        slo_ms=self.slo * 1000.0)
+
+
+# ----------------- UPSTREAM BUDGET (ASYNCIO) -----------------
+
+class AsyncAdmission(Admission):
+    """asyncio flavour of :class:`Admission`; one per event loop."""
+
+    def __init__(self, budget=UPSTREAM_BUDGET, queue_size=QUEUE_SIZE, slo_ms=QUEUE_SLO_MS):
+        super().__init__(budget, queue_size, slo_ms)
+        self._slots = asyncio.Semaphore(budget)
+
+    async def enter(self):
+        with self._lock:
+            if self.waiting >= self.queue_size:
+                self.stats["shed_queue_full"] += 1
+                raise Overloaded("queue full")
+            self.waiting += 1
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.slo)
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        except asyncio.CancelledError:  # client went away while queued
+            with self._lock:
+                self.waiting -= 1
+            raise
+        metrics.observe_stage("queue", time.monotonic() - start)
+
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.stats["shed_slo"] += 1
+                raise Overloaded("queue wait over SLO")
+            self.stats["admitted"] += 1
+            self.in_flight += 1
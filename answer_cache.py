@@ -0,0 +1,317 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+import metrics
+
+
+TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL", 6 * 60 * 60))
+MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+NEAR_CUTOFF = float(os.getenv("ANSWER_CACHE_NEAR_CUTOFF", 0.9))
+# The TF-IDF vocabulary is only as rich as the FAQ questions, so two
+# different questions over the same context can have near-identical
+# vectors. A near hit also needs this many shared content words and this
+# much overlap (Jaccard) between the two queries' content words.
+NEAR_MIN_TERMS = int(os.getenv("ANSWER_CACHE_NEAR_MIN_TERMS", 2))
+NEAR_TERM_OVERLAP = float(os.getenv("ANSWER_CACHE_NEAR_TERM_OVERLAP", 0.6))
+DB_PATH = os.getenv("ANSWER_CACHE_DB", "")  # empty → memory only
+
+ENTRY_OVERHEAD = 256  # rough per-entry bookkeeping cost in bytes
+
+
+# ----------------- KEYS -----------------
+
+def normalize_query(text):
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def content_terms(norm_query):
+    """Non-stop-words of a normalized query, with plurals folded."""
+    return frozenset(
+        w[:-1] if len(w) > 3 and w.endswith("s") else w
+        for w in norm_query.split() if w not in ENGLISH_STOP_WORDS
+    )
+
+
+def same_terms(terms, other, min_terms=NEAR_MIN_TERMS, overlap=NEAR_TERM_OVERLAP):
+    """True if two content-word sets share at least ``min_terms`` words
+    and their Jaccard overlap reaches ``overlap``."""
+    shared = len(terms & other)
+    if shared < min_terms:
+        return False
+    return shared / len(terms | other) >= overlap
+
+
+def context_key(retrieved):
+    """Identify the retrieved context by index version + FAQ id."""
+    ids = ",".join(f"{x.get('version', '')}:{x.get('id', x['question'])}" for x in retrieved)
+    return hashlib.sha1(ids.encode("utf-8")).hexdigest()
+
+
+def exact_key(norm_query, ctx_key):
+    return hashlib.sha1(f"{norm_query}|{ctx_key}".encode("utf-8")).hexdigest()
+
+
+# ----------------- ENTRY -----------------
+
+class _Entry:
+    __slots__ = ("key", "ctx_key", "query", "answer", "vector", "terms",
+                 "created", "cost", "size")
+
+    def __init__(self, key, ctx_key, query, answer, vector, created, cost):
+        self.key = key
+        self.ctx_key = ctx_key
+        self.query = query
+        self.answer = answer
+        self.vector = vector
+        self.terms = content_terms(query)
+        self.created = created
+        self.cost = cost
+        self.size = len(query.encode("utf-8")) + len(answer.encode("utf-8")) + ENTRY_OVERHEAD
+        if vector is not None:
+            self.size += vector.data.nbytes + vector.indices.nbytes
+
+
+# ----------------- CACHE -----------------
+
+class AnswerCache:
+    """Two-tier LLM answer cache.
+
+    Exact tier: normalized query + retrieved-context key. Near tier: a
+    query whose TF-IDF vector has cosine >= ``near_cutoff`` with a cached
+    query over the same context, and that shares at least
+    ``near_min_terms`` content words with it (``near_term_overlap``
+    Jaccard). LRU eviction under a byte budget, TTL
+    on every entry, optional write-through sqlite store so entries
+    survive restarts and are shared between workers.
+    """
+
+    def __init__(self, vectorize=None, ttl=TTL_SECONDS, max_bytes=MAX_BYTES,
+                 near_cutoff=NEAR_CUTOFF, near_min_terms=NEAR_MIN_TERMS,
+                 near_term_overlap=NEAR_TERM_OVERLAP, db_path=DB_PATH):
+        self.vectorize = vectorize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.near_cutoff = near_cutoff
+        self.near_min_terms = near_min_terms
+        self.near_term_overlap = near_term_overlap
+
+        self._entries = OrderedDict()
+        self._by_context = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "hits_exact": 0,
+            "hits_near": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "saved_seconds": 0.0,
+        }
+
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    # ---- public API ----
+
+    def keys(self, query, retrieved):
+        """Return the (normalized query, context key, exact key) triple."""
+        norm = normalize_query(query)
+        ctx = context_key(retrieved)
+        return norm, ctx, exact_key(norm, ctx)
+
+    def get_or_compute(self, query, retrieved, compute):
+        """Return a cached answer or call ``compute()`` and store it."""
+        norm, ctx, key = self.keys(query, retrieved)
+
+        answer = self.get(norm, ctx, key)
+        if answer is not None:
+            return answer
+
+        start = time.monotonic()
+        answer = compute()
+        self.put(norm, ctx, key, answer, cost=time.monotonic() - start)
+        return answer
+
+    def get(self, norm, ctx, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(entry)
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._hit("hits_exact", entry)
+                return entry.answer
+
+        entry = self._load_from_db(key, now)
+        if entry is not None:
+            with self._lock:
+                self._insert(entry)
+                self._hit("hits_disk", entry)
+            return entry.answer
+
+        vector = self._vector(norm)
+        if vector is not None:
+            with self._lock:
+                entry = self._nearest(ctx, vector, content_terms(norm), now)
+                if entry is not None:
+                    self._entries.move_to_end(entry.key)
+                    self._hit("hits_near", entry)
+                    return entry.answer
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, norm, ctx, key, answer, cost=0.0):
+        if not answer:
+            return
+        entry = _Entry(key, ctx, norm, answer, self._vector(norm), time.time(), cost)
+        with self._lock:
+            self._insert(entry)
+        self._save_to_db(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits_exact"] + stats["hits_near"] + stats["hits_disk"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    # ---- internals (call with lock held) ----
+
+    def _hit(self, counter, entry):
+        self.stats[counter] += 1
+        self.stats["saved_seconds"] += entry.cost
+
+    def _expired(self, entry, now):
+        return now - entry.created > self.ttl
+
+    def _insert(self, entry):
+        old = self._entries.get(entry.key)
+        if old is not None:
+            self._remove(old)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[entry.key] = entry
+        self._by_context.setdefault(entry.ctx_key, {})[entry.key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            _, oldest = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, entry):
+        self._entries.pop(entry.key, None)
+        siblings = self._by_context.get(entry.ctx_key)
+        if siblings is not None:
+            siblings.pop(entry.key, None)
+            if not siblings:
+                del self._by_context[entry.ctx_key]
+        self._bytes -= entry.size
+
+    def _nearest(self, ctx, vector, terms, now):
+        best, best_score = None, self.near_cutoff
+        for entry in list(self._by_context.get(ctx, {}).values()):
+            if self._expired(entry, now):
+                self._remove(entry)
+                self.stats["expired"] += 1
+                continue
+            if entry.vector is None:
+                continue
+            if not same_terms(terms, entry.terms, self.near_min_terms, self.near_term_overlap):
+                continue
+            score = vector.multiply(entry.vector).sum()
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _vector(self, norm):
+        if self.vectorize is None or not self.near_cutoff or self.near_cutoff > 1:
+            return None
+        vec = self.vectorize([norm])
+        return vec if vec.nnz else None
+
+    # ---- sqlite store ----
+
+    def _open_db(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, ctx_key TEXT, query TEXT, answer TEXT,"
+            " created REAL, cost REAL)"
+        )
+        self._db_lock = threading.Lock()
+        self._warm_from_db()
+
+    def _warm_from_db(self):
+        """Load the freshest persisted entries so the near tier works after a restart."""
+        cutoff = time.time() - self.ttl
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT key, ctx_key, query, answer, created, cost FROM answers"
+                " WHERE created >= ? ORDER BY created DESC", (cutoff,)
+            ).fetchall()
+            self._db.execute("DELETE FROM answers WHERE created < ?", (cutoff,))
+
+        loaded = 0
+        for key, ctx, query, answer, created, cost in reversed(rows):
+            entry = _Entry(key, ctx, query, answer, self._vector(query), created, cost)
+            with self._lock:
+                self._insert(entry)
+            loaded += 1
+        return loaded
+
+    def _load_from_db(self, key, now):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT ctx_key, query, answer, created, cost FROM answers WHERE key = ?",
+                (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        ctx, query, answer, created, cost = row
+        if now - created > self.ttl:
+            return None
+        return _Entry(key, ctx, query, answer, self._vector(query), created, cost)
+
+    def _save_to_db(self, entry):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry.key, entry.ctx_key, entry.query, entry.answer,
+                     entry.created, entry.cost),
+                )
+        except sqlite3.Error as e:
+            metrics.record_error("answer_cache_db", e)
@@ -1,14 +1,24 @@
 import os
 import json
-import datetime
+import math
+import time
 
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, got_request_exception
 from groq import Groq
 
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import context_packer
+import metrics
+from admission import Admission, Overloaded, RateLimiter
+from answer_cache import AnswerCache
+from chat_logger import ChatLogger, migrate_json_log
+from index_manager import IndexManager
+from precomputed_answers import PrecomputedAnswers
+from retriever import ranking, search
+from retriever.facts import FactStore, load_fact_tables
+from retriever.intents import FAQ_SOURCES, IntentRouter, load_intent_model
+from session_store import COOKIE_NAME, SessionStore, new_session_id
+from single_flight import SingleFlight
 
 
 # ----------------- ENV & CLIENT -----------------
@@ -34,67 +44,172 @@ DATA_PATH = os.path.join("data", "faqs_final.json")
 if not os.path.exists(DATA_PATH):
     raise FileNotFoundError("faqs_final.json missing")
 
-FAQ_DATA = json.load(open(DATA_PATH, "r", encoding="utf-8"))
+# The index is built offline by `python -m retriever.build_index` and
+# memory-mapped so all workers share one copy. INDEX_MANAGER.current is an
+# immutable snapshot; a changed faqs_final.json (or POST /admin/reload)
+# builds a new one in the background and swaps the reference.
+# Comma-separated first-stage retrievers: tfidf (default), bm25, dense.
+# Several are run in parallel and fused; "hybrid" means tfidf,dense.
+# dense needs EMBEDDING_MODEL_PATH (see retriever/dense.py).
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "tfidf")
+RETRIEVERS = [
+    name.strip()
+    for name in RETRIEVER_BACKEND.replace("hybrid", "tfidf,dense").split(",")
+    if name.strip()
+]
+
+INDEX_MANAGER = IndexManager(
+    DATA_PATH, dense="dense" in RETRIEVERS, bm25="bm25" in RETRIEVERS
+).start_watching()
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Raw scores at which each retriever's calibrated confidence is 0.5.
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.25))
+DENSE_SIMILARITY_THRESHOLD = float(os.getenv("DENSE_SIMILARITY_THRESHOLD", 0.5))
+BM25_SIMILARITY_THRESHOLD = float(os.getenv("BM25_SIMILARITY_THRESHOLD", 4.0))
+
+# Grounding decision on calibrated confidence; with a single TF-IDF
+# retriever 0.5 is exactly the old `score >= SIMILARITY_THRESHOLD` rule.
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
+
+# Output cap per reply; the prompt side is bounded by PROMPT_TOKEN_BUDGET
+# (see context_packer.py).
+MAX_OUTPUT_TOKENS = int(os.getenv("MAX_OUTPUT_TOKENS", 500))
+
+RERANKER_MODEL_PATH = os.getenv("RERANKER_MODEL_PATH")
+RERANKER = ranking.CrossEncoderReranker(RERANKER_MODEL_PATH) if RERANKER_MODEL_PATH else None
 
-QUESTIONS = [x["question"] for x in FAQ_DATA]
-ANSWERS = [x["answer"] for x in FAQ_DATA]
 
-VECTORIZER = TfidfVectorizer(stop_words="english")
-QUESTION_VECTORS = VECTORIZER.fit_transform(QUESTIONS)
+# ----------------- RETRIEVAL -----------------
 
-SIMILARITY_THRESHOLD = 0.25
+def retrieve_relevant_answers(user_query, top_k=3):
+    return retrieve_many([user_query], top_k)[0]
 
 
-# ----------------- RETRIEVAL -----------------
+def timed_search(name, fn):
+    def run(queries, k):
+        with metrics.stage(f"retrieve_{name}"):
+            return fn(queries, k)
+    return run
 
-def retrieve_relevant_answers(user_query, top_k=3):
-    if not user_query.strip():
-        return []
-
-    user_vec = VECTORIZER.transform([user_query])
-    sims = cosine_similarity(user_vec, QUESTION_VECTORS)[0]
-
-    top_indices = sims.argsort()[::-1][:top_k]
-
-    results = []
-    for idx in top_indices:
-        score = float(sims[idx])
-        if score > 0:
-            results.append({
-                "question": QUESTIONS[idx],
-                "answer": ANSWERS[idx],
-                "score": score
-            })
+
+def tfidf_search(index, queries, k):
+    timings = {}
+    results = search.retrieve_many(index, queries, k, timings=timings)
+    for name, seconds in timings.items():
+        metrics.observe_stage(f"tfidf_{name}", seconds)
+    return results
+
+
+def snapshot_retrievers(snapshot):
+    retrievers = {}
+    if snapshot.dense is not None:
+        retrievers["dense"] = ranking.Retriever(
+            "dense", timed_search("dense", snapshot.dense.search_many),
+            DENSE_SIMILARITY_THRESHOLD
+        )
+    if snapshot.bm25 is not None:
+        # BM25 scores are unbounded, so the calibration curve is flatter.
+        retrievers["bm25"] = ranking.Retriever(
+            "bm25", timed_search("bm25", snapshot.bm25.search_many),
+            BM25_SIMILARITY_THRESHOLD, slope=1.0
+        )
+    if "tfidf" in RETRIEVERS or not retrievers:
+        retrievers["tfidf"] = ranking.Retriever(
+            "tfidf",
+            lambda queries, k: tfidf_search(snapshot.tfidf, queries, k),
+            SIMILARITY_THRESHOLD,
+        )
+    return retrievers
+
+
+def retrieve_many(queries, top_k=3):
+    """Batched retrieval: retrievers in parallel → fusion → optional rerank."""
+    snapshot = INDEX_MANAGER.current
+    with metrics.stage("retrieve"):
+        results = ranking.rank_many(
+            queries, snapshot_retrievers(snapshot), top_k, reranker=RERANKER
+        )
+    for ranked in results:
+        metrics.CONFIDENCE.observe(ranked[0]["confidence"] if ranked else 0.0)
     return results
 
 
 # ----------------- GROQ (LLM CALL) -----------------
 
+def count_tokens(usage, messages, reply):
+    """Upstream token counters: reported usage if any, else local counts."""
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if prompt is None:
+        prompt = context_packer.TOKENIZER.count_messages(messages)
+    if completion is None:
+        completion = context_packer.TOKENIZER.count(reply)
+    metrics.LLM_TOKENS.inc(prompt, kind="prompt")
+    metrics.LLM_TOKENS.inc(completion, kind="completion")
+
+
 def groq_chat(messages):
     """Return Llama output text."""
-    completion = client.chat.completions.create(
+    with metrics.stage("llm"):
+        completion = client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=MAX_OUTPUT_TOKENS
+        )
+    reply = completion.choices[0].message.content  # FIXED!
+    count_tokens(getattr(completion, "usage", None), messages, reply or "")
+    return reply
+
+
+def groq_chat_stream(messages):
+    """Yield Llama output text deltas as they are generated.
+
+    Closing the generator closes the upstream HTTP response, which
+    cancels the generation on Groq's side.
+    """
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
         model="llama-3.1-8b-instant",
         messages=messages,
         temperature=0.7,
-        max_tokens=500
+        max_tokens=MAX_OUTPUT_TOKENS,
+        stream=True
     )
-    return completion.choices[0].message.content  # FIXED!
+    parts = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    metrics.observe_stage("llm_first_token", time.perf_counter() - start)
+                parts.append(delta)
+                yield delta
+    finally:
+        stream.close()
+        metrics.observe_stage("llm", time.perf_counter() - start)
+        count_tokens(None, messages, "".join(parts))
 
 
 # ----------------- GMU ANSWER WITH CONTEXT -----------------
 
-def answer_with_context(user_query, retrieved):
-    context = "\n\n".join(
-        [f"Q: {x['question']}\nA: {x['answer']}" for x in retrieved]
-    )
+def context_messages(user_query, retrieved, stats=None):
+    """Grounded prompt whose total size stays within PROMPT_TOKEN_BUDGET.
 
+    ``stats``, if given, is filled with the packing result including
+    ``prompt_tokens``.
+    """
     system_message = (
         "You are a friendly but professional human-like assistant with humurous touch of comedy for GM University (GMU). "
         "Use ONLY the provided context for GMU-specific facts. "
         "Keep the tone natural and smooth,make sure you keep the talk humurous(use emojis) ."
     )
 
-    user_prompt = f"""
+    def build(context):
+        user_prompt = f"""
 User question:
 {user_query}
 
@@ -103,16 +218,29 @@ GMU Context:
 
 Answer naturally and clearly using only this information.
 """
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": user_prompt},
+        ]
 
-    return groq_chat([
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_prompt},
-    ])
+    tokenizer = context_packer.TOKENIZER
+    budget = context_packer.PROMPT_TOKEN_BUDGET - tokenizer.count_messages(build(""))
+    context, packed = context_packer.pack_context(user_query, retrieved, budget)
+    messages = build(context)
+
+    packed = context_packer.record(packed, tokenizer.count_messages(messages))
+    if stats is not None:
+        stats.update(packed)
+    return messages
+
+
+def answer_with_context(user_query, retrieved, stats=None):
+    return groq_chat(context_messages(user_query, retrieved, stats))
 
 
 # ----------------- GENERAL ANSWER WHEN NO CONTEXT -----------------
 
-def answer_without_context(user_query):
+def general_messages(user_query, stats=None):
     system_message = (
         "You are a helpful, friendly, professional GM University (GMU) assistant. "
         "If the question requires exact GMU facts you don’t know, give a general explanation "
@@ -120,42 +248,200 @@ def answer_without_context(user_query):
         "Always speak in a natural, human-like tone , make sure you keep it humurous of comedy use emojis  ."
     )
 
-    return groq_chat([
+    messages = [
         {"role": "system", "content": system_message},
         {"role": "user", "content": user_query},
-    ])
+    ]
+    if stats is not None:
+        stats["prompt_tokens"] = context_packer.TOKENIZER.count_messages(messages)
+    return messages
+
+
+def answer_without_context(user_query, stats=None):
+    return groq_chat(general_messages(user_query, stats))
 
 
 # ----------------- HYBRID LOGIC -----------------
 
-def generate_hybrid_response(user_query, retrieved):
-    if retrieved and retrieved[0]["score"] >= SIMILARITY_THRESHOLD:
-        return answer_with_context(user_query, retrieved)
+def use_context(retrieved):
+    return bool(retrieved) and retrieved[0]["confidence"] >= CONFIDENCE_THRESHOLD
 
-    return answer_without_context(user_query)
 
+def hybrid_messages(user_query, retrieved, stats=None):
+    with metrics.stage("prompt"):
+        if use_context(retrieved):
+            metrics.ANSWERS.inc(mode="context")
+            return context_messages(user_query, retrieved, stats)
 
-# ----------------- LOGGING -----------------
+        metrics.ANSWERS.inc(mode="general")
+        return general_messages(user_query, stats)
+
+
+def generate_hybrid_response(user_query, retrieved, stats=None):
+    return groq_chat(hybrid_messages(user_query, retrieved, stats))
+
+
+# ----------------- PRECOMPUTED ANSWERS -----------------
+
+# Canonical FAQ answers generated offline (`python precomputed_answers.py`).
+# A query that closely matches an FAQ question skips the LLM entirely.
+PRECOMPUTED = PrecomputedAnswers()
+
+
+def precomputed_response(user_query, retrieved):
+    with metrics.stage("precomputed"):
+        reply = PRECOMPUTED.match(user_query, retrieved, INDEX_MANAGER.current)
+    if reply is not None:
+        metrics.ANSWERS.inc(mode="precomputed")
+    return reply
+
+
+# ----------------- INTENT ROUTER -----------------
+
+# Greetings, thanks, contact-info and out-of-scope messages are answered
+# from templates or precomputed FAQ answers before retrieval. The model
+# is built by the pipeline's `intent` stage (retriever/intents.py).
+INTENT_ROUTER = IntentRouter(load_intent_model())
+
+
+def intent_response(message):
+    """(intent, reply) for a message answered locally, else (None, None)."""
+    with metrics.stage("intent"):
+        intent = INTENT_ROUTER.classify(message)
+        if intent is None:
+            return None, None
+        reply = INTENT_ROUTER.reply(intent)
+        if reply is None and intent in FAQ_SOURCES:
+            reply = PRECOMPUTED.for_source(FAQ_SOURCES[intent], INDEX_MANAGER.current)
+    if reply is None:
+        INTENT_ROUTER.fallthrough()
+        return None, None
+    metrics.ANSWERS.inc(mode="intent")
+    return intent, reply
+
+
+# ----------------- FACT STORE -----------------
 
-def log_chat(user, bot):
-    os.makedirs("logs", exist_ok=True)
-    path = "logs/chat_logs.json"
+# "List all PG engineering programs", "is there an M.Tech in deep
+# learning?": answered by lookups in the program / supervisor tables the
+# pipeline's `facts` stage builds (retriever/facts.py), without retrieval
+# or the LLM. Follow-ups ("and PG?") are answered via the rewritten query.
+FACTS = FactStore(load_fact_tables())
 
-    entry = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "user": user,
-        "bot": bot
-    }
 
-    logs = []
-    if os.path.exists(path):
+def facts_response(message, query):
+    """(table, reply) for a list/entity question, else (None, None)."""
+    with metrics.stage("facts"):
+        table, reply = FACTS.answer(message, query)
+    if reply is not None:
+        metrics.ANSWERS.inc(mode="facts")
+    return table, reply
+
+
+# ----------------- ANSWER CACHE -----------------
+
+ANSWER_CACHE = AnswerCache(vectorize=lambda texts: INDEX_MANAGER.current.transform(texts))
+IN_FLIGHT = SingleFlight()
+
+
+def cached_hybrid_response(user_query, retrieved, stats=None):
+    """generate_hybrid_response behind precomputed answers and the
+    answer cache.
+
+    On a miss, identical questions already in flight wait for the
+    leader's answer instead of making their own LLM call. ``stats`` only
+    gets prompt details when this call actually built a prompt. Raises
+    Overloaded when no upstream slot frees up within the queue SLO.
+    """
+    reply = precomputed_response(user_query, retrieved)
+    if reply is not None:
+        return reply
+
+    with metrics.stage("cache"):
+        norm, ctx, key = ANSWER_CACHE.keys(user_query, retrieved)
+        cached = ANSWER_CACHE.get(norm, ctx, key)
+    if cached is not None:
+        metrics.ANSWERS.inc(mode="cached")
+        return cached
+
+    def leader():
+        ADMISSION.enter()
         try:
-            logs = json.load(open(path, "r", encoding="utf-8"))
-        except:
-            logs = []
+            start = time.monotonic()
+            reply = generate_hybrid_response(user_query, retrieved, stats)
+        finally:
+            ADMISSION.leave()
+        ANSWER_CACHE.put(norm, ctx, key, reply, cost=time.monotonic() - start)
+        return reply
+
+    return IN_FLIGHT.do(key, leader)
+
+
+# ----------------- ADMISSION CONTROL -----------------
+
+# Per-IP / per-session token buckets, and a bounded queue in front of a
+# fixed budget of concurrent LLM calls (see admission.py). A request that
+# gets no slot within the queue SLO is answered from the retrieved FAQ
+# text instead of waiting into a timeout.
+RATE_LIMITER = RateLimiter()
+ADMISSION = Admission()
+DEGRADED_TOKENS = 300
+
+RATE_LIMITED_REPLY = "You're sending messages a little too fast 😅 Please wait a few seconds and try again."
+BUSY_REPLY = "I'm answering a lot of questions right now 😅 Please try again in a few seconds."
+
+
+def retry_after(req, sid):
+    """Retry-After header value if the client is over its rate limit."""
+    wait = RATE_LIMITER.check(req, sid)
+    return str(math.ceil(wait)) if wait else None
+
 
-    logs.append(entry)
-    json.dump(logs, open(path, "w", encoding="utf-8"), indent=2)
+def shed_reply(admission, user_query, retrieved):
+    """Retrieval-only answer for a shed request: the top FAQ passages,
+    trimmed to DEGRADED_TOKENS. None if nothing relevant was retrieved."""
+    context = ""
+    if use_context(retrieved):
+        context, _ = context_packer.pack_context(user_query, retrieved, DEGRADED_TOKENS)
+    if not context:
+        admission.count("rejected")
+        return None
+    admission.count("degraded")
+    metrics.ANSWERS.inc(mode="degraded")
+    return ("I'm answering a lot of questions right now, so here is the relevant part "
+            f"of the GMU FAQ 📚\n\n{context}")
+
+
+# ----------------- SESSIONS -----------------
+
+# Last few turns per browser (cookie), used to rewrite follow-up
+# questions before retrieval. SESSION_DB shares them between workers.
+SESSIONS = SessionStore()
+
+
+def session_id(req):
+    return req.cookies.get(COOKIE_NAME) or new_session_id()
+
+
+def set_session_cookie(response, sid):
+    # Re-sent on every reply so the cookie slides with the idle TTL.
+    response.set_cookie(COOKIE_NAME, sid, max_age=SESSIONS.ttl, httponly=True, samesite="Lax")
+    return response
+
+
+# ----------------- LOGGING -----------------
+
+migrate_json_log()
+CHAT_LOGGER = ChatLogger().start()
+
+
+def log_chat(user, bot, **extra):
+    """Log the turn; a sampled request also gets its per-stage ``trace``."""
+    trace = metrics.finish_trace()
+    if trace is not None:
+        extra["trace"] = trace
+    with metrics.stage("log"):
+        CHAT_LOGGER.log(user, bot, **extra)
 
 
 # ----------------- ROUTES -----------------
@@ -167,18 +453,270 @@ def index():
 
 @app.route("/chat", methods=["POST"])
 def chat():
-    data = request.get_json(force=True)
-    message = data.get("message", "").strip()
+    start = time.monotonic()
+    metrics.start_trace("/chat")
+    sid = session_id(request)
+    limited = retry_after(request, sid)
+    if limited:
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "rate_limited", start)
+        return jsonify({"reply": RATE_LIMITED_REPLY}), 429, {"Retry-After": limited}
+
+    with metrics.stage("parse"):
+        data = request.get_json(force=True)
+        message = data.get("message", "").strip()
 
     if not message:
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "empty", start)
         return jsonify({"reply": "Please type something so I can help you."})
 
-    retrieved = retrieve_relevant_answers(message)
+    intent, reply = intent_response(message)
+    if reply is not None:
+        log_chat(message, reply, intent=intent)
+        metrics.finish_request("/chat", "ok", start)
+        return set_session_cookie(jsonify({"reply": reply}), sid)
+
+    with metrics.stage("session"):
+        query, _ = SESSIONS.rewrite(sid, message)
+    table, reply = facts_response(message, query)
+    if reply is not None:
+        SESSIONS.append(sid, message, reply)
+        log_chat(message, reply, facts=table, **({"rewritten": query} if query != message else {}))
+        metrics.finish_request("/chat", "ok", start)
+        return set_session_cookie(jsonify({"reply": reply}), sid)
+    retrieved = retrieve_relevant_answers(query)
+
+    prompt = {}
+    status = "ok"
+    try:
+        reply = cached_hybrid_response(message, retrieved, prompt)
+    except Overloaded:
+        reply = shed_reply(ADMISSION, message, retrieved)
+        if reply is None:
+            metrics.finish_trace()
+            metrics.finish_request("/chat", "shed", start)
+            return jsonify({"reply": BUSY_REPLY}), 503, {"Retry-After": "5"}
+        prompt["degraded"] = "retrieval_only"
+        status = "degraded"
+    except Exception as e:
+        metrics.record_error("chat", e, message=message)
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "error", start)
+        return jsonify({"reply": "I'm having trouble connecting right now. Please try again soon."}), 503
+
+    SESSIONS.append(sid, message, reply)
+    if query != message:
+        prompt["rewritten"] = query
+    log_chat(message, reply, **prompt)
+
+    metrics.finish_request("/chat", status, start)
+    return set_session_cookie(jsonify({"reply": reply}), sid)
+
+
+def sse(data, event=None):
+    payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    return f"event: {event}\n{payload}" if event else payload
+
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Stream the reply as Server-Sent Events: one `data` event per delta,
+    then a `done` event. The chat is logged once the stream completes."""
+    request_start = time.monotonic()
+    metrics.start_trace("/chat/stream")
+    sid = session_id(request)
+    limited = retry_after(request, sid)
+    if limited:
+        metrics.finish_trace()
+        metrics.finish_request("/chat/stream", "rate_limited", request_start)
+        return jsonify({"reply": RATE_LIMITED_REPLY}), 429, {"Retry-After": limited}
+
+    with metrics.stage("parse"):
+        data = request.get_json(force=True)
+        message = data.get("message", "").strip()
 
-    reply = generate_hybrid_response(message, retrieved)
-    log_chat(message, reply)
+    if not message:
+        metrics.finish_trace()
+        metrics.finish_request("/chat/stream", "empty", request_start)
+        reply = "Please type something so I can help you."
+        return Response(sse({"delta": reply}) + sse({}, "done"), mimetype="text/event-stream")
+
+    intent, reply = intent_response(message)
+    if reply is not None:
+        log_chat(message, reply, intent=intent)
+        metrics.finish_request("/chat/stream", "ok", request_start)
+        return set_session_cookie(Response(sse({"delta": reply}) + sse({}, "done"),
+                                           mimetype="text/event-stream"), sid)
+
+    with metrics.stage("session"):
+        query, _ = SESSIONS.rewrite(sid, message)
+    table, reply = facts_response(message, query)
+    if reply is not None:
+        SESSIONS.append(sid, message, reply)
+        log_chat(message, reply, facts=table, **({"rewritten": query} if query != message else {}))
+        metrics.finish_request("/chat/stream", "ok", request_start)
+        return set_session_cookie(Response(sse({"delta": reply}) + sse({}, "done"),
+                                           mimetype="text/event-stream"), sid)
+    retrieved = retrieve_relevant_answers(query)
+    cached = precomputed_response(message, retrieved)
+    if cached is None:
+        with metrics.stage("cache"):
+            norm, ctx, key = ANSWER_CACHE.keys(message, retrieved)
+            cached = ANSWER_CACHE.get(norm, ctx, key)
+        if cached is not None:
+            metrics.ANSWERS.inc(mode="cached")
+    prompt = {"rewritten": query} if query != message else {}
+
+    def generate():
+        if cached is not None:
+            yield sse({"delta": cached})
+            yield sse({}, "done")
+            SESSIONS.append(sid, message, cached)
+            log_chat(message, cached, **prompt)
+            metrics.finish_request("/chat/stream", "ok", request_start)
+            return
 
-    return jsonify({"reply": reply})
+        try:
+            ADMISSION.enter()
+        except Overloaded:
+            reply = shed_reply(ADMISSION, message, retrieved)
+            yield sse({"delta": reply or BUSY_REPLY})
+            yield sse({}, "done")
+            if reply is None:
+                metrics.finish_trace()
+                metrics.finish_request("/chat/stream", "shed", request_start)
+                return
+            SESSIONS.append(sid, message, reply)
+            log_chat(message, reply, degraded="retrieval_only", **prompt)
+            metrics.finish_request("/chat/stream", "degraded", request_start)
+            return
+
+        parts = []
+        start = time.monotonic()
+        try:
+            upstream = groq_chat_stream(hybrid_messages(message, retrieved, prompt))
+            for delta in upstream:
+                parts.append(delta)
+                yield sse({"delta": delta})
+        except GeneratorExit:
+            # Client went away: closing `upstream` cancels the generation.
+            upstream.close()
+            metrics.finish_trace()
+            metrics.finish_request("/chat/stream", "disconnected", request_start)
+            raise
+        except Exception as e:
+            metrics.record_error("chat_stream", e, message=message)
+            metrics.finish_trace()
+            metrics.finish_request("/chat/stream", "error", request_start)
+            yield sse({"error": "I'm having trouble connecting right now."}, "error")
+            return
+        finally:
+            ADMISSION.leave()
+
+        reply = "".join(parts)
+        yield sse({}, "done")
+        ANSWER_CACHE.put(norm, ctx, key, reply, cost=time.monotonic() - start)
+        SESSIONS.append(sid, message, reply)
+        log_chat(message, reply, **prompt)
+        metrics.finish_request("/chat/stream", "ok", request_start)
+
+    return set_session_cookie(Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    ), sid)
+
+
+# Existing stats dicts, read at scrape time.
+metrics.Collected("gmu_answer_cache_total", "Answer cache lookups and evictions",
+                  lambda: {k: v for k, v in ANSWER_CACHE.snapshot().items()
+                           if k.startswith(("hits_", "misses", "evictions", "expired"))},
+                  kind="counter", labelnames=("event",))
+metrics.Collected("gmu_answer_cache_bytes", "Answer cache size",
+                  lambda: ANSWER_CACHE.snapshot()["bytes"])
+metrics.Collected("gmu_precomputed_total", "Precomputed answer lookups",
+                  lambda: {k: PRECOMPUTED.stats[k] for k in ("hits", "misses", "stale")},
+                  kind="counter", labelnames=("result",))
+metrics.Collected("gmu_intents_total", "Messages answered by the intent router",
+                  lambda: dict(INTENT_ROUTER.stats["hits"]), kind="counter",
+                  labelnames=("intent", "via"))
+metrics.Collected("gmu_intent_passed_total", "Messages left to retrieval and the LLM",
+                  lambda: INTENT_ROUTER.stats["passed"], kind="counter")
+metrics.Collected("gmu_facts_total", "Messages answered from the fact store",
+                  lambda: dict(FACTS.stats["hits"]), kind="counter", labelnames=("table",))
+metrics.Collected("gmu_admission_total", "Upstream admissions, shed requests and how they were answered",
+                  lambda: dict(ADMISSION.stats), kind="counter", labelnames=("event",))
+metrics.Collected("gmu_admission_waiting", "Requests waiting for an upstream slot",
+                  lambda: ADMISSION.waiting)
+metrics.Collected("gmu_upstream_in_flight", "LLM calls holding an upstream slot",
+                  lambda: ADMISSION.in_flight)
+metrics.Collected("gmu_rate_limited_total", "Requests rejected by the rate limiter",
+                  lambda: {k.split("_", 1)[1]: v for k, v in RATE_LIMITER.stats.items()},
+                  kind="counter", labelnames=("key",))
+metrics.Collected("gmu_single_flight_total", "LLM calls made (leaders) and coalesced",
+                  lambda: dict(IN_FLIGHT.stats), kind="counter", labelnames=("role",))
+metrics.Collected("gmu_ranking_total", "Ranking queries, timeouts and errors",
+                  lambda: dict(ranking.STATS), kind="counter", labelnames=("event",))
+metrics.Collected("gmu_sessions", "Live in-process sessions",
+                  lambda: SESSIONS.snapshot().get("sessions"))
+metrics.Collected("gmu_index_reloads_total", "Index reloads and failures",
+                  lambda: {"ok": INDEX_MANAGER.stats["reloads"],
+                           "error": INDEX_MANAGER.stats["reload_errors"]},
+                  kind="counter", labelnames=("result",))
+metrics.Collected("gmu_chat_log_dropped_total", "Chat log entries dropped on a full queue",
+                  lambda: CHAT_LOGGER.dropped, kind="counter")
+
+
+def record_unhandled(sender, exception, **extra):
+    metrics.record_error("unhandled", exception, path=request.path)
+
+
+got_request_exception.connect(record_unhandled, app)
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify({
+        **ANSWER_CACHE.snapshot(),
+        "single_flight": IN_FLIGHT.stats,
+        "context": context_packer.snapshot(),
+        "sessions": SESSIONS.snapshot(),
+        "precomputed": PRECOMPUTED.snapshot(),
+        "intents": INTENT_ROUTER.snapshot(),
+        "facts": FACTS.snapshot(),
+        "admission": ADMISSION.snapshot(),
+        "rate_limit": RATE_LIMITER.snapshot(),
+    })
+
+
+def admin_allowed(req):
+    """ADMIN_TOKEN via X-Admin-Token if configured, else localhost only."""
+    if ADMIN_TOKEN:
+        return req.headers.get("X-Admin-Token") == ADMIN_TOKEN
+    return req.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route("/admin/index")
+def admin_index():
+    if not admin_allowed(request):
+        return jsonify({"error": "forbidden"}), 403
+    return jsonify(INDEX_MANAGER.stats)
+
+
+@app.route("/admin/reload", methods=["POST"])
+def admin_reload():
+    if not admin_allowed(request):
+        return jsonify({"error": "forbidden"}), 403
+
+    force = request.args.get("force") == "1"
+    INDEX_MANAGER.reload_async(force=force)
+    return jsonify({"reloading": True, **INDEX_MANAGER.stats}), 202
 
 
 # ----------------- RUN -----------------
@@ -0,0 +1,337 @@
+import os
+import time
+import asyncio
+
+from quart import Quart, Response, request, jsonify, render_template
+
+import context_packer
+import metrics
+from admission import AsyncAdmission, Overloaded
+from app import (
+    ANSWER_CACHE,
+    BUSY_REPLY,
+    FACTS,
+    INDEX_MANAGER,
+    INTENT_ROUTER,
+    PRECOMPUTED,
+    RATE_LIMITER,
+    MAX_OUTPUT_TOKENS,
+    RATE_LIMITED_REPLY,
+    SESSIONS,
+    admin_allowed,
+    count_tokens,
+    facts_response,
+    hybrid_messages,
+    intent_response,
+    log_chat,
+    precomputed_response,
+    retrieve_relevant_answers,
+    retry_after,
+    session_id,
+    set_session_cookie,
+    shed_reply,
+    sse,
+)
+from llm_client import AsyncLLM
+from single_flight import AsyncSingleFlight
+
+
+# ----------------- ASGI APP -----------------
+#
+# Same routes as app.py, served on asyncio so an upstream LLM call does
+# not pin a worker thread:
+#
+#     hypercorn asgi_app:app --workers 2
+#
+# Retrieval, the answer cache and the chat log are shared with app.py.
+# Their calls block (the ranking pool, sqlite sessions and cache), so
+# they run in a thread with asyncio.to_thread and a slow one does not
+# stall every other conversation on the loop.
+
+app = Quart(__name__)
+llm = None
+IN_FLIGHT = AsyncSingleFlight()
+ADMISSION = AsyncAdmission()
+
+
+@app.before_serving
+async def startup():
+    global llm
+    llm = AsyncLLM(api_key=os.getenv("GROQ_API_KEY"))
+
+
+@app.after_serving
+async def shutdown():
+    await llm.close()
+
+
+# ----------------- HYBRID LOGIC -----------------
+
+def cache_lookup(user_query, retrieved):
+    """(norm, ctx, key, cached answer or None); blocking, see above."""
+    with metrics.stage("cache"):
+        norm, ctx, key = ANSWER_CACHE.keys(user_query, retrieved)
+        cached = ANSWER_CACHE.get(norm, ctx, key)
+    if cached is not None:
+        metrics.ANSWERS.inc(mode="cached")
+    return norm, ctx, key, cached
+
+
+async def generate_hybrid_response(user_query, retrieved, stats=None):
+    reply = await asyncio.to_thread(precomputed_response, user_query, retrieved)
+    if reply is not None:
+        return reply
+
+    norm, ctx, key, cached = await asyncio.to_thread(cache_lookup, user_query, retrieved)
+    if cached is not None:
+        return cached
+
+    async def leader():
+        await ADMISSION.enter()
+        start = time.monotonic()
+        try:
+            messages = hybrid_messages(user_query, retrieved, stats)
+            with metrics.stage("llm"):
+                reply = await llm.chat(messages, max_tokens=MAX_OUTPUT_TOKENS)
+        finally:
+            ADMISSION.leave()
+        count_tokens(None, messages, reply or "")
+        await asyncio.to_thread(ANSWER_CACHE.put, norm, ctx, key, reply,
+                                cost=time.monotonic() - start)
+        return reply
+
+    return await IN_FLIGHT.do(key, leader)
+
+
+# ----------------- ROUTES -----------------
+
+@app.route("/")
+async def index():
+    return await render_template("index.html")
+
+
+@app.route("/chat", methods=["POST"])
+async def chat():
+    start = time.monotonic()
+    metrics.start_trace("/chat")
+    sid = session_id(request)
+    limited = retry_after(request, sid)
+    if limited:
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "rate_limited", start)
+        return jsonify({"reply": RATE_LIMITED_REPLY}), 429, {"Retry-After": limited}
+
+    with metrics.stage("parse"):
+        data = await request.get_json(force=True)
+        message = data.get("message", "").strip()
+
+    if not message:
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "empty", start)
+        return jsonify({"reply": "Please type something so I can help you."})
+
+    intent, reply = await asyncio.to_thread(intent_response, message)
+    if reply is not None:
+        log_chat(message, reply, intent=intent)
+        metrics.finish_request("/chat", "ok", start)
+        return set_session_cookie(jsonify({"reply": reply}), sid)
+
+    with metrics.stage("session"):
+        query, _ = await asyncio.to_thread(SESSIONS.rewrite, sid, message)
+    table, reply = await asyncio.to_thread(facts_response, message, query)
+    if reply is not None:
+        await asyncio.to_thread(SESSIONS.append, sid, message, reply)
+        log_chat(message, reply, facts=table, **({"rewritten": query} if query != message else {}))
+        metrics.finish_request("/chat", "ok", start)
+        return set_session_cookie(jsonify({"reply": reply}), sid)
+    retrieved = await asyncio.to_thread(retrieve_relevant_answers, query)
+
+    prompt = {}
+    status = "ok"
+    try:
+        reply = await generate_hybrid_response(message, retrieved, prompt)
+    except Overloaded:
+        reply = shed_reply(ADMISSION, message, retrieved)
+        if reply is None:
+            metrics.finish_trace()
+            metrics.finish_request("/chat", "shed", start)
+            return jsonify({"reply": BUSY_REPLY}), 503, {"Retry-After": "5"}
+        prompt["degraded"] = "retrieval_only"
+        status = "degraded"
+    except Exception as e:
+        metrics.record_error("chat", e, message=message)
+        metrics.finish_trace()
+        metrics.finish_request("/chat", "error", start)
+        return jsonify({"reply": "I'm having trouble connecting right now. Please try again soon."}), 503
+
+    await asyncio.to_thread(SESSIONS.append, sid, message, reply)
+    if query != message:
+        prompt["rewritten"] = query
+    log_chat(message, reply, **prompt)
+
+    metrics.finish_request("/chat", status, start)
+    return set_session_cookie(jsonify({"reply": reply}), sid)
+
+
+@app.route("/chat/stream", methods=["POST"])
+async def chat_stream():
+    request_start = time.monotonic()
+    metrics.start_trace("/chat/stream")
+    sid = session_id(request)
+    limited = retry_after(request, sid)
+    if limited:
+        metrics.finish_trace()
+        metrics.finish_request("/chat/stream", "rate_limited", request_start)
+        return jsonify({"reply": RATE_LIMITED_REPLY}), 429, {"Retry-After": limited}
+
+    with metrics.stage("parse"):
+        data = await request.get_json(force=True)
+        message = data.get("message", "").strip()
+
+    if not message:
+        metrics.finish_trace()
+        metrics.finish_request("/chat/stream", "empty", request_start)
+        reply = "Please type something so I can help you."
+        return Response(sse({"delta": reply}) + sse({}, "done"), mimetype="text/event-stream")
+
+    intent, reply = await asyncio.to_thread(intent_response, message)
+    if reply is not None:
+        log_chat(message, reply, intent=intent)
+        metrics.finish_request("/chat/stream", "ok", request_start)
+        return set_session_cookie(Response(sse({"delta": reply}) + sse({}, "done"),
+                                           mimetype="text/event-stream"), sid)
+
+    with metrics.stage("session"):
+        query, _ = await asyncio.to_thread(SESSIONS.rewrite, sid, message)
+    table, reply = await asyncio.to_thread(facts_response, message, query)
+    if reply is not None:
+        await asyncio.to_thread(SESSIONS.append, sid, message, reply)
+        log_chat(message, reply, facts=table, **({"rewritten": query} if query != message else {}))
+        metrics.finish_request("/chat/stream", "ok", request_start)
+        return set_session_cookie(Response(sse({"delta": reply}) + sse({}, "done"),
+                                           mimetype="text/event-stream"), sid)
+    retrieved = await asyncio.to_thread(retrieve_relevant_answers, query)
+    cached = await asyncio.to_thread(precomputed_response, message, retrieved)
+    if cached is None:
+        norm, ctx, key, cached = await asyncio.to_thread(cache_lookup, message, retrieved)
+    prompt = {"rewritten": query} if query != message else {}
+
+    async def generate():
+        if cached is not None:
+            yield sse({"delta": cached})
+            yield sse({}, "done")
+            await asyncio.to_thread(SESSIONS.append, sid, message, cached)
+            log_chat(message, cached, **prompt)
+            metrics.finish_request("/chat/stream", "ok", request_start)
+            return
+
+        try:
+            await ADMISSION.enter()
+        except Overloaded:
+            reply = shed_reply(ADMISSION, message, retrieved)
+            yield sse({"delta": reply or BUSY_REPLY})
+            yield sse({}, "done")
+            if reply is None:
+                metrics.finish_trace()
+                metrics.finish_request("/chat/stream", "shed", request_start)
+                return
+            await asyncio.to_thread(SESSIONS.append, sid, message, reply)
+            log_chat(message, reply, degraded="retrieval_only", **prompt)
+            metrics.finish_request("/chat/stream", "degraded", request_start)
+            return
+
+        parts = []
+        start = time.monotonic()
+        messages = upstream = None
+        status = "disconnected"
+        try:
+            messages = hybrid_messages(message, retrieved, prompt)
+            upstream = llm.stream(messages, max_tokens=MAX_OUTPUT_TOKENS)
+            async for delta in upstream:
+                if not parts:
+                    metrics.observe_stage("llm_first_token", time.monotonic() - start)
+                parts.append(delta)
+                yield sse({"delta": delta})
+            status = "ok"
+        except Exception as e:
+            metrics.record_error("chat_stream", e, message=message)
+            status = "error"
+            yield sse({"error": "I'm having trouble connecting right now."}, "error")
+            return
+        finally:
+            # Also runs on client disconnect (cancellation), closing the
+            # upstream response.
+            if upstream is not None:
+                await upstream.aclose()
+            ADMISSION.leave()
+            metrics.observe_stage("llm", time.monotonic() - start)
+            if messages is not None:
+                count_tokens(None, messages, "".join(parts))
+            if status != "ok":
+                metrics.finish_trace()
+                metrics.finish_request("/chat/stream", status, request_start)
+
+        reply = "".join(parts)
+        yield sse({}, "done")
+        await asyncio.to_thread(ANSWER_CACHE.put, norm, ctx, key, reply,
+                                cost=time.monotonic() - start)
+        await asyncio.to_thread(SESSIONS.append, sid, message, reply)
+        log_chat(message, reply, **prompt)
+        metrics.finish_request("/chat/stream", "ok", request_start)
+
+    return set_session_cookie(Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    ), sid)
+
+
+@app.route("/admin/index")
+async def admin_index():
+    if not admin_allowed(request):
+        return jsonify({"error": "forbidden"}), 403
+    return jsonify(INDEX_MANAGER.stats)
+
+
+@app.route("/admin/reload", methods=["POST"])
+async def admin_reload():
+    if not admin_allowed(request):
+        return jsonify({"error": "forbidden"}), 403
+
+    force = request.args.get("force") == "1"
+    INDEX_MANAGER.reload_async(force=force)
+    return jsonify({"reloading": True, **INDEX_MANAGER.stats}), 202
+
+
+metrics.Collected("gmu_async_single_flight_total", "LLM calls made (leaders) and coalesced",
+                  lambda: dict(IN_FLIGHT.stats), kind="counter", labelnames=("role",))
+metrics.Collected("gmu_async_admission_total", "Upstream admissions, shed requests and how they were answered",
+                  lambda: dict(ADMISSION.stats), kind="counter", labelnames=("event",))
+metrics.Collected("gmu_async_admission_waiting", "Requests waiting for an upstream slot",
+                  lambda: ADMISSION.waiting)
+metrics.Collected("gmu_llm_calls_total", "Upstream LLM calls, retries and failures",
+                  lambda: {k: v for k, v in llm.stats.items() if k != "in_flight"},
+                  kind="counter", labelnames=("event",))
+metrics.Collected("gmu_llm_in_flight", "Upstream LLM calls in flight",
+                  lambda: llm.stats["in_flight"])
+
+
+@app.route("/metrics")
+async def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
+
+@app.route("/cache/stats")
+async def cache_stats():
+    return jsonify({
+        **ANSWER_CACHE.snapshot(),
+        "single_flight": IN_FLIGHT.stats,
+        "llm": llm.stats,
+        "context": context_packer.snapshot(),
+        "sessions": SESSIONS.snapshot(),
+        "precomputed": PRECOMPUTED.snapshot(),
+        "intents": INTENT_ROUTER.snapshot(),
+        "facts": FACTS.snapshot(),
+        "admission": ADMISSION.snapshot(),
+        "rate_limit": RATE_LIMITER.snapshot(),
+    })
@@ -0,0 +1,481 @@
+"""Retrieval and end-to-end latency benchmarks.
+
+Replays questions from the chat log (or synthetic ones) against the
+retrieval layer and against the full Flask / ASGI app, with fake_llm.py
+standing in for Groq. Results are written as JSON so runs from different
+commits can be compared:
+
+    python benchmark.py retrieval --sizes 10000,100000 --out bench/retrieval.json
+    python benchmark.py app --llm-latency 0.3 --concurrency 16 --out bench/app.json
+    python benchmark.py compare bench/old.json bench/new.json
+
+Nothing here touches data/index or logs/: indexes are built in a temp
+directory and the app under test logs to one as well (when run as a
+script).
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+FAQ_PATH = os.path.join("data", "faqs_final.json")
+# Read for replay only; the app under test logs to CHAT_LOG_DIR (a temp dir).
+LOG_PATH = os.path.join("logs", "chat_logs.jsonl")
+
+
+# ---------------------- MEASUREMENT ----------------------
+
+def summarize(latencies, wall=None):
+    """Latency percentiles in ms, plus throughput if ``wall`` is given."""
+    if not latencies:
+        return {"count": 0}
+    ms = np.asarray(latencies) * 1000.0
+    out = {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if wall:
+        out["qps"] = round(len(ms) / wall, 1)
+    return out
+
+
+def rss_mb():
+    """Current resident set size; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def dir_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / (1024.0 * 1024.0), 2)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round(time.perf_counter() - start, 3)
+
+
+# ---------------------- QUERIES ----------------------
+
+def logged_messages(log_path=LOG_PATH):
+    """User messages from the chat log, including a not yet migrated
+    legacy JSON log."""
+    from chat_logger import iter_chat_logs
+    queries = [e.get("user", "") for e in iter_chat_logs(log_path, include_legacy=True)]
+    return [q.strip() for q in queries if isinstance(q, str) and q.strip()]
+
+
+def load_queries(limit, log_path=LOG_PATH):
+    """Logged user messages, repeated in order up to ``limit``."""
+    queries = logged_messages(log_path)
+    if not queries:
+        return []
+    return [queries[i % len(queries)] for i in range(limit)]
+
+
+def sample_queries(faqs, limit, seed=0):
+    """3–6 word fragments of random FAQ questions, so most queries hit."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(limit):
+        words = rng.choice(faqs)["question"].rstrip("?").split()
+        n = min(len(words), rng.randint(3, 6))
+        start = rng.randint(0, len(words) - n)
+        queries.append(" ".join(words[start:start + n]))
+    return queries
+
+
+# ---------------------- SYNTHETIC CORPUS ----------------------
+
+def synthetic_corpus(n_docs, seed=0, base_faqs=None):
+    """``n_docs`` FAQs with a Zipf-distributed vocabulary.
+
+    Real FAQ words are mixed into the head of the vocabulary so that
+    replayed questions still find matches.
+    """
+    rng = np.random.default_rng(seed)
+    real = sorted({w.lower() for x in (base_faqs or []) for w in x["question"].split()})
+    vocab = np.array(real + [f"t{i:05d}" for i in range(max(1000, min(50000, n_docs // 10)))])
+    rng.shuffle(vocab)
+    weights = 1.0 / np.arange(1, len(vocab) + 1) ** 1.1
+    weights /= weights.sum()
+
+    q_len = rng.integers(5, 12, size=n_docs)
+    a_len = rng.integers(20, 60, size=n_docs)
+    words = vocab[rng.choice(len(vocab), size=int(q_len.sum() + a_len.sum()), p=weights)]
+    sources = ["programs", "faculty", "contact", "program_fee", "phd_supervisors", "governance"]
+
+    faqs, pos = [], 0
+    for i in range(n_docs):
+        q = " ".join(words[pos:pos + q_len[i]])
+        pos += q_len[i]
+        a = " ".join(words[pos:pos + a_len[i]])
+        pos += a_len[i]
+        faqs.append({"question": q.capitalize() + "?", "answer": a + ".",
+                     "source": sources[i % len(sources)]})
+    return faqs
+
+
+# ---------------------- RETRIEVAL ----------------------
+
+def run_queries(search, queries, batch=1):
+    """Per-call latencies and wall time of ``search(batch_of_queries)``."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        t = time.perf_counter()
+        search(queries[i:i + batch])
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+
+def bench_corpus(name, faq_path, queries, batch, top_k=3):
+    """Build, load and query every retriever for one FAQ file."""
+    from retriever import ranking, search
+    from retriever.bm25 import build_bm25_index, load_bm25_index
+    from retriever.build_index import build_index, load_index
+
+    index_root = tempfile.mkdtemp(prefix="bench-index-")
+    try:
+        with quiet():
+            tfidf_dir, tfidf_build = timed(build_index, faq_path, index_root, True)
+            bm25_dir, bm25_build = timed(build_bm25_index, faq_path, index_root, True)
+
+        before = rss_mb()
+        tfidf, tfidf_load = timed(load_index, faq_path, index_root, False)
+        bm25, bm25_load = timed(load_bm25_index, faq_path, index_root, tfidf.faqs, False)
+        loaded = rss_mb()
+
+        retrievers = {
+            "tfidf": ranking.Retriever(
+                "tfidf", lambda qs, k: search.retrieve_many(tfidf, qs, k), 0.25),
+            "bm25": ranking.Retriever("bm25", bm25.search_many, 4.0, slope=1.0),
+        }
+        backends = {
+            "tfidf": lambda qs: search.retrieve_many(tfidf, qs, top_k),
+            "bm25": lambda qs: bm25.search_many(qs, top_k),
+            "fused": lambda qs: ranking.rank_many(qs, retrievers, top_k),
+        }
+
+        if os.getenv("EMBEDDING_MODEL_PATH"):
+            from retriever.dense import build_dense_index, load_dense_index, Embedder
+            embedder = Embedder()
+            with quiet():
+                _, dense_build = timed(build_dense_index, faq_path, index_root, embedder,
+                                       force=True)
+            dense = load_dense_index(faq_path, index_root, embedder, tfidf.faqs, False)
+            backends["dense"] = lambda qs: dense.search_many(qs, top_k)
+        else:
+            dense_build = None
+
+        timeouts_before = ranking.STATS["retriever_timeouts"]
+        results = {}
+        for backend, fn in backends.items():
+            fn(queries[:10])  # warm-up: page in the mmapped arrays
+            single, wall = run_queries(fn, queries)
+            batched, batched_wall = run_queries(fn, queries, batch)
+            results[backend] = {
+                **summarize(single, wall),
+                f"batch{batch}_qps": round(len(queries) / batched_wall, 1),
+            }
+
+        return {
+            "corpus": name,
+            "n_docs": len(tfidf.faqs),
+            "build_seconds": {"tfidf": tfidf_build, "bm25": bm25_build, "dense": dense_build},
+            "load_seconds": {"tfidf": tfidf_load, "bm25": bm25_load},
+            "disk_mb": {"tfidf": dir_mb(tfidf_dir), "bm25": dir_mb(bm25_dir)},
+            "rss_mb": round(loaded, 1),
+            "index_rss_mb": round(loaded - before, 1),
+            "fused_retriever_timeouts": ranking.STATS["retriever_timeouts"] - timeouts_before,
+            "backends": results,
+        }
+    finally:
+        shutil.rmtree(index_root, ignore_errors=True)
+
+
+def bench_retrieval(sizes, n_queries, batch, seed=0):
+    with open(FAQ_PATH, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    queries = load_queries(n_queries) or sample_queries(faqs, n_queries, seed)
+    runs = [bench_corpus("faqs_final", FAQ_PATH, queries, batch)]
+    print(f"[BENCH] faqs_final: {runs[-1]['backends']['tfidf']['p50_ms']} ms p50 (tfidf)")
+
+    for size in sizes:
+        corpus, gen_seconds = timed(synthetic_corpus, size, seed, faqs)
+        tmp_dir = tempfile.mkdtemp(prefix="bench-corpus-")
+        try:
+            path = os.path.join(tmp_dir, "faqs.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(corpus, f)
+            synthetic = sample_queries(corpus, n_queries // 2, seed) + queries[:n_queries // 2]
+            del corpus
+            run = bench_corpus(f"synthetic-{size}", path, synthetic, batch)
+            run["generate_seconds"] = gen_seconds
+            runs.append(run)
+            print(f"[BENCH] synthetic-{size}: "
+                  + ", ".join(f"{b} {r['p50_ms']} ms p50" for b, r in run["backends"].items()))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return runs
+
+
+# ---------------------- FULL APP ----------------------
+
+def bench_app(n_requests, concurrency, llm_latency, token_delay, cache, modes):
+    """/chat through Flask (threads) and Quart (asyncio) against fake_llm."""
+    import fake_llm
+
+    server, url, llm_config = fake_llm.serve_in_thread(
+        latency=llm_latency, token_delay=token_delay
+    )
+    os.environ.update({
+        "GROQ_BASE_URL": url,
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY") or "bench",
+        "INDEX_WATCH_INTERVAL": "0",
+    })
+    if not cache:
+        os.environ["ANSWER_CACHE_MAX_BYTES"] = "0"  # every entry is too big to keep
+        os.environ["ANSWER_CACHE_DB"] = ""
+
+    with open(FAQ_PATH, "r", encoding="utf-8") as f:
+        queries = load_queries(n_requests) or sample_queries(json.load(f), n_requests)
+
+    try:
+        with quiet():
+            import app
+        results = {"llm_latency": llm_latency, "token_delay": token_delay, "cache": cache,
+                   "concurrency": concurrency}
+
+        # Function level, sequential
+        retrieve_lat, retrieved = [], []
+        for q in queries:
+            t = time.perf_counter()
+            retrieved.append(app.retrieve_relevant_answers(q))
+            retrieve_lat.append(time.perf_counter() - t)
+        results["retrieve_relevant_answers"] = summarize(retrieve_lat)
+
+        n_generate = min(len(queries), 20)
+        generate_lat = []
+        for q, r in zip(queries[:n_generate], retrieved):
+            t = time.perf_counter()
+            app.generate_hybrid_response(q, r)
+            generate_lat.append(time.perf_counter() - t)
+        results["generate_hybrid_response"] = summarize(generate_lat)
+
+        if "flask" in modes:
+            results["flask_chat"] = _bench_flask(app.app, queries, concurrency)
+            print(f"[BENCH] flask /chat: {results['flask_chat']}")
+        if "asgi" in modes:
+            with quiet():
+                import asgi_app
+            results["asgi_chat"] = asyncio.run(_bench_asgi(asgi_app.app, queries, concurrency))
+            print(f"[BENCH] asgi /chat: {results['asgi_chat']}")
+
+        results["llm_calls"] = llm_config.calls
+        results["rss_mb"] = round(rss_mb(), 1)
+        app.CHAT_LOGGER.close()
+        return results
+    finally:
+        server.shutdown()
+
+
+def user_ip(i):
+    """A distinct client address per simulated user, so the per-IP rate
+    limit sees many students instead of one flooding 127.0.0.1."""
+    return f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+
+
+def check_not_rate_limited(name, statuses):
+    limited = statuses.count(429)
+    if limited:
+        raise RuntimeError(f"{name}: {limited} of {len(statuses)} requests were rate "
+                           "limited (429), so the results would measure the limiter")
+
+
+def _bench_flask(flask_app, queries, concurrency):
+    latencies, statuses = [], []
+
+    def one(i_q):
+        i, q = i_q
+        client = flask_app.test_client()  # no cookie jar shared between "users"
+        t = time.perf_counter()
+        response = client.post("/chat", json={"message": q},
+                               environ_base={"REMOTE_ADDR": user_ip(i)})
+        return time.perf_counter() - t, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, status in pool.map(one, enumerate(queries)):
+            latencies.append(elapsed)
+            statuses.append(status)
+    wall = time.perf_counter() - start
+    check_not_rate_limited("flask /chat", statuses)
+    return {**summarize(latencies, wall), "errors": sum(s >= 400 for s in statuses)}
+
+
+async def _bench_asgi(quart_app, queries, concurrency):
+    latencies, statuses = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with quart_app.test_app() as test_app:
+        async def one(i, q):
+            async with semaphore:
+                client = test_app.test_client()
+                t = time.perf_counter()
+                response = await client.post("/chat", json={"message": q},
+                                             scope_base={"client": (user_ip(i), 50000)})
+                await response.get_data()
+                latencies.append(time.perf_counter() - t)
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(queries)))
+        wall = time.perf_counter() - start
+    check_not_rate_limited("asgi /chat", statuses)
+    return {**summarize(latencies, wall), "errors": sum(s >= 400 for s in statuses)}
+
+
+# ---------------------- COMPARE ----------------------
+
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "qps", "seconds", "rss_mb", "disk_mb")
+
+
+def flatten(data, prefix=""):
+    out = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            out.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, list):
+        for item in data:
+            label = item.get("corpus", "") if isinstance(item, dict) else ""
+            out.update(flatten(item, f"{prefix}{label}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        out[prefix.rstrip(".")] = data
+    return out
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = flatten(json.load(f))
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = flatten(json.load(f))
+
+    for key in sorted(old.keys() & new.keys()):
+        if not any(part in key for part in COMPARED) or not old[key]:
+            continue
+        change = (new[key] - old[key]) / old[key] * 100.0
+        flag = ""
+        if abs(change) >= 10:
+            worse = change < 0 if "qps" in key else change > 0
+            flag = "  REGRESSION" if worse else "  improved"
+        print(f"{key:70s} {old[key]:>12} → {new[key]:>12} ({change:+.1f}%){flag}")
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+def write_results(results, out):
+    text = json.dumps(results, indent=2)
+    if out:
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[DONE] Results saved → {out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval and /chat latency benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("retrieval", "app", "all"):
+        p = sub.add_parser(name)
+        p.add_argument("--out", help="write JSON results here (default: stdout)")
+        p.add_argument("--queries", type=int, default=500, help="queries / requests per run")
+        p.add_argument("--seed", type=int, default=0)
+        if name in ("retrieval", "all"):
+            p.add_argument("--sizes", default="10000",
+                           help="synthetic corpus sizes, e.g. 10000,100000,1000000")
+            p.add_argument("--batch", type=int, default=32)
+        if name in ("app", "all"):
+            p.add_argument("--concurrency", type=int, default=16)
+            p.add_argument("--llm-latency", type=float, default=0.3)
+            p.add_argument("--token-delay", type=float, default=0.0)
+            p.add_argument("--no-cache", action="store_true", help="disable the answer cache")
+            p.add_argument("--modes", default="flask,asgi")
+
+    p = sub.add_parser("compare")
+    p.add_argument("old")
+    p.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args.old, args.new)
+        sys.exit(0)
+
+    # Before anything imports chat_logger: keep the app's log (and the
+    # legacy-log migration) away from logs/.
+    log_dir = tempfile.mkdtemp(prefix="bench-logs-")
+    os.environ["CHAT_LOG_DIR"] = log_dir
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+    if args.command in ("retrieval", "all"):
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        results["retrieval"] = bench_retrieval(sizes, args.queries, args.batch, args.seed)
+    if args.command in ("app", "all"):
+        results["app"] = bench_app(args.queries, args.concurrency, args.llm_latency,
+                                   args.token_delay, not args.no_cache,
+                                   [m.strip() for m in args.modes.split(",")])
+    shutil.rmtree(log_dir, ignore_errors=True)
+    write_results(results, args.out)
@@ -0,0 +1,276 @@
+import os
+import json
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import datetime
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is then only safe with one worker
+    fcntl = None
+
+import metrics
+
+
+LOG_DIR = os.getenv("CHAT_LOG_DIR", "logs")
+LOG_PATH = os.path.join(LOG_DIR, "chat_logs.jsonl")
+LEGACY_LOG_PATH = os.path.join(LOG_DIR, "chat_logs.json")
+
+MAX_BYTES = int(os.getenv("CHAT_LOG_MAX_BYTES", 10 * 1024 * 1024))
+MAX_AGE_SECONDS = int(os.getenv("CHAT_LOG_MAX_AGE", 24 * 60 * 60))
+FLUSH_INTERVAL = float(os.getenv("CHAT_LOG_FLUSH_INTERVAL", 1.0))
+BATCH_SIZE = 256
+QUEUE_SIZE = 10000
+
+_STOP = object()
+
+
+@contextmanager
+def log_lock(path=LOG_PATH):
+    """Exclusive lock, across worker processes, on the log at ``path``."""
+    lock_file = open(path + ".lock", "w")
+    try:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+# ----------------- MIGRATION -----------------
+
+def migrate_json_log(legacy_path=LEGACY_LOG_PATH, path=LOG_PATH):
+    """One-shot conversion of the old JSON array log into JSONL.
+
+    The legacy file is renamed to ``*.migrated`` afterwards so the
+    conversion never runs twice. Every worker calls this at import, so it
+    runs under the rotation lock and only the first worker to get it
+    migrates. Returns the number of migrated entries.
+    """
+    if not os.path.exists(legacy_path):
+        return 0
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with log_lock(path):
+        if not os.path.exists(legacy_path):
+            return 0  # another worker migrated it while we waited
+
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except Exception as e:
+            metrics.record_error("chat_log_migrate", e, path=legacy_path)
+            return 0
+
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(legacy_path, legacy_path + ".migrated")
+    return len(entries)
+
+
+# ----------------- READING -----------------
+
+def iter_chat_logs(path=LOG_PATH, include_rotated=True, include_legacy=False):
+    """Yield logged entries, oldest first, across rotated segments.
+
+    With ``include_legacy`` a legacy JSON array log next to ``path`` that
+    has not been migrated yet is read first. A ``*.migrated`` copy is not:
+    its entries were appended to ``path`` when it was migrated.
+    """
+    if include_legacy:
+        yield from _iter_legacy_log(os.path.splitext(path)[0] + ".json")
+
+    directory = os.path.dirname(path) or "."
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    files = []
+    if include_rotated and os.path.isdir(directory):
+        files = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(stem + "-") and name.endswith((".jsonl", ".jsonl.gz"))
+        )
+    if os.path.exists(path):
+        files.append(path)
+
+    for file_path in files:
+        opener = gzip.open if file_path.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crashed writer
+
+
+def _iter_legacy_log(legacy_path):
+    if not os.path.exists(legacy_path):
+        return
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except ValueError:
+        return  # half-written by an old worker; migrate_json_log reports it
+    yield from entries
+
+
+# ----------------- WRITER -----------------
+
+class ChatLogger:
+    """Append-only JSONL log drained by a background writer thread.
+
+    ``log`` only enqueues, so request latency does not depend on the
+    size of the log. The writer batches records into one write + fsync
+    per ``flush_interval`` and rotates the file by size or age, gzipping
+    the rotated segment.
+    """
+
+    def __init__(self, path=LOG_PATH, max_bytes=MAX_BYTES, max_age=MAX_AGE_SECONDS,
+                 flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._opened_at = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # ---- public API ----
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return self
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._thread = threading.Thread(
+                target=self._run, name="chat-log-writer", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def log(self, user, bot, **extra):
+        entry = {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "user": user,
+            "bot": bot,
+        }
+        entry.update(extra)
+        self.write(entry)
+
+    def write(self, entry):
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # ---- writer thread ----
+
+    def _run(self):
+        self._open()
+        stopping = False
+
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                while len(batch) < BATCH_SIZE and not stopping:
+                    item = self._queue.get_nowait()
+                    if item is _STOP:
+                        stopping = True
+                    else:
+                        batch.append(item)
+            except queue.Empty:
+                pass
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+                self._maybe_rotate()
+            except Exception as e:
+                metrics.record_error("chat_log_writer", e)
+
+        if self._file:
+            self._file.close()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _reopen_if_rotated(self):
+        """Another worker may have rotated the file under our handle."""
+        try:
+            current = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self._file.fileno()).st_ino:
+            self._file.close()
+            self._open()
+
+    def _write_batch(self, batch):
+        self._reopen_if_rotated()
+        # One write per batch: with O_APPEND small writes from several
+        # processes do not interleave inside a line.
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch)
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _maybe_rotate(self):
+        size = self._file.tell()
+        if size == 0:
+            return
+        too_big = size >= self.max_bytes
+        too_old = time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old):
+            return
+
+        with log_lock(self.path):
+            self._reopen_if_rotated()
+            if self._file.tell() == 0:
+                return  # somebody else rotated first
+
+            stem = os.path.splitext(self.path)[0]
+            stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+            rotated = f"{stem}-{stamp}.jsonl"
+            os.replace(self.path, rotated)
+            self._file.close()
+            self._open()
+
+        _gzip_file(rotated)
+
+
+def _gzip_file(path):
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
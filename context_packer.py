@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+
+from retriever.chunk_faqs import sentence_units
+
+# Whole prompt (system + template + question + context), in tokens.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1024))
+# Optional local tokenizer.json (Hugging Face `tokenizers` format) for
+# exact counts; without it a conservative estimate is used.
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")
+
+UNIT_WORDS = 40         # extractive unit: a sentence, or a 20-word window of a long one
+SHINGLE = 5             # words per shingle for overlap detection
+DUPLICATE_OVERLAP = 0.8  # share of a unit's shingles already packed → duplicate
+MIN_ANSWER_TOKENS = 16  # don't start a passage that can't show at least this much
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w+")
+
+
+# ---------------------- TOKENIZER ----------------------
+
+class Tokenizer:
+    """Counts tokens locally; never calls the API."""
+
+    def __init__(self, path=TOKENIZER_PATH):
+        self.backend = None
+        if path and os.path.exists(path):
+            try:
+                from tokenizers import Tokenizer as HFTokenizer
+                self.backend = HFTokenizer.from_file(path)
+            except ImportError:
+                print("[WARN] TOKENIZER_PATH set but `tokenizers` not installed; estimating")
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.backend is not None:
+            return len(self.backend.encode(text, add_special_tokens=False).ids)
+        # BPE vocabularies average ~4 characters per token on English;
+        # punctuation and short words are one token each.
+        return sum(max(1, (len(p) + 3) // 4) for p in _PIECE.findall(text))
+
+    def count_messages(self, messages):
+        # ~4 tokens of chat-template framing per message
+        return sum(self.count(m["content"]) + 4 for m in messages)
+
+
+TOKENIZER = Tokenizer()
+
+STATS = {"packed": 0, "prompt_tokens": 0, "trimmed": 0, "deduped": 0, "dropped": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**kwargs):
+    with _stats_lock:
+        for key, n in kwargs.items():
+            STATS[key] += n
+
+
+# ---------------------- PACKING ----------------------
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def _select(units, query_terms, allowance, tokenizer):
+    """Pick the units most relevant to the query that fit ``allowance``.
+
+    ``units`` is [(position, text, tokens, gap)]; returns the chosen units
+    in their original order.
+    """
+    if sum(u[2] for u in units) <= allowance:
+        return units
+
+    def relevance(unit):
+        return len(query_terms & set(_WORD.findall(unit[1].lower())))
+
+    chosen, used = [], 0
+    for unit in sorted(units, key=lambda u: (-relevance(u), u[0])):
+        if used + unit[2] <= allowance:
+            chosen.append(unit)
+            used += unit[2]
+
+    if not chosen:
+        # Even the best unit is too long: keep its head.
+        pos, text, _, gap = max(units, key=lambda u: (relevance(u), -u[0]))
+        words = text.split()
+        while words and tokenizer.count(" ".join(words)) > allowance:
+            words = words[:max(1, len(words) * 3 // 4)] if len(words) > 1 else []
+        if words:
+            head = " ".join(words)
+            chosen = [(pos, head + " …", tokenizer.count(head), gap)]
+
+    return sorted(chosen)
+
+
+def _join(units):
+    parts = []
+    last = None
+    for pos, text, _, gap in units:
+        if last is not None:
+            parts.append(gap if pos == last + 1 else " … ")
+        parts.append(text)
+        last = pos
+    return "".join(parts)
+
+
+def pack_context(user_query, retrieved, budget, tokenizer=TOKENIZER):
+    """Build the context block for ``retrieved`` within ``budget`` tokens.
+
+    Passages are taken in rank order. Sentences that repeat what is
+    already packed (overlapping chunks, repeated table rows) are dropped;
+    answers that don't fit are cut down extractively to the sentences
+    sharing the most words with the question. Passages with the same
+    question are merged under one ``Q:`` line.
+
+    Returns (context text, stats dict).
+    """
+    query_terms = {w for w in _WORD.findall(user_query.lower()) if len(w) > 2}
+    seen = set()
+    blocks = {}  # question → packed answer texts, in rank order
+    remaining = budget
+    stats = {"passages": 0, "trimmed": 0, "deduped": 0, "dropped": 0}
+
+    for item in retrieved:
+        question = item["question"]
+        overhead = tokenizer.count(f"Q: {question}\nA: \n\n") if question not in blocks else 2
+        allowance = remaining - overhead
+        if allowance < MIN_ANSWER_TOKENS:
+            stats["dropped"] += 1
+            continue
+
+        answer = item["answer"]
+        units = []
+        prev_end = 0
+        for pos, (start, end, _) in enumerate(sentence_units(answer, UNIT_WORDS, UNIT_WORDS // 2)):
+            text, gap = answer[start:end], answer[prev_end:start]
+            prev_end = end
+            sh = _shingles(text)
+            if sh and len(sh & seen) >= DUPLICATE_OVERLAP * len(sh):
+                stats["deduped"] += 1
+                continue
+            units.append((pos, text, tokenizer.count(text), gap))
+        if not units:
+            stats["dropped"] += 1
+            continue
+
+        chosen = _select(units, query_terms, allowance, tokenizer)
+        if not chosen:
+            stats["dropped"] += 1
+            continue
+        if len(chosen) < len(units) or chosen[-1][1].endswith(" …"):
+            stats["trimmed"] += 1
+
+        for unit in chosen:
+            seen |= _shingles(unit[1])
+        text = _join(chosen)
+        blocks.setdefault(question, []).append(text)
+        remaining -= overhead + tokenizer.count(text)
+        stats["passages"] += 1
+
+    context = "\n\n".join(
+        f"Q: {question}\nA: {' … '.join(answers)}" for question, answers in blocks.items()
+    )
+    stats["context_tokens"] = tokenizer.count(context)
+    return context, stats
+
+
+def record(stats, prompt_tokens):
+    """Add one packed prompt to the process-wide counters."""
+    stats["prompt_tokens"] = prompt_tokens
+    _count(packed=1, prompt_tokens=prompt_tokens, trimmed=stats["trimmed"],
+           deduped=stats["deduped"], dropped=stats["dropped"])
+    return stats
+
+
+def snapshot():
+    with _stats_lock:
+        data = dict(STATS)
+    data["avg_prompt_tokens"] = round(data["prompt_tokens"] / data["packed"], 1) if data["packed"] else 0.0
+    data["budget"] = PROMPT_TOKEN_BUDGET
+    data["tokenizer"] = "tokenizers" if TOKENIZER.backend is not None else "estimate"
+    return data
@@ -0,0 +1,493 @@
+"""Offline retrieval quality vs. speed evaluation.
+
+Runs a labeled query → FAQ set through every retriever configuration
+(single backends, TF-IDF variants, fused combinations) and reports
+recall@k, MRR, precision/recall of the context-vs-no-context decision
+over a sweep of confidence thresholds, and per-query latency, side by
+side:
+
+    python evaluate.py bootstrap       # writes data/eval_queries.jsonl
+    python evaluate.py run --out bench/eval.json
+
+The labeled set is JSONL, one {"query", "expected", "source"} per line.
+``expected`` lists the FAQ questions that answer the query; [] marks a
+query no FAQ answers (it should get no context) and null one that still
+needs a label (skipped). Bootstrapping paraphrases the FAQ questions,
+takes fragments of the answers, adds off-topic negatives, and labels
+logged user messages where all backends agree; review the "log:todo"
+entries by hand.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from benchmark import git_commit, logged_messages, quiet, summarize, write_results
+
+FAQ_PATH = os.path.join("data", "faqs_final.json")
+EVAL_PATH = os.path.join("data", "eval_queries.jsonl")
+
+# Same settings (and defaults) as app.py.
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.25))
+DENSE_SIMILARITY_THRESHOLD = float(os.getenv("DENSE_SIMILARITY_THRESHOLD", 0.5))
+BM25_SIMILARITY_THRESHOLD = float(os.getenv("BM25_SIMILARITY_THRESHOLD", 4.0))
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
+
+THRESHOLD_ENV = {
+    "tfidf": "SIMILARITY_THRESHOLD",
+    "bm25": "BM25_SIMILARITY_THRESHOLD",
+    "dense": "DENSE_SIMILARITY_THRESHOLD",
+}
+
+# TF-IDF settings tried besides the production one (make_vectorizer).
+TFIDF_VARIANTS = {
+    "bigrams": {"ngram_range": (1, 2)},
+    "sublinear": {"sublinear_tf": True},
+    "char": {"analyzer": "char_wb", "ngram_range": (3, 5), "stop_words": None},
+}
+
+KS = (1, 3, 5, 10)
+THRESHOLDS = [round(0.05 * i, 2) for i in range(1, 20)]
+
+
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+# ---------------------- LABELED SET ----------------------
+
+SYNONYMS = {
+    "programs": "courses", "program": "course", "offered": "available",
+    "fee": "fees", "fees": "cost", "contact": "reach", "university": "college",
+    "supervisors": "guides", "supervisor": "guide", "department": "dept",
+    "faculty": "teachers", "admission": "joining", "phone": "number",
+}
+
+NEGATIVES = [
+    "hi", "how are you", "who are you", "tell me a joke",
+    "what is the weather today", "who won the cricket world cup",
+    "what is the capital of france", "write a python function to reverse a list",
+    "recommend a good movie", "what time is it", "translate hello into french",
+    "thanks, bye",
+]
+
+
+def words(text):
+    return "".join(c if c.isalnum() else " " for c in text.lower()).split()
+
+
+def paraphrases(question, rng):
+    """(kind, query) rewrites of one FAQ question."""
+    tokens = words(question)
+    content = [w for w in tokens if w not in ENGLISH_STOP_WORDS]
+    out = [("paraphrase:keywords", " ".join(content))]
+
+    shuffled = content[:]
+    rng.shuffle(shuffled)
+    out.append(("paraphrase:shuffled", " ".join(shuffled)))
+
+    swapped = [SYNONYMS.get(w, w) for w in tokens]
+    if swapped != tokens:
+        out.append(("paraphrase:synonyms", " ".join(swapped)))
+
+    longest = max(range(len(tokens)), key=lambda i: len(tokens[i]), default=None)
+    w = tokens[longest] if longest is not None else ""
+    swaps = [i for i in range(1, len(w) - 2) if w[i] != w[i + 1]]
+    if len(w) > 4 and swaps:
+        i = rng.choice(swaps)
+        typo = tokens[:]
+        typo[longest] = w[:i] + w[i + 1] + w[i] + w[i + 2:]
+        out.append(("paraphrase:typo", " ".join(typo)))
+
+    n = min(len(content), rng.randint(2, 4))
+    start = rng.randint(0, len(content) - n) if content else 0
+    out.append(("paraphrase:fragment", " ".join(content[start:start + n])))
+
+    seen, unique = {normalize(question)}, []
+    for kind, query in out:
+        if query and normalize(query) not in seen:
+            seen.add(normalize(query))
+            unique.append((kind, query))
+    return unique
+
+
+def answer_fragment(answer, rng):
+    """3–6 content words from an answer (passage), as a user might ask."""
+    content = [w for w in words(answer) if w not in ENGLISH_STOP_WORDS and not w.isdigit()]
+    if len(content) < 3:
+        return None
+    n = min(len(content), rng.randint(3, 6))
+    start = rng.randint(0, len(content) - n)
+    return " ".join(content[start:start + n])
+
+
+def bootstrap(faq_path=FAQ_PATH, out_path=EVAL_PATH, seed=0):
+    """Write a first labeled set; logged messages are silver-labeled."""
+    rng = random.Random(seed)
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    records, seen = [], set()
+
+    def add(query, expected, source):
+        key = normalize(query)
+        if key and key not in seen:
+            seen.add(key)
+            records.append({"query": query, "expected": expected, "source": source})
+
+    questions = list(dict.fromkeys(x["question"] for x in faqs))
+    for question in questions:
+        for kind, query in paraphrases(question, rng):
+            add(query, [question], kind)
+    for faq in faqs:
+        fragment = answer_fragment(faq["answer"], rng)
+        if fragment:
+            add(fragment, [faq["question"]], "answer:fragment")
+    for query in NEGATIVES:
+        add(query, [], "negative")
+
+    logged = list(dict.fromkeys(q.strip('"\' ') for q in logged_messages()))
+    if logged:
+        index_root = tempfile.mkdtemp(prefix="eval-index-")
+        try:
+            singles = build_retrievers(faq_path, index_root, variants=())
+            for query, label, source in label_logged(logged, singles):
+                add(query, label, source)
+        finally:
+            shutil.rmtree(index_root, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    counts = {}
+    for record in records:
+        counts[record["source"]] = counts.get(record["source"], 0) + 1
+    print(f"[DONE] {len(records)} labeled queries → {out_path}")
+    print(f"[COUNT] {counts}")
+    return records
+
+
+def content_words(text):
+    return {w for w in words(text) if w not in ENGLISH_STOP_WORDS}
+
+
+def label_logged(queries, singles, coverage=0.8, reject=0.2):
+    """Silver labels for logged messages.
+
+    Labeled with the top question when every backend returns the same
+    one and it contains at least ``coverage`` of the message's content
+    words (calibrated confidence saturates on a single shared term like
+    "university", so it cannot be used here); as unanswerable when no
+    backend reaches confidence ``reject``; left for review otherwise.
+    """
+    from retriever import ranking
+
+    # The whole log in one batch: not subject to the serving time limit.
+    runs = {name: ranking.rank_many(queries, {name: r}, 1, retrieval_timeout_ms=None)
+            for name, r in singles.items()}
+    for qi, query in enumerate(queries):
+        tops = [run[qi][0] if run[qi] else None for run in runs.values()]
+        best = max((t["confidence"] for t in tops if t), default=0.0)
+        answers = {t["question"] for t in tops if t}
+        asked = content_words(query)
+        covered = 0.0
+        if asked and len(answers) == 1:
+            covered = len(asked & content_words(next(iter(answers)))) / len(asked)
+        if all(tops) and covered >= coverage:
+            yield query, sorted(answers), "log:silver"
+        elif best < reject:
+            yield query, [], "log:negative"
+        else:
+            yield query, None, "log:todo"
+
+
+def load_labeled(path=EVAL_PATH, faq_questions=None):
+    """Labeled queries; unlabeled and stale entries are skipped."""
+    records, todo, stale = [], 0, 0
+    known = {normalize(q) for q in faq_questions} if faq_questions else None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("expected") is None:
+                todo += 1
+                continue
+            expected = {normalize(q) for q in record["expected"]}
+            if known is not None and not expected <= known:
+                stale += 1
+                continue
+            records.append(dict(record, expected=expected))
+    if todo or stale:
+        print(f"[WARN] Skipped {todo} unlabeled and {stale} stale queries in {path}")
+    return records
+
+
+# ---------------------- CONFIGURATIONS ----------------------
+
+def build_retrievers(faq_path, index_root, variants=TFIDF_VARIANTS):
+    """Single-backend Retrievers, built in ``index_root``."""
+    from retriever import ranking, search
+    from retriever.bm25 import build_bm25_index, load_bm25_index
+    from retriever.build_index import TfidfIndex, build_index, load_index, make_vectorizer
+
+    with quiet():
+        build_index(faq_path, index_root, True)
+        build_bm25_index(faq_path, index_root, True)
+    tfidf = load_index(faq_path, index_root, False)
+    bm25 = load_bm25_index(faq_path, index_root, tfidf.faqs, False)
+
+    def tfidf_retriever(name, index):
+        return ranking.Retriever(
+            name, lambda qs, k: search.retrieve_many(index, qs, k), SIMILARITY_THRESHOLD
+        )
+
+    singles = {
+        "tfidf": tfidf_retriever("tfidf", tfidf),
+        "bm25": ranking.Retriever("bm25", bm25.search_many, BM25_SIMILARITY_THRESHOLD,
+                                  slope=1.0),
+    }
+
+    # Variants are fitted in memory only; nothing is written for them.
+    for variant in variants:
+        vectorizer = make_vectorizer(**TFIDF_VARIANTS[variant])
+        matrix = vectorizer.fit_transform(tfidf.questions).tocsr()
+        meta = dict(tfidf.meta, n_terms=matrix.shape[1])
+        index = TfidfIndex(None, tfidf.faqs, meta, vectorizer, matrix)
+        singles[f"tfidf:{variant}"] = tfidf_retriever(f"tfidf:{variant}", index)
+
+    if os.getenv("EMBEDDING_MODEL_PATH"):
+        from retriever.dense import Embedder, build_dense_index, load_dense_index
+        embedder = Embedder()
+        with quiet():
+            build_dense_index(faq_path, index_root, embedder, force=True)
+        dense = load_dense_index(faq_path, index_root, embedder, tfidf.faqs, False)
+        singles["dense"] = ranking.Retriever("dense", dense.search_many,
+                                             DENSE_SIMILARITY_THRESHOLD)
+    return singles
+
+
+def configurations(singles):
+    """name → (retrievers, fusion, reranker) for every setup to compare."""
+    configs = {name: ({name: r}, "rrf", None) for name, r in singles.items()}
+
+    base = [name for name in ("tfidf", "bm25", "dense") if name in singles]
+    combos = [(a, b) for i, a in enumerate(base) for b in base[i + 1:]]
+    if len(base) > 2:
+        combos.append(tuple(base))
+    for combo in combos:
+        retrievers = {name: singles[name] for name in combo}
+        for fusion in ("rrf", "weighted"):
+            configs[f"{'+'.join(combo)} ({fusion})"] = (retrievers, fusion, None)
+
+    if os.getenv("RERANKER_MODEL_PATH"):
+        from retriever.ranking import CrossEncoderReranker
+        reranker = CrossEncoderReranker(os.getenv("RERANKER_MODEL_PATH"))
+        for name in list(configs):
+            retrievers, fusion, _ = configs[name]
+            configs[f"{name} +rerank"] = (retrievers, fusion, reranker)
+    return configs
+
+
+# ---------------------- METRICS ----------------------
+
+def run_config(records, retrievers, fusion, reranker):
+    """Per-query rank of the first relevant result, top confidence and latency."""
+    from retriever import ranking
+
+    rows = []
+    ranking.rank_many([records[0]["query"]], retrievers, max(KS), reranker, fusion)  # warm-up
+    for record in records:
+        start = time.perf_counter()
+        results = ranking.rank_many([record["query"]], retrievers, max(KS), reranker, fusion)[0]
+        seconds = time.perf_counter() - start
+
+        rank = next((i + 1 for i, r in enumerate(results)
+                     if normalize(r["question"]) in record["expected"]), None)
+        rows.append({
+            "source": record["source"],
+            "answerable": bool(record["expected"]),
+            "rank": rank,
+            "confidence": results[0]["confidence"] if results else 0.0,
+            "seconds": seconds,
+        })
+    return rows
+
+
+def grounding(rows, threshold, top_k):
+    """Precision/recall of "use context" at ``threshold``.
+
+    Using context is correct when the query is answerable and a relevant
+    FAQ is in the top ``top_k`` (what the prompt would contain).
+    """
+    answerable = sum(r["answerable"] for r in rows)
+    tp = fp = 0
+    for r in rows:
+        if r["confidence"] < threshold:
+            continue
+        if r["rank"] is not None and r["rank"] <= top_k:
+            tp += 1
+        else:
+            fp += 1
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / answerable if answerable else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"threshold": threshold, "precision": round(precision, 4),
+            "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def score(rows, top_k):
+    answerable = [r for r in rows if r["answerable"]]
+    n = len(answerable) or 1
+    recall = {f"recall@{k}": round(sum(r["rank"] is not None and r["rank"] <= k
+                                       for r in answerable) / n, 4) for k in KS}
+    mrr = sum(1.0 / r["rank"] for r in answerable if r["rank"]) / n
+
+    by_source = {}
+    for r in answerable:
+        hits, total = by_source.get(r["source"], (0, 0))
+        by_source[r["source"]] = (hits + (r["rank"] is not None and r["rank"] <= top_k), total + 1)
+
+    curve = [grounding(rows, t, top_k) for t in THRESHOLDS]
+    best = max(curve, key=lambda c: (c["f1"], c["precision"]))
+    return {
+        **recall,
+        "mrr": round(mrr, 4),
+        f"recall@{top_k}_by_source": {s: round(h / t, 4) for s, (h, t) in sorted(by_source.items())},
+        "grounding": grounding(rows, CONFIDENCE_THRESHOLD, top_k),
+        "best_grounding": best,
+        "grounding_curve": curve,
+        "latency": summarize([r["seconds"] for r in rows]),
+    }
+
+
+def raw_threshold(retriever, confidence):
+    """The raw score whose calibrated confidence is ``confidence``."""
+    return round(retriever.midpoint + math.log(confidence / (1 - confidence)) / retriever.slope, 4)
+
+
+def recommend(results, top_k, min_recall, min_precision):
+    """Cheapest configuration (p50 latency) that meets both targets.
+
+    Its threshold is the one with the best grounding recall among those
+    with precision >= ``min_precision``.
+    """
+    best = None
+    for name, result in results.items():
+        if result[f"recall@{top_k}"] < min_recall:
+            continue
+        ok = [c for c in result["grounding_curve"] if c["precision"] >= min_precision]
+        if not ok:
+            continue
+        point = max(ok, key=lambda c: (c["recall"], c["threshold"]))
+        if best is None or result["latency"]["p50_ms"] < best[1]["latency"]["p50_ms"]:
+            best = (name, result, point)
+    if best is None:
+        return None
+
+    name, result, point = best
+    settings = {"CONFIDENCE_THRESHOLD": point["threshold"]}
+    if "raw_thresholds" in result:
+        settings = {result["raw_thresholds"]["env"]: result["raw_thresholds"][str(point["threshold"])],
+                    "CONFIDENCE_THRESHOLD": CONFIDENCE_THRESHOLD}
+    return {"config": name, "grounding": point, "p50_ms": result["latency"]["p50_ms"],
+            "settings": settings}
+
+
+# ---------------------- REPORT ----------------------
+
+def evaluate(eval_path, faq_path, top_k, variants, min_recall, min_precision):
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faq_questions = [x["question"] for x in json.load(f)]
+    records = load_labeled(eval_path, faq_questions)
+    if not records:
+        raise SystemExit(f"No labeled queries in {eval_path}; run `python evaluate.py bootstrap`")
+
+    index_root = tempfile.mkdtemp(prefix="eval-index-")
+    try:
+        singles = build_retrievers(faq_path, index_root, variants)
+        results = {}
+        for name, (retrievers, fusion, reranker) in configurations(singles).items():
+            result = score(run_config(records, retrievers, fusion, reranker), top_k)
+            if len(retrievers) == 1 and reranker is None:
+                (backend, r), = retrievers.items()
+                result["raw_thresholds"] = {
+                    "env": THRESHOLD_ENV.get(backend.split(":")[0]),
+                    **{str(t): raw_threshold(r, t) for t in THRESHOLDS},
+                }
+            results[name] = result
+    finally:
+        shutil.rmtree(index_root, ignore_errors=True)
+
+    print_table(results, top_k, len(records))
+    choice = recommend(results, top_k, min_recall, min_precision)
+    if choice:
+        print(f"[EVAL] Cheapest config with recall@{top_k} >= {min_recall} and "
+              f"precision >= {min_precision}: {choice['config']} {choice['settings']}")
+    else:
+        print(f"[EVAL] No config meets recall@{top_k} >= {min_recall} and "
+              f"precision >= {min_precision}")
+    return {"queries": len(records), "top_k": top_k, "configs": results, "recommended": choice}
+
+
+def print_table(results, top_k, n_queries):
+    print(f"[EVAL] {n_queries} labeled queries, context = top {top_k}, "
+          f"CONFIDENCE_THRESHOLD = {CONFIDENCE_THRESHOLD}")
+    header = (f"{'config':28s} {'R@1':>6} {'R@3':>6} {'R@5':>6} {'MRR':>6} "
+              f"{'P@thr':>6} {'R@thr':>6} {'best':>5} {'F1':>6} {'p50ms':>7} {'p95ms':>7}")
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        g, b, lat = r["grounding"], r["best_grounding"], r["latency"]
+        print(f"{name:28s} {r['recall@1']:6.3f} {r['recall@3']:6.3f} {r['recall@5']:6.3f} "
+              f"{r['mrr']:6.3f} {g['precision']:6.3f} {g['recall']:6.3f} {b['threshold']:5.2f} "
+              f"{b['f1']:6.3f} {lat['p50_ms']:7.3f} {lat['p95_ms']:7.3f}")
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval quality vs. speed evaluation")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("bootstrap", help="write a first labeled query set")
+    p.add_argument("--out", default=EVAL_PATH)
+    p.add_argument("--seed", type=int, default=0)
+
+    p = sub.add_parser("run", help="evaluate every retriever configuration")
+    p.add_argument("--queries", default=EVAL_PATH, help="labeled JSONL set")
+    p.add_argument("--top-k", type=int, default=3, help="passages put in the prompt")
+    p.add_argument("--variants", default=",".join(TFIDF_VARIANTS),
+                   help="TF-IDF variants to try besides the default (empty for none)")
+    p.add_argument("--min-recall", type=float, default=0.9)
+    p.add_argument("--min-precision", type=float, default=0.8)
+    p.add_argument("--out", help="write JSON results here (default: stdout)")
+
+    args = parser.parse_args()
+    if args.command == "bootstrap":
+        bootstrap(FAQ_PATH, args.out, args.seed)
+        sys.exit(0)
+
+    variants = [v.strip() for v in args.variants.split(",") if v.strip()]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "eval": evaluate(args.queries, FAQ_PATH, args.top_k, variants,
+                         args.min_recall, args.min_precision),
+    }
+    write_results(results, args.out)
@@ -0,0 +1,163 @@
+"""Local stand-in for the Groq chat completions API.
+
+Speaks the OpenAI-compatible wire format on
+/openai/v1/chat/completions (blocking and stream=true), so the app can
+be pointed at it with GROQ_BASE_URL=http://127.0.0.1:8008 for tests and
+benchmarks without network access or API spend.
+
+    python fake_llm.py --port 8008 --latency 0.8 --token-delay 0.02
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMConfig:
+    def __init__(self, latency=0.5, token_delay=0.0, fail_rate=0.0, words=40, fail_first=0):
+        self.latency = latency          # seconds before the first token
+        self.token_delay = token_delay  # seconds between streamed tokens
+        self.fail_rate = fail_rate      # fraction of calls answered with 503
+        self.fail_first = fail_first    # the first N calls are answered with 503
+        self.words = words              # reply length
+        self.calls = 0
+        self.lock = threading.Lock()
+
+
+def fake_reply(messages, words):
+    question = messages[-1]["content"].strip().splitlines()[0][:80] if messages else ""
+    filler = ["GMU", "is", "happy", "to", "help", "with", "that", "😊"]
+    body = " ".join(filler[i % len(filler)] for i in range(words))
+    return f"Fake answer to: {question}. {body}"
+
+
+def make_handler(config):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._json(404, {"error": {"message": "not found"}})
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            with config.lock:
+                config.calls += 1
+                failing = config.calls <= config.fail_first
+
+            if failing or (config.fail_rate and random.random() < config.fail_rate):
+                return self._json(503, {"error": {"message": "fake overload"}})
+
+            time.sleep(config.latency)
+
+            messages = body.get("messages", [])
+            text = fake_reply(messages, min(config.words, body.get("max_tokens") or config.words))
+            prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(text.split()),
+                "total_tokens": prompt_tokens + len(text.split()),
+            }
+
+            if body.get("stream"):
+                return self._stream(body, text, usage)
+
+            self._json(200, {
+                "id": "fake-1",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        def _json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # client timed out
+
+        def _stream(self, body, text, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def event(delta, finish=None, extra=None):
+                chunk = {
+                    "id": "fake-1",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                }
+                if extra:
+                    chunk.update(extra)
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            try:
+                event({"role": "assistant", "content": ""})
+                for word in text.split(" "):
+                    event({"content": word + " "})
+                    if config.token_delay:
+                        time.sleep(config.token_delay)
+                event({}, "stop", {"x_groq": {"usage": usage}})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled the stream
+            self.close_connection = True
+
+    return Handler
+
+
+def serve_in_thread(host="127.0.0.1", port=0, **config_kwargs):
+    """Start the fake server in a daemon thread.
+
+    Returns (server, base_url, config); call ``server.shutdown()`` to stop.
+    """
+    config = FakeLLMConfig(**config_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}", config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(args.latency, args.token_delay, args.fail_rate, args.words,
+                           args.fail_first)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"[FAKE LLM] Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
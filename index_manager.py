@@ -0,0 +1,132 @@
+import os
+import time
+import threading
+
+import metrics
+from retriever.build_index import FAQ_PATH, load_index
+from retriever.utils import file_hash
+
+
+WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", 5))  # 0 disables
+
+
+class Snapshot:
+    """Every index built from one faqs_final.json, published together."""
+
+    def __init__(self, tfidf, dense=None, bm25=None):
+        self.tfidf = tfidf
+        self.dense = dense
+        self.bm25 = bm25
+        self.version = tfidf.version
+        self.meta = tfidf.meta
+
+    def transform(self, texts):
+        return self.tfidf.transform(texts)
+
+
+class IndexManager:
+    """Owns the current retrieval index snapshot and swaps it on reload.
+
+    Snapshots are immutable. Requests read ``manager.current`` once and
+    use that object to the end, so a reload never blocks the hot path
+    and in-flight requests finish on the snapshot they started with. A
+    new index is built in the background and published with a single
+    reference assignment.
+    """
+
+    def __init__(self, faq_path=FAQ_PATH, watch_interval=WATCH_INTERVAL, dense=False,
+                 bm25=False):
+        self.faq_path = faq_path
+        self.watch_interval = watch_interval
+        self.bm25 = bm25
+        self.embedder = None
+        if dense:
+            from retriever.dense import Embedder
+            self.embedder = Embedder()  # model load happens once, not per reload
+
+        start = time.monotonic()
+        self.current = self._load()
+
+        self.stats = {
+            "version": self.current.version,
+            "loaded_at": time.time(),
+            "reloads": 0,
+            "reload_errors": 0,
+            "last_reload_seconds": time.monotonic() - start,
+            "last_error": None,
+        }
+        self._reload_lock = threading.Lock()
+        self._file_sig = self._signature()
+        self._watcher = None
+
+    # ---- reload ----
+
+    def reload(self, force=False):
+        """Build/load the index for the current FAQ file and swap it in.
+
+        Returns True if a new snapshot was published. Concurrent reloads
+        are serialized; the hot path never takes this lock.
+        """
+        with self._reload_lock:
+            start = time.monotonic()
+            try:
+                if not force and file_hash(self.faq_path) == self.current.meta["faq_hash"]:
+                    return False
+                snapshot = self._load()
+            except Exception as e:
+                self.stats["reload_errors"] += 1
+                self.stats["last_error"] = str(e)
+                metrics.record_error("index_reload", e, faq_path=self.faq_path)
+                return False
+
+            self.current = snapshot  # atomic publish
+            self.stats.update({
+                "version": snapshot.version,
+                "loaded_at": time.time(),
+                "reloads": self.stats["reloads"] + 1,
+                "last_reload_seconds": time.monotonic() - start,
+                "last_error": None,
+            })
+            print(f"[INDEX] Reloaded {snapshot.version} in {self.stats['last_reload_seconds']:.3f}s")
+            return True
+
+    def _load(self):
+        tfidf = load_index(self.faq_path)
+        dense = None
+        if self.embedder is not None:
+            from retriever.dense import load_dense_index
+            dense = load_dense_index(self.faq_path, embedder=self.embedder, faqs=tfidf.faqs)
+        bm25 = None
+        if self.bm25:
+            from retriever.bm25 import load_bm25_index
+            bm25 = load_bm25_index(self.faq_path, faqs=tfidf.faqs)
+        return Snapshot(tfidf, dense, bm25)
+
+    def reload_async(self, force=False):
+        thread = threading.Thread(target=self.reload, args=(force,), daemon=True)
+        thread.start()
+        return thread
+
+    # ---- file watcher ----
+
+    def _signature(self):
+        try:
+            st = os.stat(self.faq_path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            sig = self._signature()
+            if sig is not None and sig != self._file_sig:
+                self._file_sig = sig
+                self.reload()
+
+    def start_watching(self):
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return self
+        self._watcher = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        return self
@@ -0,0 +1,121 @@
+import os
+import random
+import asyncio
+
+import httpx
+from groq import (
+    AsyncGroq,
+    APIConnectionError,
+    InternalServerError,
+    RateLimitError,
+)
+
+
+MODEL = "llama-3.1-8b-instant"
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 64))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT", 30))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.25))
+BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", 4.0))
+
+# Connection errors (incl. timeouts), 429 and 5xx are worth retrying;
+# 4xx request errors are not.
+RETRYABLE = (APIConnectionError, RateLimitError, InternalServerError)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AsyncLLM:
+    """Async Groq chat client shared by all requests of one process.
+
+    One pooled HTTP client, a semaphore bounding in-flight upstream calls,
+    a per-call timeout and retry with jittered backoff. ``GROQ_BASE_URL``
+    can point it at a local fake server (see fake_llm.py).
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_concurrency=MAX_CONCURRENCY,
+                 max_connections=MAX_CONNECTIONS, timeout=TIMEOUT_SECONDS,
+                 max_retries=MAX_RETRIES):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout, connect=5.0),
+        )
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self._http,
+            max_retries=0,  # retries are ours, with jitter
+        )
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "in_flight": 0}
+
+    async def close(self):
+        await self.client.close()
+
+    async def chat(self, messages, max_tokens=500, temperature=0.7):
+        """Return the completion text."""
+        async with self._semaphore:
+            self.stats["in_flight"] += 1
+            try:
+                completion = await self._create(
+                    messages=messages, max_tokens=max_tokens, temperature=temperature
+                )
+                return completion.choices[0].message.content
+            finally:
+                self.stats["in_flight"] -= 1
+
+    async def stream(self, messages, max_tokens=500, temperature=0.7):
+        """Async generator of text deltas.
+
+        Only opening the stream is retried; once tokens have been sent to
+        the client a failure is raised to the caller. Closing the
+        generator closes the upstream response.
+        """
+        async with self._semaphore:
+            self.stats["in_flight"] += 1
+            try:
+                stream = await self._create(
+                    messages=messages, max_tokens=max_tokens,
+                    temperature=temperature, stream=True,
+                )
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            yield delta
+                finally:
+                    await stream.close()
+            finally:
+                self.stats["in_flight"] -= 1
+
+    async def _create(self, **kwargs):
+        attempt = 0
+        while True:
+            self.stats["calls"] += 1
+            try:
+                return await asyncio.wait_for(
+                    self.client.chat.completions.create(model=MODEL, **kwargs),
+                    self.timeout,
+                )
+            except (asyncio.TimeoutError, *RETRYABLE) as e:
+                if attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                delay = backoff_delay(attempt)
+                attempt += 1
+                print(f"[WARN] LLM call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.0))  # 0..1 of requests
+ERROR_LOG_PATH = os.path.join(os.getenv("CHAT_LOG_DIR", "logs"), "errors.log")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+# ---------------------- METRIC TYPES ----------------------
+#
+# A minimal in-process Prometheus registry: one lock per metric, values
+# keyed by label tuple, rendered in the text exposition format on
+# demand. Cheap enough for the request hot path (a few µs per update).
+
+REGISTRY = []
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, n=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels → [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, row):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {row[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {row[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Collected:
+    """Values read from an existing stats dict at scrape time.
+
+    ``fn()`` returns {label value (or tuple): number}; with no labels,
+    a plain number.
+    """
+
+    def __init__(self, name, help, fn, kind="gauge", labelnames=()):
+        self.name, self.help, self.fn = name, help, fn
+        self.kind, self.labelnames = kind, tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self):
+        try:
+            values = self.fn()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(values.items(), key=lambda kv: str(kv[0])):
+            if value is None:
+                continue
+            key = key if isinstance(key, tuple) else (key,)
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {float(value)}")
+        return lines
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ---------------------- REQUEST METRICS ----------------------
+
+REQUESTS = Counter("gmu_requests_total", "Chat requests by route and outcome", ("route", "status"))
+REQUEST_SECONDS = Histogram("gmu_request_seconds", "Chat request latency", ("route",))
+STAGE_SECONDS = Histogram("gmu_stage_seconds", "Time per request stage", ("stage",))
+ANSWERS = Counter("gmu_answers_total", "Answers by how they were produced", ("mode",))
+CONFIDENCE = Histogram("gmu_retrieval_confidence", "Calibrated confidence of the top result",
+                       buckets=SCORE_BUCKETS)
+LLM_TOKENS = Counter("gmu_llm_tokens_total", "Upstream LLM tokens", ("kind",))
+ERRORS = Counter("gmu_errors_total", "Errors by where they happened", ("where",))
+
+
+def finish_request(route, status, start):
+    """Count a finished request; ``start`` is its time.monotonic()."""
+    REQUESTS.inc(route=route, status=status)
+    REQUEST_SECONDS.observe(time.monotonic() - start, route=route)
+
+
+# ---------------------- STAGES / TRACES ----------------------
+
+_trace = contextvars.ContextVar("gmu_trace", default=None)
+
+
+def start_trace(route, sample_rate=None):
+    """Begin a request; it is traced with probability TRACE_SAMPLE_RATE."""
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    trace = None
+    if rate and random.random() < rate:
+        trace = {"route": route, "start": time.monotonic(), "stages_ms": {}}
+    _trace.set(trace)
+    return trace
+
+
+def finish_trace():
+    """The current request's trace (with total_ms), or None if not sampled."""
+    trace = _trace.get()
+    if trace is None:
+        return None
+    _trace.set(None)
+    return {
+        "route": trace["route"],
+        "total_ms": round((time.monotonic() - trace["start"]) * 1000.0, 3),
+        "stages_ms": {k: round(v, 3) for k, v in trace["stages_ms"].items()},
+    }
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _trace.get()
+    if trace is not None:
+        stages = trace["stages_ms"]
+        stages[name] = stages.get(name, 0.0) + seconds * 1000.0
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+# ---------------------- ERRORS ----------------------
+
+_error_log = None
+_error_log_lock = threading.Lock()
+
+
+def _error_logger():
+    global _error_log
+    with _error_log_lock:
+        if _error_log is None:
+            logger = logging.getLogger("gmu.errors")
+            logger.propagate = False
+            try:
+                os.makedirs(os.path.dirname(ERROR_LOG_PATH) or ".", exist_ok=True)
+                handler = RotatingFileHandler(ERROR_LOG_PATH, maxBytes=5 * 1024 * 1024,
+                                              backupCount=3, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger.addHandler(handler)
+            except OSError as e:
+                print(f"[WARN] Cannot open {ERROR_LOG_PATH}: {e}")
+            _error_log = logger
+    return _error_log
+
+
+def record_error(where, error, **context):
+    """Count an error and append it to logs/errors.log."""
+    ERRORS.inc(where=where)
+    details = " ".join(f"{k}={v!r}" for k, v in context.items())
+    _error_logger().error(f"[{where}] {type(error).__name__}: {error} {details}".rstrip(),
+                          exc_info=error if isinstance(error, BaseException) else None)
@@ -0,0 +1,278 @@
+"""Grounded answers for the canonical FAQ questions, generated offline.
+
+    python precomputed_answers.py --workers 4
+
+generates one LLM answer per distinct question in faqs_final.json, with
+all of its passages as context, and appends it to
+data/precomputed_answers.jsonl as soon as it is done, so an interrupted
+run resumes where it stopped. Each entry carries a hash of the question
+and its answers; a rerun regenerates only questions whose content
+changed (``--force`` regenerates everything, e.g. after a prompt change).
+
+At serving time a query whose TF-IDF cosine with a retrieved FAQ
+question reaches PRECOMPUTED_CUTOFF, and whose content words match the
+question's (see answer_cache.same_terms), is answered from here without
+an LLM call, as long as the entry's hash still matches the live FAQ data.
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+from answer_cache import NEAR_MIN_TERMS, content_terms, normalize_query, same_terms
+from retriever.utils import record_hash
+
+
+PRECOMPUTED_PATH = os.getenv("PRECOMPUTED_PATH", os.path.join("data", "precomputed_answers.jsonl"))
+PRECOMPUTED_CUTOFF = float(os.getenv("PRECOMPUTED_CUTOFF", 0.8))  # > 1 disables serving
+# The TF-IDF vocabulary only holds FAQ question words, so "hostel fee for
+# Engineering UG programs" is close to "programs offered under Engineering
+# (UG)". A match also needs shared content words, and more overlap than
+# the answer cache's near tier: a wrong hit here skips the LLM entirely.
+PRECOMPUTED_MIN_TERMS = int(os.getenv("PRECOMPUTED_MIN_TERMS", NEAR_MIN_TERMS))
+PRECOMPUTED_TERM_OVERLAP = float(os.getenv("PRECOMPUTED_TERM_OVERLAP", 0.65))
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", 4))      # parallel LLM calls
+RELOAD_INTERVAL = 5.0  # seconds between checks for a rewritten answers file
+
+
+# ----------------- FAQ GROUPS -----------------
+
+def content_hash(question, passages):
+    return record_hash({"question": question, "answers": [p["answer"] for p in passages]})
+
+
+def faq_groups(faqs):
+    """{normalized question: {"question", "passages", "hash"}} in file order.
+
+    Chunked FAQs share their question, so one group is one canonical
+    question with all of its passages.
+    """
+    groups = {}
+    for faq in faqs:
+        key = normalize_query(faq["question"])
+        group = groups.setdefault(key, {"question": faq["question"], "passages": []})
+        group["passages"].append(faq)
+    for group in groups.values():
+        group["hash"] = content_hash(group["question"], group["passages"])
+    return groups
+
+
+def load_entries(path=PRECOMPUTED_PATH):
+    """Latest entry per normalized question; torn or bad lines are skipped."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                entries[normalize_query(entry["question"])] = entry
+            except (ValueError, KeyError):
+                continue
+    return entries
+
+
+# ----------------- BATCH JOB -----------------
+
+def generate_one(group, messages_fn, chat_fn):
+    passages = [dict(p, id=i, score=1.0, confidence=1.0) for i, p in enumerate(group["passages"])]
+    start = time.monotonic()
+    answer = chat_fn(messages_fn(group["question"], passages))
+    if not answer or not answer.strip():
+        raise ValueError("empty answer")
+    return answer.strip(), time.monotonic() - start
+
+
+def precompute(faqs, messages_fn, chat_fn, path=PRECOMPUTED_PATH,
+               workers=PRECOMPUTE_WORKERS, force=False):
+    """Generate answers for new or changed FAQ questions.
+
+    At most ``workers`` LLM calls run at once. Every finished answer is
+    appended (and fsynced) right away; at the end the file is compacted
+    to the latest entry per current question. Returns a summary dict.
+    """
+    groups = faq_groups(faqs)
+    done = {} if force else load_entries(path)
+    todo = [g for key, g in groups.items() if done.get(key, {}).get("hash") != g["hash"]]
+    print(f"[INFO] {len(groups)} questions: {len(groups) - len(todo)} up to date, "
+          f"{len(todo)} to generate with {workers} workers")
+
+    generated = failed = 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(generate_one, g, messages_fn, chat_fn): g for g in todo}
+        for future in as_completed(futures):
+            group = futures[future]
+            try:
+                answer, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[ERROR] {group['question']}: {e}")
+                continue
+            entry = {
+                "question": group["question"],
+                "hash": group["hash"],
+                "answer": answer,
+                "seconds": round(seconds, 3),
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            generated += 1
+            print(f"[DONE] {group['question']} ({seconds:.1f}s)")
+
+    kept = compact(path, groups)
+    summary = {"questions": len(groups), "generated": generated, "failed": failed,
+               "up_to_date": len(groups) - len(todo), "stored": kept}
+    print(f"[COUNT] {summary}")
+    return summary
+
+
+def compact(path, groups):
+    """Rewrite ``path`` with one entry per question still in the FAQ data."""
+    entries = [e for key, e in load_entries(path).items() if key in groups]
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+# ----------------- SERVING -----------------
+
+class PrecomputedAnswers:
+    """Read side: match a query to a precomputed FAQ answer.
+
+    The file is re-read when it changes on disk. Freshness is checked
+    against the hashes of the index snapshot's FAQ data, recomputed once
+    per snapshot version, so an edited FAQ stops serving its old answer
+    as soon as the new index is live.
+    """
+
+    def __init__(self, path=PRECOMPUTED_PATH, cutoff=PRECOMPUTED_CUTOFF,
+                 min_terms=PRECOMPUTED_MIN_TERMS, term_overlap=PRECOMPUTED_TERM_OVERLAP):
+        self.path = path
+        self.cutoff = cutoff
+        self.min_terms = min_terms
+        self.term_overlap = term_overlap
+        self._entries = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._hashes = {}
+        self._sources = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "answers": 0}
+
+    def match(self, query, retrieved, snapshot):
+        """The precomputed answer for ``query``, or None."""
+        if self.cutoff > 1:
+            return None
+        self._maybe_reload()
+        entries = self._entries  # a reload swaps the whole dict
+
+        candidates = dict.fromkeys(normalize_query(r["question"]) for r in retrieved)
+        candidates = [c for c in candidates if c in entries]
+        if not candidates:
+            self._count("misses")
+            return None
+
+        # TF-IDF rows are L2-normalized: the dot product is the cosine.
+        vecs = snapshot.transform([query] + [entries[c]["question"] for c in candidates])
+        sims = (vecs[1:] @ vecs[0].T).toarray().ravel()
+        terms = content_terms(normalize_query(query))
+        for i in sims.argsort()[::-1]:
+            if sims[i] < self.cutoff:
+                break
+            if same_terms(terms, content_terms(candidates[i]), self.min_terms, self.term_overlap):
+                return self._fresh(entries, candidates[i], snapshot)
+
+        self._count("misses")
+        return None
+
+    def for_source(self, source, snapshot):
+        """The precomputed answer of the FAQ question with ``source``."""
+        if self.cutoff > 1:
+            return None
+        self._maybe_reload()
+        key = self._current(snapshot)[1].get(source)
+        if key is None or key not in self._entries:
+            self._count("misses")
+            return None
+        return self._fresh(self._entries, key, snapshot)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, cutoff=self.cutoff)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _fresh(self, entries, key, snapshot):
+        entry = entries[key]
+        if entry.get("hash") != self._current(snapshot)[0].get(key):
+            self._count("stale")
+            return None
+        self._count("hits")
+        return entry["answer"]
+
+    def _current(self, snapshot):
+        """({question key: content hash}, {source: first question key})
+        of the snapshot's FAQ data."""
+        with self._lock:
+            if snapshot.version != self._version:
+                groups = faq_groups(snapshot.tfidf.faqs)
+                self._hashes = {key: g["hash"] for key, g in groups.items()}
+                self._sources = {}
+                for key, g in groups.items():
+                    for source in {p.get("source") for p in g["passages"]}:
+                        self._sources.setdefault(source, key)
+                self._version = snapshot.version
+            return self._hashes, self._sources
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        try:
+            entries = load_entries(self.path)
+        except OSError as e:
+            metrics.record_error("precomputed_load", e)
+            return
+        with self._lock:
+            self._entries = entries
+            self._mtime = mtime
+            self.stats["answers"] = len(entries)
+
+
+# ----------------- RUN DIRECTLY -----------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute grounded FAQ answers")
+    parser.add_argument("--workers", type=int, default=PRECOMPUTE_WORKERS,
+                        help="LLM calls in parallel")
+    parser.add_argument("--force", action="store_true", help="regenerate every answer")
+    parser.add_argument("--out", default=PRECOMPUTED_PATH)
+    args = parser.parse_args()
+
+    import app  # prompt and LLM client exactly as served
+
+    with open(app.DATA_PATH, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+    precompute(faqs, app.context_messages, app.groq_chat, args.out, args.workers, args.force)
@@ -0,0 +1,224 @@
+import os
+import json
+import shutil
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+from retriever.build_index import make_vectorizer, prune_old_indexes
+from retriever.search import select_top_k
+from retriever.utils import file_hash
+
+DATA_DIR = "data"
+FAQ_PATH = os.path.join(DATA_DIR, "faqs_final.json")
+INDEX_ROOT = os.path.join(DATA_DIR, "index")
+
+BM25_VERSION = 1
+FIELDS = ("question", "answer", "source")
+K1 = 1.2
+B = 0.75
+
+
+def field_boosts():
+    """Per-field query-time weights, e.g. BM25_BOOSTS=question:3,answer:1,source:0.5"""
+    boosts = {"question": 3.0, "answer": 1.0, "source": 0.5}
+    for part in os.getenv("BM25_BOOSTS", "").split(","):
+        if ":" in part:
+            name, value = part.split(":", 1)
+            boosts[name.strip()] = float(value)
+    return boosts
+
+
+# ---------------------- BUILD ----------------------
+
+def bm25_dir_for(faq_hash, index_root=INDEX_ROOT):
+    return os.path.join(index_root, f"bm25-v{BM25_VERSION}-{faq_hash[:16]}")
+
+
+def build_postings(field_tokens, n_terms, n_docs):
+    """CSR postings for one field with precomputed BM25 impact per posting.
+
+    Returns (indptr[n_terms + 1], doc ids, impacts). Storing impacts
+    instead of raw tf makes a query a sum over its terms' postings.
+    """
+    terms, docs, tfs = [], [], []
+    doc_len = np.zeros(n_docs, dtype=np.float32)
+    for doc_id, counts in enumerate(field_tokens):
+        doc_len[doc_id] = sum(counts.values())
+        for term_id, tf in counts.items():
+            terms.append(term_id)
+            docs.append(doc_id)
+            tfs.append(tf)
+
+    terms = np.asarray(terms, dtype=np.int32)
+    docs = np.asarray(docs, dtype=np.int32)
+    tfs = np.asarray(tfs, dtype=np.float32)
+
+    order = np.lexsort((docs, terms))
+    terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+    df = np.bincount(terms, minlength=n_terms).astype(np.float32)
+    indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+    avgdl = max(float(doc_len.mean()) if n_docs else 0.0, 1e-9)
+    norm = K1 * (1 - B + B * doc_len[docs] / avgdl)
+    impacts = (idf[terms] * tfs * (K1 + 1) / (tfs + norm)).astype(np.float32)
+    return indptr, docs, impacts
+
+
+def build_bm25_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, force=False):
+    """Multi-field (question / answer / source) BM25 index as .npy arrays."""
+    faq_hash = file_hash(faq_path)
+    out_dir = bm25_dir_for(faq_hash, index_root)
+
+    if os.path.exists(os.path.join(out_dir, "meta.json")) and not force:
+        print(f"[SKIP] BM25 index up to date → {out_dir}")
+        return out_dir
+
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    analyzer = make_vectorizer().build_analyzer()
+    vocab = {}
+    tokens = {}
+    for field in FIELDS:
+        tokens[field] = [
+            Counter(vocab.setdefault(t, len(vocab)) for t in analyzer(str(x.get(field, ""))))
+            for x in faqs
+        ]
+
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-bm25-", dir=index_root)
+
+    for field in FIELDS:
+        indptr, docs, impacts = build_postings(tokens[field], len(vocab), len(faqs))
+        np.save(os.path.join(tmp_dir, f"{field}_indptr.npy"), indptr)
+        np.save(os.path.join(tmp_dir, f"{field}_docs.npy"), docs)
+        np.save(os.path.join(tmp_dir, f"{field}_impacts.npy"), impacts)
+
+    terms = sorted(vocab, key=vocab.get)
+    with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+    meta = {
+        "version": BM25_VERSION,
+        "faq_hash": faq_hash,
+        "fields": list(FIELDS),
+        "k1": K1,
+        "b": B,
+        "n_docs": len(faqs),
+        "n_terms": len(vocab),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+    prune_old_indexes(out_dir, index_root, prefix="bm25-")
+
+    print(f"[DONE] BM25 index saved → {out_dir}")
+    print(f"[COUNT] {meta['n_docs']} records, {meta['n_terms']} terms")
+    return out_dir
+
+
+# ---------------------- LOAD / SEARCH ----------------------
+
+class Bm25Index:
+    """Memory-mapped multi-field BM25 postings.
+
+    Query cost is proportional to the postings of the query terms, not
+    to the corpus size.
+    """
+
+    def __init__(self, index_dir, faqs, boosts=None):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "vocabulary.json"), "r", encoding="utf-8") as f:
+            self.vocab = {t: i for i, t in enumerate(json.load(f))}
+
+        def mmap(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.index_dir = index_dir
+        self.version = self.meta["faq_hash"][:16]
+        self.questions = [x["question"] for x in faqs]
+        self.answers = [x["answer"] for x in faqs]
+        self.analyzer = make_vectorizer().build_analyzer()
+        self.boosts = boosts or field_boosts()
+        self.postings = {
+            field: (mmap(f"{field}_indptr.npy"), mmap(f"{field}_docs.npy"),
+                    mmap(f"{field}_impacts.npy"))
+            for field in self.meta["fields"]
+        }
+
+    def score(self, query):
+        """Return (scores, doc ids) of every document matching the query."""
+        term_ids = {self.vocab[t] for t in self.analyzer(query) if t in self.vocab}
+        doc_parts, score_parts = [], []
+        for field, (indptr, docs, impacts) in self.postings.items():
+            boost = self.boosts.get(field, 0.0)
+            if not boost:
+                continue
+            for tid in term_ids:
+                start, end = indptr[tid], indptr[tid + 1]
+                if start == end:
+                    continue
+                doc_parts.append(docs[start:end])
+                score_parts.append(impacts[start:end] * boost)
+
+        if not doc_parts:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        all_docs = np.concatenate(doc_parts)
+        ids, inverse = np.unique(all_docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        return scores, ids
+
+    def search_many(self, queries, top_k=3, min_score=0.0):
+        results = []
+        for query in queries:
+            if not query or not query.strip():
+                results.append([])
+                continue
+            scores, ids = self.score(query)
+            keep = scores > min_score
+            scores, ids = select_top_k(scores[keep], ids[keep], top_k)
+            results.append([
+                {
+                    "id": int(idx),
+                    "version": self.version,
+                    "question": self.questions[idx],
+                    "answer": self.answers[idx],
+                    "score": float(score),
+                }
+                for score, idx in zip(scores, ids)
+            ])
+        return results
+
+
+def load_bm25_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, faqs=None, build_missing=True):
+    faq_hash = file_hash(faq_path)
+    index_dir = bm25_dir_for(faq_hash, index_root)
+
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        if not build_missing:
+            raise FileNotFoundError(f"No BM25 index for {faq_path} in {index_root}")
+        build_bm25_index(faq_path, index_root)
+
+    if faqs is None:
+        with open(faq_path, "r", encoding="utf-8") as f:
+            faqs = json.load(f)
+    return Bm25Index(index_dir, faqs)
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    build_bm25_index()
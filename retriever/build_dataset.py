@@ -1,9 +1,9 @@
 import os
 import json
-import time
-import requests
 from bs4 import BeautifulSoup
 
+from retriever.crawler import Crawler
+
 BASE = "https://gmu.ac.in"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (GMU-Chatbot-Scraper; +https://gmu.ac.in)"
@@ -15,6 +15,9 @@ RAW_DIR = os.path.join(DATA_DIR, "raw_scraped")
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(RAW_DIR, exist_ok=True)
 
+# Pooled, rate-limited, ETag-aware fetcher; raw pages are cached in RAW_DIR.
+CRAWLER = Crawler(headers=HEADERS, cache_dir=RAW_DIR)
+
 
 # ------------------------------ HELPER FUNCTIONS ------------------------------
 
@@ -22,13 +25,10 @@ def fetch_page(url):
     """Download a page and return a BeautifulSoup object."""
     print(f"[FETCH] {url}")
 
-    try:
-        res = requests.get(url, headers=HEADERS, timeout=15)
-        res.raise_for_status()
-        return BeautifulSoup(res.text, "lxml")
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch {url}: {e}")
+    text = CRAWLER.fetch(url)
+    if text is None:
         return None
+    return BeautifulSoup(text, "lxml")
 
 
 def save_json(filename, data):
@@ -147,50 +147,56 @@ def build_datasets():
     print("  GMU DATASET SCRAPER")
     print("============================\n")
 
-    # -------------------- 1. Program Pages --------------------
     program_pages = [
         ("Engineering (UG)", "https://gmu.ac.in/fetug"),
         ("Engineering (PG)", "https://gmu.ac.in/fetpg"),
         ("Commerce (UG)", "https://gmu.ac.in/fcitug"),
         ("Commerce (PG)", "https://gmu.ac.in/fcitpg"),
     ]
+    faculty_pages = {
+        "CSE": "https://gmu.ac.in/csefaculty",
+        "ECE": "https://gmu.ac.in/ecefaculty",
+        "Mechanical": "https://gmu.ac.in/mechfaculty",
+    }
+    ric_url = "https://gmu.ac.in/academics_assessment"
+    phd_url = "https://gmu.ac.in/programfee"
+    contact_url = "https://gmu.ac.in/contact"
+
+    # -------------------- 0. Fetch everything in parallel --------------------
+    all_urls = [url for _, url in program_pages] + list(faculty_pages.values())
+    all_urls += [ric_url, phd_url, contact_url]
+    CRAWLER.fetch_many(all_urls)
 
+    # -------------------- 1. Program Pages --------------------
     all_programs = []
     for faculty_name, url in program_pages:
         all_programs.extend(parse_program_table(url, faculty_name))
-        time.sleep(1)
 
     save_json("programs.json", all_programs)
 
     # -------------------- 2. Faculty Pages --------------------
-    faculty_pages = {
-        "CSE": "https://gmu.ac.in/csefaculty",
-        "ECE": "https://gmu.ac.in/ecefaculty",
-        "Mechanical": "https://gmu.ac.in/mechfaculty",
-    }
-
     all_faculty = []
     for dept, url in faculty_pages.items():
         all_faculty.extend(parse_faculty_page(url, dept))
-        time.sleep(1)
 
     save_json("faculty.json", all_faculty)
 
     # -------------------- 3. Research Council / Governance --------------------
-    ric_url = "https://gmu.ac.in/academics_assessment"
     ric = parse_table_generic(ric_url)
     save_json("governance.json", ric)
 
     # -------------------- 4. PhD Supervisors --------------------
-    phd_url = "https://gmu.ac.in/programfee"
     supervisors = parse_table_generic(phd_url)
     save_json("phd_supervisors.json", supervisors)
 
     # -------------------- 5. Contact Page --------------------
-    contact_url = "https://gmu.ac.in/contact"
     contact = scrape_contact_page(contact_url)
     save_json("contacts.json", contact)
 
+    stats = CRAWLER.stats
+    print(f"\n[CRAWL] fetched={stats['fetched']} not_modified={stats['not_modified']} "
+          f"fresh={stats['fresh']} errors={stats['errors']}")
+
     print("\n============================")
     print("  SCRAPING COMPLETED")
     print("============================\n")
@@ -0,0 +1,170 @@
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from retriever.utils import file_hash
+
+DATA_DIR = "data"
+FAQ_PATH = os.path.join(DATA_DIR, "faqs_final.json")
+INDEX_ROOT = os.path.join(DATA_DIR, "index")
+
+# Bump when the on-disk layout changes; old indexes are then rebuilt.
+INDEX_VERSION = 1
+KEEP_INDEXES = 3
+
+
+# ---------------------- HELPERS ----------------------
+
+def make_vectorizer(vocabulary=None, **overrides):
+    """The one place the TF-IDF settings live (build and query time).
+
+    ``overrides`` are only used by evaluate.py to try other settings.
+    """
+    settings = {"stop_words": "english", **overrides}
+    return TfidfVectorizer(vocabulary=vocabulary, **settings)
+
+
+def index_dir_for(faq_hash, index_root=INDEX_ROOT):
+    return os.path.join(index_root, f"v{INDEX_VERSION}-{faq_hash[:16]}")
+
+
+def prune_old_indexes(keep_dir, index_root=INDEX_ROOT, keep=KEEP_INDEXES, prefix="v"):
+    """Drop all but the newest ``keep`` index directories named ``prefix*``."""
+    if not os.path.isdir(index_root):
+        return
+    dirs = [
+        os.path.join(index_root, d) for d in os.listdir(index_root)
+        if d.startswith(prefix) and os.path.isdir(os.path.join(index_root, d))
+    ]
+    dirs.sort(key=os.path.getmtime, reverse=True)
+    for d in dirs[keep:]:
+        if os.path.abspath(d) != os.path.abspath(keep_dir):
+            shutil.rmtree(d, ignore_errors=True)
+
+
+# ---------------------- BUILD ----------------------
+
+def build_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, force=False):
+    """Fit TF-IDF on the FAQ questions and write it to disk.
+
+    The index lives in a directory keyed by the content hash of the FAQ
+    file, as plain .npy arrays so that workers can memory-map them.
+    Returns the index directory.
+    """
+    faq_hash = file_hash(faq_path)
+    out_dir = index_dir_for(faq_hash, index_root)
+
+    if os.path.exists(os.path.join(out_dir, "meta.json")) and not force:
+        print(f"[SKIP] Index up to date → {out_dir}")
+        return out_dir
+
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+    questions = [x["question"] for x in faqs]
+
+    vectorizer = make_vectorizer()
+    matrix = vectorizer.fit_transform(questions).astype(np.float32).tocsr()
+    matrix.sort_indices()
+
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=index_root)
+
+    np.save(os.path.join(tmp_dir, "data.npy"), matrix.data)
+    np.save(os.path.join(tmp_dir, "indices.npy"), matrix.indices)
+    np.save(os.path.join(tmp_dir, "indptr.npy"), matrix.indptr)
+    np.save(os.path.join(tmp_dir, "idf.npy"), vectorizer.idf_)
+
+    with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vectorizer.get_feature_names_out().tolist(), f, ensure_ascii=False)
+
+    meta = {
+        "version": INDEX_VERSION,
+        "faq_hash": faq_hash,
+        "faq_path": faq_path,
+        "n_docs": matrix.shape[0],
+        "n_terms": matrix.shape[1],
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    # Concurrent builders race harmlessly: the loser's rename fails and
+    # its temp dir is discarded.
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+    prune_old_indexes(out_dir, index_root)
+
+    print(f"[DONE] Index saved → {out_dir}")
+    print(f"[COUNT] {meta['n_docs']} questions, {meta['n_terms']} terms")
+    return out_dir
+
+
+# ---------------------- LOAD ----------------------
+
+class TfidfIndex:
+    """A loaded, read-only TF-IDF index over the FAQ questions."""
+
+    def __init__(self, index_dir, faqs, meta, vectorizer, matrix):
+        self.index_dir = index_dir
+        self.faqs = faqs
+        self.questions = [x["question"] for x in faqs]
+        self.answers = [x["answer"] for x in faqs]
+        self.meta = meta
+        self.version = meta["faq_hash"][:16]
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+
+def load_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, build_missing=True):
+    """Memory-map the index matching the current FAQ file.
+
+    Array pages are shared between all worker processes via the page
+    cache. If no index exists for this content hash it is built first.
+    """
+    faq_hash = file_hash(faq_path)
+    index_dir = index_dir_for(faq_hash, index_root)
+    meta_path = os.path.join(index_dir, "meta.json")
+
+    if not os.path.exists(meta_path):
+        if not build_missing:
+            raise FileNotFoundError(f"No index for {faq_path} in {index_root}")
+        build_index(faq_path, index_root)
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(index_dir, "vocabulary.json"), "r", encoding="utf-8") as f:
+        terms = json.load(f)
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    def mmap(name):
+        return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+    matrix = sparse.csr_matrix(
+        (mmap("data.npy"), mmap("indices.npy"), mmap("indptr.npy")),
+        shape=(meta["n_docs"], meta["n_terms"]),
+        copy=False,
+    )
+
+    vectorizer = make_vectorizer(vocabulary={t: i for i, t in enumerate(terms)})
+    vectorizer.idf_ = np.asarray(mmap("idf.npy"))
+
+    return TfidfIndex(index_dir, faqs, meta, vectorizer, matrix)
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    build_index()
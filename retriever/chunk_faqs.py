@@ -0,0 +1,148 @@
+import os
+import json
+import re
+import hashlib
+
+DATA_DIR = "data"
+
+# Passage size in words. Answers up to CHUNK_WORDS are kept whole.
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", 120))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 30))
+
+# Sentence ends, plus the " | " separators scraped tables and nav bars use.
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\s+\|\s+")
+WORD = re.compile(r"\S+")
+
+
+# ---------------------- HELPERS ----------------------
+
+def load_json(path):
+    if not os.path.exists(path):
+        print(f"[WARN] File not found: {path}")
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[ERROR] Failed to load {path}: {e}")
+        return []
+
+
+def parent_id(faq):
+    """Stable id of the un-chunked record: same content → same id."""
+    key = "\x1f".join([faq.get("source", ""), faq.get("question", ""), faq.get("answer", "")])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+# ---------------------- SPLITTING ----------------------
+
+def sentence_units(text, max_words, window):
+    """(start, end, n_words) spans of sentences in ``text``.
+
+    Sentences longer than ``max_words`` (page dumps without punctuation)
+    are cut into ``window``-word pieces so they can still be packed and
+    overlapped.
+    """
+    units = []
+    start = 0
+    bounds = [m.start() for m in SENTENCE_END.finditer(text)] + [len(text)]
+    for end in bounds:
+        words = list(WORD.finditer(text, start, end))
+        if len(words) <= max_words:
+            if words:
+                units.append((words[0].start(), words[-1].end(), len(words)))
+        else:
+            for i in range(0, len(words), window):
+                piece = words[i:i + window]
+                units.append((piece[0].start(), piece[-1].end(), len(piece)))
+        match = SENTENCE_END.match(text, end)
+        start = match.end() if match else end
+    return units
+
+
+def chunk_text(text, max_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Split ``text`` into overlapping passages on sentence boundaries.
+
+    Returns (start, end) character spans into ``text``. Each passage
+    repeats whole trailing sentences of the previous one, up to
+    ``overlap`` words, so a fact on a boundary appears intact somewhere.
+    """
+    window = overlap if 0 < overlap < max_words else max_words
+    units = sentence_units(text, max_words, window)
+    if not units:
+        return []
+
+    spans = []
+    current = []
+    words = 0
+    for unit in units:
+        if current and words + unit[2] > max_words:
+            spans.append((current[0][0], current[-1][1]))
+            carry = []
+            carried = 0
+            for prev in reversed(current):
+                if carried + prev[2] > overlap or len(carry) + 1 == len(current):
+                    break
+                carry.insert(0, prev)
+                carried += prev[2]
+            if carried + unit[2] > max_words:
+                carry, carried = [], 0
+            current, words = carry, carried
+        current.append(unit)
+        words += unit[2]
+    spans.append((current[0][0], current[-1][1]))
+    return spans
+
+
+def chunk_faq(faq, max_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """One FAQ → one or more passage records pointing back to it."""
+    answer = faq.get("answer", "")
+    if len(WORD.findall(answer)) <= max_words:
+        return [faq]
+
+    pid = parent_id(faq)
+    spans = chunk_text(answer, max_words, overlap)
+    return [
+        dict(
+            faq,
+            answer=answer[start:end],
+            parent_id=pid,
+            chunk_id=f"{pid}-{i}",
+            chunk=i,
+            chunks=len(spans),
+            span=[start, end],
+        )
+        for i, (start, end) in enumerate(spans)
+    ]
+
+
+def chunk_faqs_list(faqs, max_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    chunked = []
+    for faq in faqs:
+        chunked.extend(chunk_faq(faq, max_words, overlap))
+    return chunked
+
+
+# ---------------------- MASTER FUNCTION ----------------------
+
+def chunk_faqs():
+    print("\n============================")
+    print("   CHUNKING LONG FAQ ANSWERS")
+    print("============================\n")
+
+    faqs = load_json(os.path.join(DATA_DIR, "faqs_generated.json"))
+    chunked = chunk_faqs_list(faqs)
+
+    output_path = os.path.join(DATA_DIR, "faqs_chunked.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(chunked, f, indent=2, ensure_ascii=False)
+
+    split = len({x["parent_id"] for x in chunked if "parent_id" in x})
+    print(f"[DONE] Chunked FAQs saved → {output_path}")
+    print(f"[COUNT] {len(faqs)} FAQs → {len(chunked)} passages ({split} split)")
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    chunk_faqs()
@@ -1,8 +1,20 @@
 import os
 import json
-import re
+import time
+import shutil
+import filecmp
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 DATA_DIR = "data"
+CLEANED_DIR = os.path.join(DATA_DIR, "cleaned")        # one <section>.jsonl per source
+OUTPUT_PATH = os.path.join(DATA_DIR, "cleaned_data.json")
+CLEAN_WORKERS = int(os.getenv("CLEAN_WORKERS", os.cpu_count() or 1))
+
+# Built once: json.dumps() makes a new encoder per call.
+_ENCODE = json.JSONEncoder(ensure_ascii=False).encode
+_CANONICAL = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode
 
 
 # --------------------- HELPER FUNCTIONS ---------------------
@@ -24,20 +36,43 @@ def clean_text(text):
     """Clean unwanted characters, newlines, spacing."""
     if not isinstance(text, str):
         return text
+    # Same as re.sub(r"\s+", " ", text).strip() (str.split() and \s agree
+    # on what is whitespace), about five times faster.
+    return " ".join(text.split())
+
+
+def hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def content_hash(item):
+    """64-bit content hash of a JSON-serializable record."""
+    return hash64(_CANONICAL(item))
+
 
-    text = text.replace("\n", " ")
-    text = re.sub(r"\s+", " ", text)
-    text = text.strip()
-    return text
+def indented(value, pad="    "):
+    """json.dumps(value, indent=2, ensure_ascii=False) for a record nested
+    ``pad`` deep in cleaned_data.json. Same output, but only scalars go
+    through the encoder; the pure-Python indent path is several times
+    slower."""
+    if isinstance(value, dict) and value:
+        inner = pad + "  "
+        items = ",\n".join(f"{inner}{_ENCODE(str(k))}: {indented(v, inner)}" for k, v in value.items())
+        return f"{{\n{items}\n{pad}}}"
+    if isinstance(value, list) and value:
+        inner = pad + "  "
+        items = ",\n".join(inner + indented(v, inner) for v in value)
+        return f"[\n{items}\n{pad}]"
+    return _ENCODE(value)
 
 
 def dedupe_list(items):
-    """Remove duplicate dictionaries based on string value."""
+    """Remove duplicate dictionaries, keeping the first of each."""
     seen = set()
     unique = []
 
     for item in items:
-        key = json.dumps(item, sort_keys=True)
+        key = content_hash(item)
         if key not in seen:
             seen.add(key)
             unique.append(item)
@@ -45,100 +80,230 @@ def dedupe_list(items):
     return unique
 
 
-# --------------------- MAIN CLEANING PROCESS ---------------------
+# --------------------- RECORD CLEANERS ---------------------
 
-def clean_dataset():
-    print("\n============================")
-    print(" CLEANING SCRAPED GMU DATA ")
-    print("============================\n")
+def clean_program(p):
+    p["faculty"] = clean_text(p.get("faculty", ""))
+    p["program_name"] = clean_text(p.get("program_name", ""))
+    p["source_url"] = clean_text(p.get("source_url", ""))
+    return p
 
-    # ------------------ Load All Scraped Files ------------------
 
-    programs = load_json(os.path.join(DATA_DIR, "programs.json"))
-    academic_assessment = load_json(os.path.join(DATA_DIR, "academic_assessment.json"))
-    program_fee = load_json(os.path.join(DATA_DIR, "program_fee.json"))
-    contacts = load_json(os.path.join(DATA_DIR, "contacts.json"))
-    faculty = load_json(os.path.join(DATA_DIR, "faculty.json"))
-    governance = load_json(os.path.join(DATA_DIR, "governance.json"))
-    phd_supervisors = load_json(os.path.join(DATA_DIR, "phd_supervisors.json"))
+def clean_content(item):
+    """Academic assessment and program fee pages."""
+    item["content"] = clean_text(item.get("content", ""))
+    item["source_url"] = clean_text(item.get("source_url", ""))
+    return item
 
-    # ------------------ Clean Programs ------------------
 
-    for p in programs:
-        p["faculty"] = clean_text(p.get("faculty", ""))
-        p["program_name"] = clean_text(p.get("program_name", ""))
-        p["source_url"] = clean_text(p.get("source_url", ""))
+def clean_contact(c):
+    c["raw_text"] = clean_text(c.get("raw_text", ""))
+    c["source_url"] = clean_text(c.get("source_url", ""))
+    return c
 
-    programs = dedupe_list(programs)
 
-    # ------------------ Clean Academic Assessment ------------------
+def clean_faculty(fac):
+    fac["department"] = clean_text(fac.get("department", ""))
+    fac["details"] = clean_text(fac.get("details", ""))
+    fac["source_url"] = clean_text(fac.get("source_url", ""))
+    return fac
 
-    for a in academic_assessment:
-        a["content"] = clean_text(a.get("content", ""))
-        a["source_url"] = clean_text(a.get("source_url", ""))
 
-    # ------------------ Clean Program Fee ------------------
+def clean_columns(row):
+    """Table rows: governance / RIC and PhD supervisors."""
+    row["columns"] = [clean_text(x) for x in row.get("columns", [])]
+    row["source_url"] = clean_text(row.get("source_url", ""))
+    return row
 
-    for f in program_fee:
-        f["content"] = clean_text(f.get("content", ""))
-        f["source_url"] = clean_text(f.get("source_url", ""))
 
-    # ------------------ Clean Contacts ------------------
+# (section, scraped file, record cleaner, dedupe?)
+SECTIONS = [
+    ("programs", "programs.json", clean_program, True),
+    ("academic_assessment", "academic_assessment.json", clean_content, False),
+    ("program_fee", "program_fee.json", clean_content, False),
+    ("contacts", "contacts.json", clean_contact, False),
+    ("faculty", "faculty.json", clean_faculty, True),
+    ("governance", "governance.json", clean_columns, True),
+    ("phd_supervisors", "phd_supervisors.json", clean_columns, True),
+]
 
-    if isinstance(contacts, dict):
-        contacts = [contacts]  # make it list for consistency
 
-    for c in contacts:
-        c["raw_text"] = clean_text(c.get("raw_text", ""))
-        c["source_url"] = clean_text(c.get("source_url", ""))
+def source_path(filename):
+    """The scraped file for a section; a .jsonl next to it takes precedence."""
+    path = os.path.join(DATA_DIR, filename)
+    jsonl = os.path.splitext(path)[0] + ".jsonl"
+    return jsonl if os.path.exists(jsonl) else path
 
-    # ------------------ Clean Faculty ------------------
 
-    for fac in faculty:
-        fac["department"] = clean_text(fac.get("department", ""))
-        fac["details"] = clean_text(fac.get("details", ""))
-        fac["source_url"] = clean_text(fac.get("source_url", ""))
+def iter_raw(filename):
+    """Stream (JSON text, record) pairs of a section's scraped records.
 
-    faculty = dedupe_list(faculty)
+    JSONL sources are read line by line; a legacy .json file (list, or a
+    single object) is still loaded whole.
+    """
+    path = source_path(filename)
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield line, json.loads(line)
+                except ValueError as e:
+                    print(f"[WARN] Skipping bad line {n} in {path}: {e}")
+        return
+    records = load_json(path)
+    if isinstance(records, dict):
+        records = [records]  # make it list for consistency
+    for record in records:
+        yield _CANONICAL(record), record
+
+
+def iter_records(filename):
+    for _, record in iter_raw(filename):
+        yield record
+
+
+def load_section(filename):
+    return list(iter_records(filename))
+
+
+# --------------------- PER-SECTION WORKER ---------------------
+
+def clean_section(section, filename, cleaner, dedupe, out_dir=CLEANED_DIR, write=True):
+    """Clean one source file into ``out_dir/<section>.jsonl``.
+
+    Runs in a worker process. Records are streamed through; only the
+    64-bit hashes of the raw records (for the pipeline's change report)
+    and of the kept records (for dedupe) are held in memory. The record's
+    cleaned_data.json fragment is formatted here too, into
+    ``<section>.part``, so that assembling the file is a plain copy.
+    """
+    start = time.monotonic()
+    raw_hashes = []
+    seen = set()
+    kept = 0
 
-    # ------------------ Clean Governance / RIC ------------------
+    base = os.path.join(out_dir, section)
+    tmp_suffix = f".tmp.{os.getpid()}"
+    out = open(base + ".jsonl" + tmp_suffix, "w", encoding="utf-8") if write else None
+    part = open(base + ".part" + tmp_suffix, "w", encoding="utf-8") if write else None
+    try:
+        for raw_text, raw in iter_raw(filename):
+            raw_hashes.append(hash64(raw_text))
+            record = cleaner(raw)
+            line = _CANONICAL(record)
+            if dedupe:
+                h = hash64(line)
+                if h in seen:
+                    continue
+                seen.add(h)
+            if out is not None:
+                out.write(line + "\n")
+                part.write((",\n    " if kept else "") + indented(record))
+            kept += 1
+    finally:
+        if out is not None:
+            out.close()
+            part.close()
+    if write:
+        os.replace(base + ".jsonl" + tmp_suffix, base + ".jsonl")
+        os.replace(base + ".part" + tmp_suffix, base + ".part")
+
+    return {
+        "section": section,
+        "records": len(raw_hashes),
+        "kept": kept,
+        "duplicates": len(raw_hashes) - kept if dedupe else 0,
+        "seconds": time.monotonic() - start,
+        "raw_hashes": raw_hashes,
+    }
 
-    for g in governance:
-        g["columns"] = [clean_text(x) for x in g.get("columns", [])]
-        g["source_url"] = clean_text(g.get("source_url", ""))
 
-    governance = dedupe_list(governance)
+def write_cleaned(sections, out_dir=CLEANED_DIR, output_path=OUTPUT_PATH):
+    """Assemble cleaned_data.json from the per-section fragments, in the
+    layout of json.dump(indent=2). The file is only replaced when its
+    content changed; returns True if it was."""
+    tmp_path = f"{output_path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, section in enumerate(sections):
+            part_path = os.path.join(out_dir, f"{section}.part")
+            f.write(("," if i else "") + f"\n  {_ENCODE(section)}: ")
+            if os.path.getsize(part_path):
+                f.write("[\n    ")
+                with open(part_path, "r", encoding="utf-8") as src:
+                    shutil.copyfileobj(src, f, 1 << 20)
+                f.write("\n  ]")
+            else:
+                f.write("[]")
+            os.remove(part_path)
+        f.write("\n}" if sections else "}")
+
+    if os.path.exists(output_path) and filecmp.cmp(tmp_path, output_path, shallow=False):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, output_path)
+    return True
 
-    # ------------------ Clean PhD Supervisors ------------------
 
-    for s in phd_supervisors:
-        s["columns"] = [clean_text(x) for x in s.get("columns", [])]
-        s["source_url"] = clean_text(s.get("source_url", ""))
+# --------------------- MAIN CLEANING PROCESS ---------------------
 
-    phd_supervisors = dedupe_list(phd_supervisors)
+def clean_dataset(workers=CLEAN_WORKERS, write=True, output_path=OUTPUT_PATH):
+    """Clean every section, one source file per worker process.
 
-    # ------------------ Merge Everything ------------------
+    Returns a summary with record counts, throughput and the raw record
+    hashes (used by the pipeline to report what changed).
+    """
+    print("\n============================")
+    print(" CLEANING SCRAPED GMU DATA ")
+    print("============================\n")
 
-    cleaned_dataset = {
-        "programs": programs,
-        "academic_assessment": academic_assessment,
-        "program_fee": program_fee,
-        "contacts": contacts,
-        "faculty": faculty,
-        "governance": governance,
-        "phd_supervisors": phd_supervisors,
+    start = time.monotonic()
+    if write:
+        os.makedirs(CLEANED_DIR, exist_ok=True)
+    jobs = [(section, filename, cleaner, dedupe, CLEANED_DIR, write)
+            for section, filename, cleaner, dedupe in SECTIONS]
+
+    workers = max(1, min(workers, len(jobs)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(clean_section, *zip(*jobs)))
+    else:
+        results = [clean_section(*job) for job in jobs]
+
+    for r in results:
+        rate = r["records"] / r["seconds"] if r["seconds"] > 0 else 0.0
+        print(f"[COUNT] {r['section']}: {r['records']} records, {r['kept']} kept, "
+              f"{r['duplicates']} duplicates ({rate:,.0f} records/s)")
+
+    wrote = write_cleaned([r["section"] for r in results], output_path=output_path) if write else False
+    elapsed = time.monotonic() - start
+    records = sum(r["records"] for r in results)
+    summary = {
+        "records": records,
+        "kept": sum(r["kept"] for r in results),
+        "duplicates": sum(r["duplicates"] for r in results),
+        "workers": workers,
+        "records_per_sec": round(records / elapsed, 1) if elapsed > 0 else 0.0,
+        "wrote": wrote,
+        "raw_hashes": [h for r in results for h in r["raw_hashes"]],
     }
 
-    # ------------------ Save Cleaned Output ------------------
-
-    output_path = os.path.join(DATA_DIR, "cleaned_data.json")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(cleaned_dataset, f, indent=2, ensure_ascii=False)
-
-    print("[DONE] Cleaned dataset saved → data/cleaned_data.json\n")
+    print(f"[COUNT] {records} records in {elapsed:.2f}s with {workers} workers "
+          f"({summary['records_per_sec']:,.0f} records/s)")
+    if write:
+        print(f"[DONE] Cleaned dataset {'saved' if wrote else 'unchanged'} → {output_path}\n")
+    return summary
 
 
 # --------------------- RUN DIRECTLY ---------------------
 
 if __name__ == "__main__":
-    clean_dataset()
+    parser = argparse.ArgumentParser(description="Clean scraped GMU data → data/cleaned_data.json")
+    parser.add_argument("--workers", type=int, default=CLEAN_WORKERS,
+                        help="worker processes (one source file each)")
+    args = parser.parse_args()
+
+    clean_dataset(workers=args.workers)
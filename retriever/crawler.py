@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CACHE_DIR = os.path.join("data", "raw_scraped")
+
+MAX_WORKERS = int(os.getenv("SCRAPER_WORKERS", 8))
+PER_HOST_CONCURRENCY = int(os.getenv("SCRAPER_PER_HOST", 2))
+PER_HOST_RATE = float(os.getenv("SCRAPER_RATE", 1.0))  # requests / second
+PER_HOST_BURST = int(os.getenv("SCRAPER_BURST", 2))
+FRESH_SECONDS = int(os.getenv("SCRAPER_FRESH_SECONDS", 0))  # skip the request entirely
+TIMEOUT = 15
+
+
+# ------------------------------ RATE LIMITING ------------------------------
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` tokens/second, up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ------------------------------ HTTP CACHE ------------------------------
+
+class HttpCache:
+    """ETag / Last-Modified cache on disk: one body + one meta file per URL."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, name)
+        return base + ".json", base + ".html"
+
+    def get(self, url):
+        meta_path, body_path = self._paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None, None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "r", encoding="utf-8") as f:
+                return meta, f.read()
+        except Exception:
+            return None, None
+
+    def put(self, url, response):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "sha256": hashlib.sha256(response.content).hexdigest(),
+        }
+        with open(body_path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    def touch(self, url, meta):
+        meta_path, _ = self._paths(url)
+        meta["fetched_at"] = time.time()
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+
+# ------------------------------ CRAWLER ------------------------------
+
+class Crawler:
+    """Parallel fetcher with per-host limits and a conditional-request cache.
+
+    A pooled ``requests.Session`` retries connection errors, 429 and 5xx
+    with backoff (honouring Retry-After). Each host gets a concurrency
+    cap and a token bucket, so total crawl time is bounded by the rate
+    limit, not by serial latency. Unchanged pages cost one 304.
+    """
+
+    def __init__(self, headers=None, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS,
+                 per_host=PER_HOST_CONCURRENCY, rate=PER_HOST_RATE, burst=PER_HOST_BURST,
+                 fresh_seconds=FRESH_SECONDS, timeout=TIMEOUT):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.fresh_seconds = fresh_seconds
+        self.timeout = timeout
+        self.cache = HttpCache(cache_dir)
+
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._results = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "fresh": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _host_limits(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    threading.Semaphore(self.per_host),
+                    TokenBucket(self.rate, self.burst),
+                )
+            return self._hosts[host]
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def fetch(self, url):
+        """Return the page text (from cache when unchanged) or None."""
+        if url in self._results:
+            return self._results[url]
+
+        meta, body = self.cache.get(url)
+        if meta and self.fresh_seconds and time.time() - meta["fetched_at"] < self.fresh_seconds:
+            self._count("fresh")
+            self._results[url] = body
+            return body
+
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        semaphore, bucket = self._host_limits(url)
+        try:
+            with semaphore:
+                bucket.acquire()
+                res = self.session.get(url, headers=headers, timeout=self.timeout)
+
+            if res.status_code == 304 and body is not None:
+                self._count("not_modified")
+                self.cache.touch(url, meta)
+                text = body
+            else:
+                res.raise_for_status()
+                self._count("fetched")
+                self.cache.put(url, res)
+                text = res.text
+        except Exception as e:
+            print(f"[ERROR] Failed to fetch {url}: {e}")
+            self._count("errors")
+            text = body  # stale copy beats nothing
+
+        self._results[url] = text
+        return text
+
+    def fetch_many(self, urls):
+        """Fetch URLs concurrently; returns {url: text or None}."""
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            texts = list(pool.map(self.fetch, urls))
+        return dict(zip(urls, texts))
@@ -0,0 +1,297 @@
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+from retriever.build_index import prune_old_indexes
+from retriever.search import select_top_k
+from retriever.utils import file_hash
+
+DATA_DIR = "data"
+FAQ_PATH = os.path.join(DATA_DIR, "faqs_final.json")
+INDEX_ROOT = os.path.join(DATA_DIR, "index")
+
+DENSE_VERSION = 1
+
+# Local sentence-transformers model directory, e.g. a downloaded
+# all-MiniLM-L6-v2. Nothing is fetched from the network.
+MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "")
+DENSE_DTYPE = os.getenv("DENSE_DTYPE", "int8")     # int8 | float16
+DENSE_ANN = os.getenv("DENSE_ANN", "ivf")          # hnsw | ivf | brute
+IVF_NPROBE = int(os.getenv("DENSE_IVF_NPROBE", 8))
+ANSWER_CHARS = 200  # answer prefix embedded together with the question
+BLOCK_ROWS = 65536  # brute-force scan block, bounds the float32 temp
+
+
+# ---------------------- EMBEDDER ----------------------
+
+class Embedder:
+    """CPU sentence embedder loaded from a local model directory."""
+
+    def __init__(self, model_path=MODEL_PATH):
+        if not model_path or not os.path.isdir(model_path):
+            raise RuntimeError("EMBEDDING_MODEL_PATH must point to a local model directory")
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError("Dense retrieval needs `pip install sentence-transformers`")
+
+        self.model_path = model_path
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        # Identifies the model in index metadata so a model swap forces a rebuild.
+        self.model_id = os.path.basename(os.path.normpath(model_path))
+
+    def encode(self, texts, batch_size=64):
+        vecs = self.model.encode(
+            list(texts), batch_size=batch_size,
+            normalize_embeddings=True, convert_to_numpy=True,
+        )
+        return vecs.astype(np.float32)
+
+
+def faq_text(faq):
+    return f"{faq['question']} {faq['answer'][:ANSWER_CHARS]}"
+
+
+# ---------------------- QUANTIZATION ----------------------
+
+def quantize(vecs, dtype=DENSE_DTYPE):
+    """Return (stored matrix, per-row scales or None)."""
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vecs).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.round(vecs / scales[:, None]).astype(np.int8)
+        return q, scales.astype(np.float32)
+    raise ValueError(f"Unknown DENSE_DTYPE: {dtype}")
+
+
+# ---------------------- IVF (coarse quantizer) ----------------------
+
+def assign_lists(vecs, centroids):
+    return np.concatenate([
+        np.argmax(vecs[i:i + BLOCK_ROWS] @ centroids.T, axis=1)
+        for i in range(0, len(vecs), BLOCK_ROWS)
+    ])
+
+
+def kmeans(vecs, k, iters=20, seed=0, sample_per_list=256):
+    """Spherical k-means on unit vectors, trained on a sample."""
+    rng = np.random.default_rng(seed)
+    if len(vecs) > k * sample_per_list:
+        vecs = vecs[rng.choice(len(vecs), size=k * sample_per_list, replace=False)]
+    centroids = vecs[rng.choice(len(vecs), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = assign_lists(vecs, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vecs)
+        filled = np.any(sums != 0, axis=1)
+        centroids[filled] = sums[filled]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def build_ivf(vecs):
+    """Inverted lists as (centroids, offsets, ids sorted by list)."""
+    nlist = max(1, int(np.sqrt(len(vecs))))
+    centroids = kmeans(vecs, nlist)
+    assign = assign_lists(vecs, centroids)
+    order = np.argsort(assign, kind="stable").astype(np.int32)
+    counts = np.bincount(assign, minlength=nlist)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return centroids, offsets, order
+
+
+# ---------------------- BUILD ----------------------
+
+def dense_dir_for(faq_hash, model_id, index_root=INDEX_ROOT):
+    return os.path.join(index_root, f"dense-v{DENSE_VERSION}-{model_id}-{faq_hash[:16]}")
+
+
+def build_dense_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, embedder=None,
+                      dtype=DENSE_DTYPE, force=False):
+    """Embed every FAQ offline and write quantized vectors + ANN structures."""
+    embedder = embedder or Embedder()
+    faq_hash = file_hash(faq_path)
+    out_dir = dense_dir_for(faq_hash, embedder.model_id, index_root)
+
+    if os.path.exists(os.path.join(out_dir, "meta.json")) and not force:
+        print(f"[SKIP] Dense index up to date → {out_dir}")
+        return out_dir
+
+    with open(faq_path, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    vecs = embedder.encode([faq_text(x) for x in faqs])
+    stored, scales = quantize(vecs, dtype)
+
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-dense-", dir=index_root)
+
+    np.save(os.path.join(tmp_dir, "vectors.npy"), stored)
+    if scales is not None:
+        np.save(os.path.join(tmp_dir, "scales.npy"), scales)
+
+    centroids, offsets, ids = build_ivf(vecs)
+    np.save(os.path.join(tmp_dir, "ivf_centroids.npy"), centroids)
+    np.save(os.path.join(tmp_dir, "ivf_offsets.npy"), offsets)
+    np.save(os.path.join(tmp_dir, "ivf_ids.npy"), ids)
+
+    has_hnsw = False
+    try:
+        import hnswlib
+        hnsw = hnswlib.Index(space="ip", dim=vecs.shape[1])
+        hnsw.init_index(max_elements=len(vecs), ef_construction=200, M=16)
+        hnsw.add_items(vecs, np.arange(len(vecs)))
+        hnsw.save_index(os.path.join(tmp_dir, "hnsw.bin"))
+        has_hnsw = True
+    except ImportError:
+        print("[WARN] hnswlib not installed; HNSW index skipped (IVF/brute still available)")
+
+    meta = {
+        "version": DENSE_VERSION,
+        "faq_hash": faq_hash,
+        "model_id": embedder.model_id,
+        "dtype": dtype,
+        "n_docs": int(vecs.shape[0]),
+        "dim": int(vecs.shape[1]),
+        "hnsw": has_hnsw,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+    prune_old_indexes(out_dir, index_root, prefix="dense-")
+
+    print(f"[DONE] Dense index saved → {out_dir}")
+    print(f"[COUNT] {meta['n_docs']} vectors, dim {meta['dim']}, {dtype}")
+    return out_dir
+
+
+# ---------------------- LOAD / SEARCH ----------------------
+
+class DenseIndex:
+    """Memory-mapped quantized embeddings with an ANN front end."""
+
+    def __init__(self, index_dir, faqs, embedder, ann=DENSE_ANN, nprobe=IVF_NPROBE):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        def mmap(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.index_dir = index_dir
+        self.version = self.meta["faq_hash"][:16]
+        self.questions = [x["question"] for x in faqs]
+        self.answers = [x["answer"] for x in faqs]
+        self.embedder = embedder
+        self.vectors = mmap("vectors.npy")
+        self.scales = mmap("scales.npy") if self.meta["dtype"] == "int8" else None
+        self.nprobe = nprobe
+
+        self.centroids = np.asarray(mmap("ivf_centroids.npy"))
+        self.ivf_offsets = mmap("ivf_offsets.npy")
+        self.ivf_ids = mmap("ivf_ids.npy")
+
+        self.hnsw = None
+        if ann == "hnsw":
+            if self.meta.get("hnsw"):
+                try:
+                    import hnswlib
+                    self.hnsw = hnswlib.Index(space="ip", dim=self.meta["dim"])
+                    self.hnsw.load_index(os.path.join(index_dir, "hnsw.bin"))
+                    self.hnsw.set_ef(64)
+                except ImportError:
+                    ann = "ivf"
+            else:
+                ann = "ivf"
+        self.ann = ann
+
+    def _rows(self, ids):
+        rows = np.asarray(self.vectors[ids], dtype=np.float32)
+        if self.scales is not None:
+            rows *= np.asarray(self.scales[ids])[:, None]
+        return rows
+
+    def _brute(self, q, k):
+        n = self.vectors.shape[0]
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        for start in range(0, n, BLOCK_ROWS):
+            ids = np.arange(start, min(n, start + BLOCK_ROWS))
+            scores = self._rows(ids) @ q
+            best_scores, best_ids = select_top_k(
+                np.concatenate([best_scores, scores]),
+                np.concatenate([best_ids, ids]), k,
+            )
+        return best_scores, best_ids
+
+    def _ivf(self, q, k):
+        lists = np.argsort(self.centroids @ q)[::-1][:self.nprobe]
+        ids = np.concatenate([
+            self.ivf_ids[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in lists
+        ]).astype(np.int64)
+        if not len(ids):
+            return np.empty(0, dtype=np.float32), ids
+        return select_top_k(self._rows(ids) @ q, ids, k)
+
+    def _hnsw(self, q, k):
+        k = min(k, self.vectors.shape[0])
+        labels, distances = self.hnsw.knn_query(q[None, :], k=k)
+        return 1.0 - distances[0], labels[0].astype(np.int64)
+
+    def search_many(self, queries, top_k=3, min_score=0.0):
+        results = [[] for _ in queries]
+        live = [i for i, q in enumerate(queries) if q and q.strip()]
+        if not live:
+            return results
+
+        qvecs = self.embedder.encode([queries[i] for i in live])
+        search = {"hnsw": self._hnsw, "ivf": self._ivf}.get(self.ann, self._brute)
+
+        for q, qi in zip(qvecs, live):
+            scores, ids = search(q, top_k)
+            results[qi] = [
+                {
+                    "id": int(idx),
+                    "version": self.version,
+                    "question": self.questions[idx],
+                    "answer": self.answers[idx],
+                    "score": float(score),
+                }
+                for score, idx in zip(scores, ids) if score > min_score
+            ]
+        return results
+
+
+def load_dense_index(faq_path=FAQ_PATH, index_root=INDEX_ROOT, embedder=None,
+                     faqs=None, build_missing=True):
+    embedder = embedder or Embedder()
+    faq_hash = file_hash(faq_path)
+    index_dir = dense_dir_for(faq_hash, embedder.model_id, index_root)
+
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        if not build_missing:
+            raise FileNotFoundError(f"No dense index for {faq_path} in {index_root}")
+        build_dense_index(faq_path, index_root, embedder)
+
+    if faqs is None:
+        with open(faq_path, "r", encoding="utf-8") as f:
+            faqs = json.load(f)
+    return DenseIndex(index_dir, faqs, embedder)
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    build_dense_index()
@@ -0,0 +1,445 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+import threading
+
+from retriever.build_index import prune_old_indexes
+from retriever.utils import record_hash
+
+DATA_DIR = "data"
+CLEANED_PATH = os.path.join(DATA_DIR, "cleaned_data.json")
+INDEX_ROOT = os.path.join(DATA_DIR, "index")
+
+FACTS_VERSION = 1
+ENABLED = os.getenv("FACT_STORE", "1") != "0"
+MAX_LIST = int(os.getenv("FACTS_MAX_LIST", 40))  # rows listed in one reply
+
+
+def normalize(text):
+    """Lowercase, drop dots ("M.Tech." → "mtech" below) and punctuation."""
+    text = str(text).lower().replace(".", "")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def stem(token):
+    return token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+
+
+# ---------------------- VOCABULARY ----------------------
+#
+# Patterns run on normalize()d text.
+
+DEGREES = [
+    ("M.Tech", r"\bm ?tech\b"),
+    ("B.Tech", r"\bb ?tech\b"),
+    ("MCA", r"\bmca\b"),
+    ("BCA", r"\bbca\b"),
+    ("M.Sc", r"\bm ?sc\b"),
+    ("B.Sc", r"\bb ?sc\b"),
+    ("MBA", r"\bmba\b"),
+    ("BBA", r"\bbba\b"),
+    ("M.Com", r"\bm ?com\b"),
+    ("B.Com", r"\bb ?com\b"),
+    ("PhD", r"\bph ?d\b"),
+]
+_DEGREES = [(name, re.compile(regex)) for name, regex in DEGREES]
+
+LEVELS = [
+    ("UG", re.compile(r"\b(ug|under ?graduate|bachelors?|b ?tech|bca|b ?sc|bba|b ?com)\b")),
+    ("PG", re.compile(r"\b(pg|post ?graduate|masters?|m ?tech|mca|m ?sc|mba|m ?com)\b")),
+]
+
+PROGRAM_WORDS = re.compile(r"\b(programs?|programmes?|courses?|degrees?|branch(es)?"
+                           r"|speciali[sz]ations?|streams?|disciplines?)\b")
+SUPERVISOR_WORDS = re.compile(r"\b(supervisors?|(research |phd )?guides?)\b")
+ASK_WORDS = re.compile(r"\b(list|which|what|who|all|available|offer\w*|is there|are there"
+                       r"|have|has|provide\w*|show|tell me)\b")
+# Asked about something the tables don't hold: leave it to retrieval.
+OFF_TOPIC = re.compile(r"\b(fees?|cost|eligib\w*|admissions?|apply|applying|syllabus|placements?"
+                       r"|duration|years?|seats?|intake|scholarships?|hostel|cut ?off|exams?"
+                       r"|timings?|contact|phone|email|salary|ranking)\b")
+
+STOP_WORDS = set("""
+a an the and or of in on at for to from with by about into under me i we you your my our
+is are was be do does did can could will would should there here this that these those
+it its which what who whom whose how list all show tell give available offer offers offered
+offering have has had provide provides provided any some other every each please kindly
+gmu gm university college campus program programs programme programmes course courses
+degree degrees branch branches specialization specializations specialisation
+specialisations stream streams discipline disciplines department departments faculty
+faculties school schools supervisor supervisors guide guides research phd also only
+currently now options option like study studying want know ug pg undergraduate
+postgraduate graduate under post bachelor bachelors master masters level
+student students interested types type kinds kind different new
+work works working area areas field fields expertise
+""".split())
+
+
+def content_terms(text):
+    """Stemmed query terms left after dropping stop words and degree names."""
+    for _, pattern in _DEGREES:
+        text = pattern.sub(" ", text)
+    return [stem(t) for t in text.split() if t not in STOP_WORDS and len(t) > 1]
+
+
+def program_degree(name, code, school, level):
+    text = normalize(f"{name} {code}")
+    for degree, pattern in _DEGREES:
+        if pattern.search(text):
+            return degree
+    if school == "Engineering":
+        return "B.Tech" if level == "UG" else "M.Tech"
+    return ""
+
+
+def last_level(text):
+    """UG or PG, whichever is mentioned last: a follow-up ("... UG? and
+    what about PG?") overrides the question it was folded into."""
+    best, best_pos = None, -1
+    for level, pattern in LEVELS:
+        for m in pattern.finditer(text):
+            if m.start() > best_pos:
+                best, best_pos = level, m.start()
+    return best
+
+
+# ---------------------- ROWS ----------------------
+
+def program_rows(programs):
+    """Scraped program table rows → {name, school, level, faculty, degree, code, schemes, source_url}."""
+    rows = []
+    for p in programs:
+        name = (p.get("program_name") or "").strip()
+        if not name:
+            continue
+        faculty = (p.get("faculty") or "").strip()
+        m = re.match(r"(.*?)\s*\((UG|PG)\)\s*$", faculty)
+        school, level = (m.group(1), m.group(2)) if m else (faculty, "")
+        codes = " ".join(p.get("raw_columns", [])[2:])
+        code = re.match(r"[^(]*", codes).group().strip()
+        schemes = sorted(set(re.findall(r"(\d{2})\s*-?\s*scheme", codes, re.I)))
+        rows.append({
+            "name": name,
+            "school": school,
+            "level": level,
+            "faculty": faculty,
+            "degree": program_degree(name, code, school, level),
+            "code": code,
+            "schemes": ", ".join(f"20{s}" for s in schemes),
+            "source_url": p.get("source_url", ""),
+        })
+    return rows
+
+
+SUPERVISOR_COLUMNS = ("name", "designation", "department", "specialization")
+_PERSON = re.compile(r"^(dr|prof|mr|mrs|ms)\b", re.I)
+
+
+def supervisor_rows(table_rows):
+    """Generic table rows (serial no., name, designation, department,
+    area) → supervisor rows. Rows that don't start with a person's title
+    are section headers or a different table and are skipped."""
+    rows = []
+    for row in table_rows:
+        cols = [c.strip() for c in row.get("columns", [])]
+        if cols and cols[0].rstrip(".").isdigit():
+            cols = cols[1:]
+        if not cols or not _PERSON.match(cols[0]):
+            continue
+        cols = (cols + [""] * len(SUPERVISOR_COLUMNS))[:len(SUPERVISOR_COLUMNS)]
+        rows.append(dict(zip(SUPERVISOR_COLUMNS, cols), source_url=row.get("source_url", "")))
+    return rows
+
+
+# ---------------------- TABLES ----------------------
+
+class Table:
+    """Rows stored column by column, with a hash index (normalized value
+    → row ids) on each ``hash_on`` column and an inverted index (stemmed
+    token → row ids) over the ``text_on`` columns."""
+
+    def __init__(self, columns, hash_index, inverted):
+        self.columns = columns
+        self.hash_index = hash_index
+        self.inverted = inverted
+        self.size = len(next(iter(columns.values()), []))
+
+    @classmethod
+    def build(cls, rows, column_names, hash_on, text_on):
+        columns = {c: [r.get(c, "") for r in rows] for c in column_names}
+        hash_index = {c: {} for c in hash_on}
+        inverted = {}
+        for i, row in enumerate(rows):
+            for c in hash_on:
+                key = normalize(row.get(c, ""))
+                if key:
+                    hash_index[c].setdefault(key, []).append(i)
+            tokens = set()
+            for c in text_on:
+                tokens.update(content_terms(normalize(row.get(c, ""))))
+            for token in tokens:
+                inverted.setdefault(token, []).append(i)
+        return cls(columns, hash_index, inverted)
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, column, value):
+        """Row ids whose ``column`` equals ``value`` (normalized)."""
+        return set(self.hash_index[column].get(normalize(value), ()))
+
+    def values(self, column):
+        """Distinct normalized values of a hash-indexed column."""
+        return self.hash_index[column].keys()
+
+    def search(self, terms):
+        """Row ids containing every term, or None if a term is unknown."""
+        ids = None
+        for term in terms:
+            postings = self.inverted.get(term)
+            if postings is None:
+                return None
+            ids = set(postings) if ids is None else ids & set(postings)
+        return set(range(self.size)) if ids is None else ids
+
+    def rows(self, ids):
+        return [{c: values[i] for c, values in self.columns.items()} for i in sorted(ids)]
+
+    def to_json(self):
+        return {"columns": self.columns, "hash_index": self.hash_index, "inverted": self.inverted}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["columns"], data["hash_index"], data["inverted"])
+
+
+def build_tables(cleaned):
+    programs = program_rows(cleaned.get("programs", []))
+    supervisors = supervisor_rows(cleaned.get("phd_supervisors", []))
+    return {
+        "programs": Table.build(
+            programs,
+            ("name", "school", "level", "faculty", "degree", "code", "schemes", "source_url"),
+            hash_on=("school", "level", "faculty", "degree"),
+            text_on=("name",)),
+        "supervisors": Table.build(
+            supervisors,
+            SUPERVISOR_COLUMNS + ("source_url",),
+            hash_on=("department", "designation"),
+            text_on=("name", "department", "specialization")),
+    }
+
+
+# ---------------------- BUILD ----------------------
+
+def facts_dir_for(data_hash, index_root=INDEX_ROOT):
+    return os.path.join(index_root, f"facts-v{FACTS_VERSION}-{data_hash[:16]}")
+
+
+def build_fact_store(cleaned_path=CLEANED_PATH, index_root=INDEX_ROOT, force=False):
+    """Build the program / supervisor tables from cleaned_data.json and
+    write them next to the retrieval indexes. Returns the store directory."""
+    with open(cleaned_path, "r", encoding="utf-8") as f:
+        cleaned = json.load(f)
+    sections = {k: cleaned.get(k, []) for k in ("programs", "phd_supervisors")}
+    data_hash = record_hash([sections, FACTS_VERSION])
+    out_dir = facts_dir_for(data_hash, index_root)
+
+    if os.path.exists(os.path.join(out_dir, "meta.json")) and not force:
+        print(f"[SKIP] Fact store up to date → {out_dir}")
+        return out_dir
+
+    tables = build_tables(sections)
+
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-facts-", dir=index_root)
+    with open(os.path.join(tmp_dir, "tables.json"), "w", encoding="utf-8") as f:
+        json.dump({name: t.to_json() for name, t in tables.items()}, f, ensure_ascii=False)
+
+    counts = {name: len(t) for name, t in tables.items()}
+    meta = {"version": FACTS_VERSION, "data_hash": data_hash, "rows": counts}
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+    prune_old_indexes(out_dir, index_root, prefix="facts-")
+
+    print(f"[DONE] Fact store saved → {out_dir}")
+    print(f"[COUNT] {counts}")
+    if not counts["supervisors"]:
+        print("[WARN] No supervisor rows recognized in phd_supervisors")
+    return out_dir
+
+
+# ---------------------- LOAD / ANSWER ----------------------
+
+def load_fact_tables(index_root=INDEX_ROOT):
+    """The newest fact store's tables, or None if none was built."""
+    if not os.path.isdir(index_root):
+        return None
+    dirs = [
+        os.path.join(index_root, d) for d in os.listdir(index_root)
+        if d.startswith(f"facts-v{FACTS_VERSION}-")
+        and os.path.exists(os.path.join(index_root, d, "meta.json"))
+    ]
+    if not dirs:
+        return None
+    with open(os.path.join(max(dirs, key=os.path.getmtime), "tables.json"), "r", encoding="utf-8") as f:
+        return {name: Table.from_json(data) for name, data in json.load(f).items()}
+
+
+def bullet_list(lines):
+    shown = lines[:MAX_LIST]
+    more = len(lines) - len(shown)
+    return "\n".join(shown) + (f"\n…and {more} more." if more > 0 else "")
+
+
+class FactStore:
+    """List and entity questions about programs and PhD supervisors,
+    answered by index lookups instead of retrieval and the LLM.
+
+    ``answer`` returns (table, reply) or (None, None). A message is only
+    taken when it asks for programs/supervisors, mentions nothing the
+    tables don't hold (fees, eligibility, ...) and every remaining word
+    is in the table's inverted index; anything else falls through. The
+    message is tried as sent, then as rewritten with the previous turn
+    (so "and what about PG?" works, but a self-contained question isn't
+    spoiled by the last one).
+    """
+
+    def __init__(self, tables=None, enabled=ENABLED):
+        self.tables = tables or {}
+        self.enabled = enabled and bool(tables)
+        self.stats = {"passed": 0, "hits": {}}
+        self._lock = threading.Lock()
+
+    def answer(self, message, rewritten=None):
+        if self.enabled:
+            for text in dict.fromkeys(normalize(m) for m in (message, rewritten) if m):
+                if not text or OFF_TOPIC.search(text) or not ASK_WORDS.search(text):
+                    continue
+                for table, handler in (("supervisors", self._supervisors), ("programs", self._programs)):
+                    reply = handler(text)
+                    if reply is not None:
+                        with self._lock:
+                            self.stats["hits"][table] = self.stats["hits"].get(table, 0) + 1
+                        return table, reply
+        with self._lock:
+            self.stats["passed"] += 1
+        return None, None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rows": {name: len(t) for name, t in self.tables.items()},
+                "passed": self.stats["passed"],
+                "hits": dict(self.stats["hits"]),
+            }
+
+    # ---- programs ----
+
+    def _programs(self, text):
+        table = self.tables.get("programs")
+        degree = next((d for d, p in _DEGREES if p.search(text)), None)
+        if not table or not (PROGRAM_WORDS.search(text) or degree):
+            return None
+
+        ids = set(range(len(table)))
+        filters = []
+        level = last_level(text)
+        if degree:
+            if not table.lookup("degree", degree):
+                return None  # e.g. MBA: not in the program tables we scrape
+            ids &= table.lookup("degree", degree)
+            filters.append(degree)
+        elif level:
+            ids &= table.lookup("level", level)
+            filters.append(level)
+        school_words = set()
+        for school in table.values("school"):
+            if re.search(rf"\b{re.escape(school)}\b", text):
+                ids &= table.lookup("school", school)
+                school_words.update(school.split())
+                filters.append(school.title())
+
+        terms = [t for t in content_terms(text) if t not in school_words]
+        matched = table.search(terms)
+        if matched is None:
+            return None  # a word we know nothing about: let retrieval have it
+
+        found = table.rows(ids & matched)
+        topic = " ".join(filters)
+        if not found:
+            if not terms:
+                return None
+            # e.g. "UG deep learning": say so, and show the other levels
+            related = table.rows(matched)
+            if not related:
+                return None
+            return (f"GM University doesn't list a {topic} program in that area. Related programs:\n"
+                    + bullet_list([f"- {r['name']} ({r['faculty']})" for r in related]))
+
+        if terms and len(found) == 1:
+            r = found[0]
+            details = [r["degree"]] if normalize(r["degree"]) not in normalize(r["name"]) else []
+            if r["schemes"]:
+                details.append(f"{r['schemes']} schemes")
+            details = f" ({', '.join(details)})" if details else ""
+            return (f"Yes! GM University offers {r['name']}{details} under {r['faculty']} 🎓"
+                    f"\nMore details: {r['source_url']}")
+
+        by_faculty = {}
+        for r in found:
+            by_faculty.setdefault(r["faculty"], []).append(r)
+        parts = [f"GM University offers these {topic + ' ' if topic else ''}programs 🎓"]
+        for faculty, rows in by_faculty.items():
+            parts.append(f"\n{faculty}:\n" + bullet_list([f"- {r['name']}" for r in rows]))
+        sources = sorted({r["source_url"] for r in found if r["source_url"]})
+        if sources:
+            parts.append("\nMore details: " + ", ".join(sources))
+        return "\n".join(parts)
+
+    # ---- supervisors ----
+
+    def _supervisors(self, text):
+        table = self.tables.get("supervisors")
+        if not table or not SUPERVISOR_WORDS.search(text):
+            return None
+
+        ids = set(range(len(table)))
+        department_words = set()
+        for department in table.values("department"):
+            if re.search(rf"\b{re.escape(department)}\b", text):
+                ids &= table.lookup("department", department)
+                department_words.update(department.split())
+
+        terms = [t for t in content_terms(text) if t not in department_words]
+        matched = table.search(terms)
+        if matched is None:
+            return None
+        found = table.rows(ids & matched)
+        if not found:
+            return None
+
+        lines = []
+        for r in found:
+            details = ", ".join(x for x in (r["designation"], r["department"]) if x)
+            area = f" ({r['specialization']})" if r["specialization"] else ""
+            lines.append(f"- {r['name']}" + (f", {details}" if details else "") + area)
+        return "PhD supervisors at GM University 🎓\n" + bullet_list(lines)
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    build_fact_store()
@@ -143,6 +143,18 @@ def faq_from_phd_supervisors(phd_list):
     return faqs
 
 
+# (cleaned_data section, generator) in output order
+GENERATORS = [
+    ("programs", faq_from_programs),
+    ("academic_assessment", faq_from_academic_assessment),
+    ("program_fee", faq_from_program_fee),
+    ("contacts", faq_from_contacts),
+    ("faculty", faq_from_faculty),
+    ("governance", faq_from_governance),
+    ("phd_supervisors", faq_from_phd_supervisors),
+]
+
+
 # ---------------------- MASTER FUNCTION ----------------------
 
 def generate_faqs():
@@ -157,25 +169,11 @@ def generate_faqs():
         print("[ERROR] cleaned_data.json missing. Run clean_dataset.py first.")
         return
 
-    # Extract sections
-    programs = cleaned_data.get("programs", [])
-    academic_assessment = cleaned_data.get("academic_assessment", [])
-    program_fee = cleaned_data.get("program_fee", [])
-    contacts = cleaned_data.get("contacts", [])
-    faculty = cleaned_data.get("faculty", [])
-    governance = cleaned_data.get("governance", [])
-    phd_supervisors = cleaned_data.get("phd_supervisors", [])
-
     faqs = []
 
     # Generate section-wise FAQs
-    faqs.extend(faq_from_programs(programs))
-    faqs.extend(faq_from_academic_assessment(academic_assessment))
-    faqs.extend(faq_from_program_fee(program_fee))
-    faqs.extend(faq_from_contacts(contacts))
-    faqs.extend(faq_from_faculty(faculty))
-    faqs.extend(faq_from_governance(governance))
-    faqs.extend(faq_from_phd_supervisors(phd_supervisors))
+    for section, generator in GENERATORS:
+        faqs.extend(generator(cleaned_data.get(section, [])))
 
     # Save output
     output_path = os.path.join(DATA_DIR, "faqs_generated.json")
@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import random
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+import numpy as np
+
+from retriever.build_index import make_vectorizer, prune_old_indexes
+from retriever.utils import record_hash
+
+DATA_DIR = "data"
+FAQ_PATH = os.path.join(DATA_DIR, "faqs_final.json")
+EVAL_PATH = os.path.join(DATA_DIR, "eval_queries.jsonl")
+INDEX_ROOT = os.path.join(DATA_DIR, "index")
+
+INTENT_VERSION = 1
+OTHER = "other"  # everything that should go through retrieval + LLM
+
+ENABLED = os.getenv("INTENT_ROUTER", "1") != "0"
+DEFAULT_THRESHOLD = float(os.getenv("INTENT_THRESHOLD", 0.85))
+MODEL_MAX_WORDS = 8  # longer messages are real questions; never routed by the model
+
+# Character n-grams cope with "hiee", "thnx" and other spellings.
+FEATURES = {"analyzer": "char_wb", "ngram_range": (2, 4), "stop_words": None,
+            "sublinear_tf": True}
+
+
+def thresholds():
+    """Per-intent model cutoffs, e.g. INTENT_THRESHOLDS=out_of_scope:0.95,greeting:0.7"""
+    values = {"out_of_scope": 0.95}
+    for part in os.getenv("INTENT_THRESHOLDS", "").split(","):
+        if ":" in part:
+            name, value = part.split(":", 1)
+            values[name.strip()] = float(value)
+    return values
+
+
+def normalize(text):
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# ---------------------- PATTERN TABLE ----------------------
+#
+# (intent, regex on the normalized message, max words). Checked in order
+# before the model; anchored patterns only fire on messages that are
+# nothing but a greeting, thanks, etc.
+
+PATTERNS = [
+    ("goodbye", r"^((ok|okay|thanks|thank you) )?(bye+( bye)?|good ?bye|see (you|ya)( later)?|cya)$", 5),
+    ("thanks", r"^((ok|okay|great|cool|nice) )?(thanks?( you)?|thank u|thnx|thx|ty|tq)"
+               r"( (so|very) much| a lot)?$", 6),
+    ("greeting", r"^((h+i+[ieyw]*|h+e+y+|h+e+l+o+|namaste|hola)( (there|bot|gmu|buddy))?"
+                 r"|good (morning|afternoon|evening))$", 3),
+    ("identity", r"^(who|what) (are|r) (you|u)$|^what s your name$|^what is your name$"
+                 r"|^what (all )?(can|do) (you|u) (do|tell me|know)( for me)?$", 8),
+    # Only the bare request: "email of cse hod" or "address of the
+    # admission office" asks about someone else and goes to retrieval.
+    ("contact", r"^((gmu|university|college) )?(contact( (details|info|information|number|no))?"
+                r"|phone( (number|no))?|e ?mail( (id|address))?|helpline( number)?|address)"
+                r"( of (gmu|the university|university|the college|college))?$"
+                r"|^how (do|can) i (contact|reach) (you|gmu|the university|the college)$", 8),
+    ("out_of_scope", r"^((tell|give) me (a|some) (joke|poem|recipe)s?|jokes?"
+                     r"|(sing|write) (me )?a (song|poem)|recommend (me )?(a|some) (movie|song)s?"
+                     r"|(what s|what is|how is) the weather( today)?)$", 8),
+]
+_PATTERNS = [(intent, re.compile(regex), max_words) for intent, regex, max_words in PATTERNS]
+
+
+def match_pattern(text):
+    n_words = len(text.split())
+    for intent, pattern, max_words in _PATTERNS:
+        if n_words <= max_words and pattern.search(text):
+            return intent
+    return None
+
+
+# ---------------------- TEMPLATES ----------------------
+
+REPLIES = {
+    "greeting": [
+        "Hi there! 👋 I'm the GMU assistant. Ask me about programs, fees, faculty, PhD supervisors or how to contact GM University.",
+        "Hello! 😊 What would you like to know about GM University today?",
+    ],
+    "thanks": [
+        "You're welcome! 😊 Anything else about GMU I can help with?",
+        "Happy to help! 🎓 Ask away if you have more questions.",
+    ],
+    "goodbye": [
+        "Bye! 👋 Good luck, and come back anytime you have GMU questions.",
+    ],
+    "identity": [
+        "I'm the GM University assistant 🤖. I can tell you about programs (UG and PG), "
+        "fees, faculty, PhD supervisors, governance and how to contact the university.",
+    ],
+    "out_of_scope": [
+        "That one's outside my syllabus 😄. I'm here for GM University questions: "
+        "programs, fees, faculty, PhD supervisors and contacts.",
+    ],
+}
+
+# Intents answered with the precomputed answer of an FAQ source.
+FAQ_SOURCES = {"contact": "contact"}
+
+SEED_EXAMPLES = {
+    "greeting": ["hi", "hii", "hiii", "hello", "hey", "hey there", "hi there", "helo",
+                 "good morning", "good evening", "namaste", "hiee", "hello bot", "heyy"],
+    "thanks": ["thanks", "thank you", "thanks a lot", "thank you so much", "thx", "ty",
+               "ok thanks", "great thanks", "thnx", "tq", "cool thank you"],
+    "goodbye": ["bye", "goodbye", "see you", "bye bye", "ok bye", "see you later",
+                "thanks bye", "cya"],
+    "identity": ["who are you", "what are you", "what is your name", "what can you do",
+                 "what all can you tell me", "are you a bot", "are you human",
+                 "who made you", "what do you know"],
+    "contact": ["contact details", "phone number", "email id", "how to contact gmu",
+                "gmu address", "helpline number", "contact number of university",
+                "where is gmu located", "university email"],
+    "out_of_scope": ["tell me a joke", "what is the weather today", "recommend a movie",
+                     "sing a song", "who won the cricket match", "what is the capital of france",
+                     "write a poem", "give me a recipe", "what is bitcoin price",
+                     "who is the prime minister", "play music"],
+    OTHER: ["what programs are offered", "fee structure", "who are the phd supervisors",
+            "btech admission", "mba fees", "computer science faculty", "hostel facility",
+            "is there placement", "what are the ug courses", "transport fee",
+            "who is the hod of cse", "scholarships available", "give this in points",
+            "explain in detail", "what about pg", "email of cse hod",
+            "phone number of the hostel warden", "contact details of phd supervisors",
+            "what is the address of the admission office", "is there a movie club",
+            "song competition in fest"],
+}
+
+
+# ---------------------- TRAINING ----------------------
+
+def logged_messages():
+    from chat_logger import iter_chat_logs  # app-level module; only needed to train
+    messages = [e.get("user", "") for e in iter_chat_logs(include_legacy=True)]
+    return [m for m in messages if isinstance(m, str) and m.strip()]
+
+
+def training_examples(faq_path=FAQ_PATH, eval_path=EVAL_PATH, messages=None):
+    """(text, intent) pairs: seeds, FAQ questions and evaluation queries
+    as OTHER, and logged messages weakly labeled by the pattern table."""
+    examples = [(t, intent) for intent, texts in SEED_EXAMPLES.items() for t in texts]
+
+    with open(faq_path, "r", encoding="utf-8") as f:
+        examples += [(x["question"], OTHER) for x in json.load(f)]
+    if os.path.exists(eval_path):
+        with open(eval_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line) if line.strip() else {}
+                if record.get("expected"):
+                    examples.append((record["query"], OTHER))
+
+    for message in logged_messages() if messages is None else messages:
+        examples.append((message, match_pattern(normalize(message)) or OTHER))
+
+    seen, unique = set(), []
+    for text, intent in examples:
+        key = (normalize(text), intent)
+        if key[0] and key not in seen:
+            seen.add(key)
+            unique.append(key)
+    return unique
+
+
+def intent_dir_for(train_hash, index_root=INDEX_ROOT):
+    return os.path.join(index_root, f"intent-v{INTENT_VERSION}-{train_hash[:16]}")
+
+
+def build_intent_model(faq_path=FAQ_PATH, index_root=INDEX_ROOT, force=False, messages=None):
+    """Fit a char n-gram logistic regression and write it next to the
+    retrieval indexes as plain .npy arrays. Returns the model directory."""
+    from sklearn.linear_model import LogisticRegression
+
+    examples = training_examples(faq_path, messages=messages)
+    train_hash = record_hash([examples, FEATURES, PATTERNS])
+    out_dir = intent_dir_for(train_hash, index_root)
+
+    if os.path.exists(os.path.join(out_dir, "meta.json")) and not force:
+        print(f"[SKIP] Intent model up to date → {out_dir}")
+        return out_dir
+
+    texts = [t for t, _ in examples]
+    labels = [i for _, i in examples]
+    vectorizer = make_vectorizer(**FEATURES)
+    X = vectorizer.fit_transform(texts).astype(np.float32)
+    model = LogisticRegression(max_iter=2000, C=10.0, class_weight="balanced")
+    model.fit(X, labels)
+
+    os.makedirs(index_root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-intent-", dir=index_root)
+
+    coef = model.coef_.astype(np.float32)
+    intercept = model.intercept_.astype(np.float32)
+    if len(model.classes_) == 2:  # binary: sklearn keeps a single row
+        coef, intercept = np.vstack([-coef, coef]), np.concatenate([-intercept, intercept])
+    np.save(os.path.join(tmp_dir, "coef.npy"), coef)
+    np.save(os.path.join(tmp_dir, "intercept.npy"), intercept)
+    np.save(os.path.join(tmp_dir, "idf.npy"), vectorizer.idf_.astype(np.float32))
+    with open(os.path.join(tmp_dir, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vectorizer.get_feature_names_out().tolist(), f, ensure_ascii=False)
+
+    counts = {str(c): labels.count(c) for c in model.classes_}
+    meta = {
+        "version": INTENT_VERSION,
+        "train_hash": train_hash,
+        "classes": [str(c) for c in model.classes_],
+        "examples": counts,
+        "train_accuracy": round(float(model.score(X, labels)), 4),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    try:
+        os.replace(tmp_dir, out_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(out_dir, "meta.json")):
+            raise
+
+    prune_old_indexes(out_dir, index_root, prefix="intent-")
+
+    print(f"[DONE] Intent model saved → {out_dir}")
+    print(f"[COUNT] {len(examples)} examples {counts}, train accuracy {meta['train_accuracy']}")
+    return out_dir
+
+
+# ---------------------- LOAD / CLASSIFY ----------------------
+
+class IntentModel:
+    """Linear classifier over char n-gram TF-IDF.
+
+    Features are computed directly from the analyzer (sublinear tf × idf,
+    L2-normalized, as at training time) and only the rows of the n-grams
+    present are read from the weight matrix: tens of microseconds for a
+    short message, where a full vectorizer.transform costs about a
+    millisecond.
+    """
+
+    def __init__(self, model_dir):
+        with open(os.path.join(model_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(model_dir, "vocabulary.json"), "r", encoding="utf-8") as f:
+            self.vocabulary = {t: i for i, t in enumerate(json.load(f))}
+        self.classes = self.meta["classes"]
+        self.coef = np.load(os.path.join(model_dir, "coef.npy")).T.copy()  # terms × classes
+        self.intercept = np.load(os.path.join(model_dir, "intercept.npy"))
+        self.idf = np.load(os.path.join(model_dir, "idf.npy"))
+        self.analyze = make_vectorizer(**FEATURES).build_analyzer()
+
+    def predict(self, text):
+        """(intent, probability) of the most likely class."""
+        vocabulary = self.vocabulary
+        counts = Counter(vocabulary[g] for g in self.analyze(text) if g in vocabulary)
+        if not counts:
+            return OTHER, 0.0
+        ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        weights = (1.0 + np.log(tf)) * self.idf[ids]
+        weights /= np.linalg.norm(weights)
+
+        logits = weights @ self.coef[ids] + self.intercept
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return self.classes[best], float(probs[best])
+
+
+def load_intent_model(index_root=INDEX_ROOT):
+    """The newest intent model, or None if none was built."""
+    if not os.path.isdir(index_root):
+        return None
+    dirs = [
+        os.path.join(index_root, d) for d in os.listdir(index_root)
+        if d.startswith(f"intent-v{INTENT_VERSION}-")
+        and os.path.exists(os.path.join(index_root, d, "meta.json"))
+    ]
+    if not dirs:
+        return None
+    return IntentModel(max(dirs, key=os.path.getmtime))
+
+
+class IntentRouter:
+    """Pattern table, then the model, in front of retrieval and the LLM.
+
+    ``classify`` returns the intent to answer locally or None. Hits are
+    counted per (intent, pattern|model); ``passed`` counts messages left
+    to the normal path.
+    """
+
+    def __init__(self, model=None, enabled=ENABLED, default_threshold=DEFAULT_THRESHOLD,
+                 intent_thresholds=None):
+        self.model = model
+        self.enabled = enabled
+        self.default_threshold = default_threshold
+        self.thresholds = thresholds() if intent_thresholds is None else intent_thresholds
+        self.stats = {"passed": 0, "fallthrough": 0, "hits": {}}
+        self._lock = threading.Lock()
+
+    def classify(self, message):
+        if not self.enabled:
+            return None
+        text = normalize(message)
+        if not text:
+            return None
+
+        intent = match_pattern(text)
+        if intent is not None:
+            return self._hit(intent, "pattern")
+
+        if self.model is not None and len(text.split()) <= MODEL_MAX_WORDS:
+            intent, prob = self.model.predict(text)
+            if intent != OTHER and prob >= self.thresholds.get(intent, self.default_threshold):
+                return self._hit(intent, "model")
+
+        with self._lock:
+            self.stats["passed"] += 1
+        return None
+
+    def reply(self, intent):
+        """A templated reply, or None for intents served from FAQ data."""
+        replies = REPLIES.get(intent)
+        return random.choice(replies) if replies else None
+
+    def fallthrough(self):
+        """A routed intent had no reply available (e.g. no precomputed answer)."""
+        with self._lock:
+            self.stats["fallthrough"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits = dict(self.stats["hits"])
+        return {
+            "enabled": self.enabled,
+            "model": self.model.meta["train_hash"][:16] if self.model else None,
+            "passed": self.stats["passed"],
+            "fallthrough": self.stats["fallthrough"],
+            "hits": {f"{intent}:{via}": n for (intent, via), n in sorted(hits.items())},
+        }
+
+    def _hit(self, intent, via):
+        key = (intent, via)
+        with self._lock:
+            self.stats["hits"][key] = self.stats["hits"].get(key, 0) + 1
+        return intent
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    build_intent_model()
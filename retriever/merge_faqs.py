@@ -1,8 +1,35 @@
 import os
 import json
 import re
+import zlib
+
+import numpy as np
+
+if __package__:
+    from retriever.chunk_faqs import CHUNK_WORDS
+    from retriever.utils import write_json_if_changed
+else:  # python retriever/merge_faqs.py
+    from chunk_faqs import CHUNK_WORDS
+    from utils import write_json_if_changed
 
 DATA_DIR = "data"
+REPORT_PATH = os.path.join(DATA_DIR, "pipeline", "merge_clusters.json")
+
+# Records whose question + answer shingles have Jaccard similarity of at
+# least NEAR_DUP_THRESHOLD are near-duplicates; the first one is kept.
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", 0.8))
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+# Same-question records are merged into answers of at most CHUNK_WORDS
+# words, so grouping never undoes the passage size chunk_faqs chose.
+MERGE_SEPARATOR = " | "  # a sentence break for chunk_faqs.sentence_units
+SEPARATOR_WORDS = len(MERGE_SEPARATOR.split())
+
+_TOKEN = re.compile(r"\w+")
+# Smallest prime above 2^32. With a, b, h < 2^32 the products wrap around
+# it, so (a*h + b) % p is well mixed; a much larger modulus (2^61 - 1)
+# is mostly a no-op here and the permutations come out correlated.
+_PRIME = np.uint64((1 << 32) + 15)
 
 
 # ---------------------- HELPERS ----------------------
@@ -26,19 +53,157 @@ def clean(text):
     return text.strip()
 
 
+# Back-references added by chunk_faqs.py, kept as-is when present
+CHUNK_FIELDS = ("parent_id", "chunk_id", "chunk", "chunks", "span")
+
+
 def normalize_faq(faq):
     """Ensure each FAQ has the same clean structure"""
-    return {
+    out = {
         "question": clean(faq.get("question", "")),
         "answer": clean(faq.get("answer", "")),
         "source": faq.get("source", "unknown")
     }
+    for field in CHUNK_FIELDS:
+        if field in faq:
+            out[field] = faq[field]
+    return out
 
 
 def faq_key(faq):
-    """Used to detect duplicates"""
+    """Used to detect duplicates.
+
+    Question *and* answer: templated questions ("What programs are
+    offered under X?") are shared by many distinct facts.
+    """
     q = clean(faq.get("question", "").lower())
-    return q
+    a = clean(faq.get("answer", "").lower())
+    return q, a
+
+
+# ---------------------- NEAR-DUPLICATES (MINHASH / LSH) ----------------------
+
+def shingles(text, k=SHINGLE_WORDS):
+    """Set of lowercase k-word shingles; short texts give one shingle."""
+    words = _TOKEN.findall(text.lower())
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def lsh_params(threshold, num_perm):
+    """(bands, rows) whose S-curve threshold (1/b)^(1/r) is the highest
+    one not above ``threshold``: candidates are verified exactly, so
+    erring towards more candidates only costs time."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    below = [(b, r) for b, r in options if (1 / b) ** (1 / r) <= threshold]
+    return max(below, key=lambda br: (1 / br[0]) ** (1 / br[1])) if below else options[-1]
+
+
+class MinHashLSH:
+    """MinHash signatures bucketed by band, so that only records sharing
+    a band (likely Jaccard >= threshold) are ever compared."""
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, num_perm=NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        # a, b < 2^32 and 32-bit shingle hashes: a*h + b fits in uint64.
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.buckets = {}
+
+    def signature(self, shingle_set):
+        h = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+                        dtype=np.uint64, count=len(shingle_set))
+        return ((np.outer(self.a, h) + self.b[:, None]) % _PRIME).min(axis=1)
+
+    def insert(self, key, signature):
+        """Add ``key``; returns the keys already sharing a bucket with it."""
+        candidates = set()
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            bucket = self.buckets.setdefault((band, chunk), [])
+            candidates.update(bucket)
+            bucket.append(key)
+        return candidates
+
+
+def drop_near_duplicates(faqs, threshold=NEAR_DUP_THRESHOLD):
+    """Keep-first near-duplicate removal.
+
+    A record is dropped only if it is a near-duplicate of a record that
+    was kept (no chaining A~B~C), and passages of the same chunked answer
+    are never compared. Returns (kept faqs, clusters, candidate pairs).
+    """
+    lsh = MinHashLSH(threshold)
+    sets = []
+    kept, clusters = [], {}
+    candidate_pairs = 0
+
+    for i, faq in enumerate(faqs):
+        s = shingles(f"{faq['question']} {faq['answer']}")
+        sets.append(s)
+        match, best = None, 0.0
+        if s:
+            for j in lsh.insert(i, lsh.signature(s)):
+                other = faqs[j]
+                if "parent_id" in faq and faq.get("parent_id") == other.get("parent_id"):
+                    continue
+                candidate_pairs += 1
+                sim = jaccard(s, sets[j])
+                if sim >= threshold and sim > best and j in clusters:
+                    match, best = j, sim
+        if match is None:
+            clusters[i] = []
+            kept.append(faq)
+        else:
+            clusters[match].append((i, best))
+
+    report = [
+        {
+            "kept": summarize(faqs[k]),
+            "dropped": [dict(summarize(faqs[i]), similarity=round(sim, 3)) for i, sim in dropped],
+        }
+        for k, dropped in clusters.items() if dropped
+    ]
+    return kept, report, candidate_pairs
+
+
+def summarize(faq):
+    return {"question": faq["question"], "answer": faq["answer"][:120], "source": faq["source"]}
+
+
+# ---------------------- SAME-QUESTION GROUPS ----------------------
+
+def merge_same_question(faqs, max_words=CHUNK_WORDS):
+    """Merge records sharing a question ("What programs are offered under
+    X?" has one record per program) into grouped answers of up to
+    ``max_words`` words, at the position of the first one. Passages of a
+    chunked answer were split on purpose and stay as they are."""
+    out, open_groups = [], {}
+    for faq in faqs:
+        if "parent_id" in faq:
+            out.append(faq)
+            continue
+        key = clean(faq["question"].lower())
+        words = len(faq["answer"].split())
+        group = open_groups.get(key)
+        if group is None or group["words"] + SEPARATOR_WORDS + words > max_words:
+            group = {"faq": dict(faq), "parts": [faq["answer"]], "words": words}
+            open_groups[key] = group
+            out.append(group["faq"])
+            continue
+        group["parts"].append(faq["answer"])
+        group["words"] += SEPARATOR_WORDS + words
+        group["faq"]["answer"] = MERGE_SEPARATOR.join(group["parts"])
+        group["faq"]["merged"] = len(group["parts"])
+
+    groups = [{"question": f["question"], "merged": f["merged"]} for f in out if "merged" in f]
+    return out, groups
 
 
 # ---------------------- MAIN FUNCTION ----------------------
@@ -50,7 +215,7 @@ def merge_faqs():
 
     # Load manual and generated FAQ files
     manual_faqs = load_json(os.path.join(DATA_DIR, "faqs.json"))
-    generated_faqs = load_json(os.path.join(DATA_DIR, "faqs_generated.json"))
+    generated_faqs = load_json(os.path.join(DATA_DIR, "faqs_chunked.json"))
 
     all_faqs = []
 
@@ -62,7 +227,7 @@ def merge_faqs():
     for item in generated_faqs:
         all_faqs.append(normalize_faq(item))
 
-    # Remove duplicates
+    # Remove exact duplicates
     seen = set()
     unique_faqs = []
 
@@ -72,14 +237,38 @@ def merge_faqs():
             seen.add(key)
             unique_faqs.append(faq)
 
+    # Near-duplicates, then one grouped answer per templated question
+    distinct_faqs, clusters, candidate_pairs = drop_near_duplicates(unique_faqs)
+    final_faqs, groups = merge_same_question(distinct_faqs)
+
     # Save merged output
+    # Unchanged output keeps its mtime, so the index is not rebuilt or
+    # hot-reloaded for nothing.
     output_path = os.path.join(DATA_DIR, "faqs_final.json")
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(unique_faqs, f, indent=2, ensure_ascii=False)
+    wrote = write_json_if_changed(output_path, final_faqs)
+
+    summary = {
+        "input": len(all_faqs),
+        "exact_duplicates": len(all_faqs) - len(unique_faqs),
+        "near_duplicates": len(unique_faqs) - len(distinct_faqs),
+        "candidate_pairs": candidate_pairs,
+        "merged_groups": len(groups),
+        "faqs": len(final_faqs),
+    }
+    write_json_if_changed(REPORT_PATH, {"summary": summary, "clusters": clusters, "groups": groups})
+    summary["wrote"] = wrote
+
+    for cluster in clusters[:10]:
+        print(f"[CLUSTER] {cluster['kept']['question']} ({cluster['kept']['source']}): "
+              f"dropped {len(cluster['dropped'])}")
+    for group in groups:
+        print(f"[GROUP] {group['question']}: {group['merged']} answers merged")
 
-    print(f"[DONE] Final FAQ file saved → {output_path}")
-    print(f"[COUNT] Total FAQs in final dataset: {len(unique_faqs)}")
+    print(f"[DONE] Final FAQ file {'saved' if wrote else 'unchanged'} → {output_path} "
+          f"(clusters → {REPORT_PATH})")
+    print(f"[COUNT] {summary}")
     print("\nUse faqs_final.json in your chatbot now!\n")
+    return summary
 
 
 # ---------------------- RUN DIRECTLY ----------------------
@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import argparse
+
+from retriever import chunk_faqs, clean_dataset, generate_faqs, merge_faqs
+from retriever.bm25 import build_bm25_index
+from retriever.build_index import build_index
+from retriever.facts import build_fact_store
+from retriever.intents import build_intent_model
+from retriever.utils import file_hash, record_hash, write_json_if_changed
+
+DATA_DIR = "data"
+STATE_DIR = os.path.join(DATA_DIR, "pipeline")
+MANIFEST_PATH = os.path.join(STATE_DIR, "manifest.json")
+
+
+def data_path(name):
+    return os.path.join(DATA_DIR, name)
+
+
+# ---------------------- STATE ----------------------
+
+def load_state(name, default):
+    path = os.path.join(STATE_DIR, name)
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable {path}: {e}")
+        return default
+
+
+def save_state(name, data):
+    write_json_if_changed(os.path.join(STATE_DIR, name), data)
+
+
+def hash_files(paths):
+    return {p: file_hash(p) if os.path.exists(p) else None for p in paths}
+
+
+# ---------------------- STAGES ----------------------
+#
+# Each stage returns a small summary dict. Record-level stages (except
+# clean, see run_clean) keep a cache of {input record hash: output} so
+# that only changed records are reprocessed, and write their output only
+# if it actually changed; an unchanged output hash stops the rebuild from
+# propagating downstream.
+
+def run_build(dry_run):
+    if dry_run:
+        return {"note": "would scrape gmu.ac.in"}
+    from retriever.build_dataset import build_datasets  # network deps only here
+    build_datasets()
+    return {}
+
+
+def run_clean(dry_run):
+    # Every record is re-cleaned (streamed, one worker per source file):
+    # cleaning costs about as much as looking up a cached row would, and
+    # a row cache would hold the whole dataset again. Only the 64-bit
+    # hashes of the raw records are kept between runs, to report how
+    # many changed.
+    previous = set(load_state("clean_records.json", []))
+    result = clean_dataset.clean_dataset(write=not dry_run)
+    hashes = result.pop("raw_hashes")
+    changed = sum(1 for h in hashes if h not in previous)
+
+    summary = {"changed_records": changed, "unchanged_records": len(hashes) - changed,
+               "duplicates": result["duplicates"], "records_per_sec": result["records_per_sec"]}
+    if not dry_run:
+        summary["wrote"] = result["wrote"]
+        save_state("clean_records.json", sorted(set(hashes)))
+    return summary
+
+
+def run_generate(dry_run):
+    cleaned = clean_dataset.load_json(data_path("cleaned_data.json")) or {}
+    cache = load_state("generate_records.json", {})
+    new_cache = {}
+    faqs = []
+    reused = changed = 0
+
+    for section, generator in generate_faqs.GENERATORS:
+        for record in cleaned.get(section, []):
+            key = f"{section}:{record_hash(record)}"
+            if key in cache:
+                record_faqs = cache[key]
+                reused += 1
+            else:
+                record_faqs = generator([record])
+                changed += 1
+            new_cache[key] = record_faqs
+            faqs.extend(record_faqs)
+
+    summary = {"changed_records": changed, "reused_records": reused, "faqs": len(faqs)}
+    if not dry_run:
+        summary["wrote"] = write_json_if_changed(data_path("faqs_generated.json"), faqs)
+        save_state("generate_records.json", new_cache)
+    return summary
+
+
+def run_chunk(dry_run):
+    faqs = chunk_faqs.load_json(data_path("faqs_generated.json"))
+    chunked = chunk_faqs.chunk_faqs_list(faqs)
+    summary = {
+        "faqs": len(faqs),
+        "passages": len(chunked),
+        "split": len({x["parent_id"] for x in chunked if "parent_id" in x}),
+    }
+    if not dry_run:
+        summary["wrote"] = write_json_if_changed(data_path("faqs_chunked.json"), chunked)
+    return summary
+
+
+def run_merge(dry_run):
+    if dry_run:
+        return {}
+    return merge_faqs.merge_faqs()
+
+
+def run_index(dry_run):
+    if dry_run:
+        return {}
+    return {"index_dir": build_index(data_path("faqs_final.json"))}
+
+
+def run_bm25(dry_run):
+    if dry_run:
+        return {}
+    return {"index_dir": build_bm25_index(data_path("faqs_final.json"))}
+
+
+def run_intent(dry_run):
+    if dry_run:
+        return {}
+    return {"index_dir": build_intent_model(data_path("faqs_final.json"))}
+
+
+def run_facts(dry_run):
+    if dry_run:
+        return {}
+    return {"index_dir": build_fact_store(data_path("cleaned_data.json"))}
+
+
+def run_embed(dry_run):
+    if dry_run:
+        return {}
+    from retriever.dense import build_dense_index  # optional model deps only here
+    return {"index_dir": build_dense_index(data_path("faqs_final.json"))}
+
+
+def embed_skip_reason():
+    if not os.getenv("EMBEDDING_MODEL_PATH"):
+        return "set EMBEDDING_MODEL_PATH to build dense embeddings"
+    return None
+
+
+class Stage:
+    def __init__(self, name, deps, inputs, outputs, run, skip_reason=None):
+        self.name = name
+        self.deps = deps
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run = run
+        self.skip_reason = skip_reason or (lambda: None)
+
+
+STAGES = [
+    Stage("build", [], [],
+          [data_path(f) for f in ("programs.json", "faculty.json", "governance.json",
+                                  "phd_supervisors.json", "contacts.json")],
+          run_build),
+    Stage("clean", ["build"],
+          [clean_dataset.source_path(f) for _, f, _, _ in clean_dataset.SECTIONS],
+          [data_path("cleaned_data.json")],
+          run_clean),
+    Stage("generate", ["clean"],
+          [data_path("cleaned_data.json")],
+          [data_path("faqs_generated.json")],
+          run_generate),
+    Stage("chunk", ["generate"],
+          [data_path("faqs_generated.json")],
+          [data_path("faqs_chunked.json")],
+          run_chunk),
+    Stage("merge", ["chunk"],
+          [data_path("faqs.json"), data_path("faqs_chunked.json")],
+          [data_path("faqs_final.json")],
+          run_merge),
+    Stage("index", ["merge"],
+          [data_path("faqs_final.json")],
+          [],
+          run_index),
+    Stage("bm25", ["merge"],
+          [data_path("faqs_final.json")],
+          [],
+          run_bm25),
+    # Also trained on the chat log; `--since intent` refreshes it.
+    Stage("intent", ["merge"],
+          [data_path("faqs_final.json")],
+          [],
+          run_intent),
+    # Program / supervisor tables for list and entity questions.
+    Stage("facts", ["clean"],
+          [data_path("cleaned_data.json")],
+          [],
+          run_facts),
+    Stage("embed", ["merge"],
+          [data_path("faqs_final.json")],
+          [],
+          run_embed,
+          embed_skip_reason),
+]
+STAGE_NAMES = [s.name for s in STAGES]
+
+
+def downstream_of(name):
+    """``name`` plus every stage that (transitively) depends on it."""
+    result = {name}
+    for stage in STAGES:  # STAGES is topologically ordered
+        if any(d in result for d in stage.deps):
+            result.add(stage.name)
+    return result
+
+
+# ---------------------- RUNNER ----------------------
+
+def stage_dirty(stage, manifest):
+    """Why the stage must run, or None if its inputs and outputs are unchanged."""
+    recorded = manifest.get("stages", {}).get(stage.name)
+    if recorded is None:
+        return "never ran"
+    if hash_files(stage.inputs) != recorded.get("inputs"):
+        return "inputs changed"
+    if hash_files(stage.outputs) != recorded.get("outputs"):
+        return "outputs missing or edited"
+    return None
+
+
+def run_pipeline(since=None, scrape=False, force=False, dry_run=False):
+    manifest = load_state("manifest.json", {"stages": {}})
+    forced = set(STAGE_NAMES) if force else set()
+    if since:
+        forced |= downstream_of(since)
+    if scrape:
+        forced.add("build")
+    elif since != "build":
+        forced.discard("build")
+
+    print("\n============================")
+    print("   GMU DATA PIPELINE" + (" (dry run)" if dry_run else ""))
+    print("============================\n")
+
+    would_run = set()
+    for stage in STAGES:
+        if stage.name == "build" and "build" not in forced:
+            print("[SKIP] build (pass --scrape to re-crawl)")
+            continue
+        skip = stage.skip_reason()
+        if skip:
+            print(f"[SKIP] {stage.name} ({skip})")
+            continue
+
+        reason = "forced" if stage.name in forced else stage_dirty(stage, manifest)
+        if reason is None and dry_run and any(d in would_run for d in stage.deps):
+            reason = "upstream would run"
+        if reason is None:
+            print(f"[SKIP] {stage.name} (up to date)")
+            continue
+
+        would_run.add(stage.name)
+        inputs = hash_files(stage.inputs)
+        start = time.monotonic()
+        summary = stage.run(dry_run)
+        elapsed = time.monotonic() - start
+
+        verb = "WOULD RUN" if dry_run else "RAN"
+        details = " ".join(f"{k}={v}" for k, v in summary.items())
+        print(f"[{verb}] {stage.name} ({reason}) {details} [{elapsed:.2f}s]")
+
+        if not dry_run:
+            manifest.setdefault("stages", {})[stage.name] = {
+                "inputs": inputs,
+                "outputs": hash_files(stage.outputs),
+                "ran_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "summary": summary,
+            }
+            save_state("manifest.json", manifest)
+
+    return manifest
+
+
+# ---------------------- RUN DIRECTLY ----------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incremental build → clean → generate → chunk → merge → index pipeline"
+    )
+    parser.add_argument("--since", choices=STAGE_NAMES,
+                        help="force this stage and everything downstream of it")
+    parser.add_argument("--scrape", action="store_true", help="include the scrape stage")
+    parser.add_argument("--force", action="store_true", help="rebuild every stage")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would run and how many records changed")
+    args = parser.parse_args()
+
+    run_pipeline(since=args.since, scrape=args.scrape, force=args.force, dry_run=args.dry_run)
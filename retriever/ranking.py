@@ -0,0 +1,235 @@
+import os
+import math
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+
+FUSION = os.getenv("RANK_FUSION", "rrf")                      # rrf | weighted
+RRF_K = 60
+CANDIDATES = int(os.getenv("RANK_CANDIDATES", 10))            # per retriever
+RETRIEVAL_BUDGET_MS = float(os.getenv("RETRIEVAL_BUDGET_MS", 50))
+# Hard cap when no retriever made the budget: the first one to finish
+# after it (in practice the cheapest) is waited for this long at most.
+RETRIEVAL_TIMEOUT_MS = float(os.getenv("RETRIEVAL_TIMEOUT_MS", 2000))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 10))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 100))
+CALIBRATION_SLOPE = 12.0
+
+RANK_THREADS = int(os.getenv("RANK_THREADS", 8))
+# A timed-out rerank keeps its pool thread until the model returns, so
+# at most this many run at once; the rest of the pool stays free for
+# retrievers.
+RERANK_MAX_IN_FLIGHT = int(os.getenv("RERANK_MAX_IN_FLIGHT", max(1, RANK_THREADS // 2)))
+
+_POOL = ThreadPoolExecutor(max_workers=RANK_THREADS, thread_name_prefix="ranking")
+_RERANK_SLOTS = threading.BoundedSemaphore(RERANK_MAX_IN_FLIGHT)
+
+STATS = {"queries": 0, "retriever_timeouts": 0, "retriever_errors": 0,
+         "rerank_timeouts": 0, "rerank_errors": 0, "rerank_skipped": 0, "reranked": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        STATS[key] += n
+
+
+# ---------------------- RETRIEVERS ----------------------
+
+class Retriever:
+    """One first-stage retriever plus how to read its scores.
+
+    ``search(queries, k)`` returns one result list per query. Raw scores
+    are mapped to a probability with a logistic curve centred on
+    ``midpoint`` (the score that used to be the grounding threshold), so
+    scores from different backends become comparable.
+    """
+
+    def __init__(self, name, search, midpoint, weight=1.0, slope=CALIBRATION_SLOPE):
+        self.name = name
+        self.search = search
+        self.midpoint = midpoint
+        self.weight = weight
+        self.slope = slope
+
+    def calibrate(self, score):
+        return 1.0 / (1.0 + math.exp(-self.slope * (score - self.midpoint)))
+
+
+# ---------------------- FUSION ----------------------
+
+def fuse(runs, retrievers, top_n, method=FUSION):
+    """Merge per-retriever result lists into one ranked candidate list.
+
+    Each candidate gets ``confidence``: the highest calibrated
+    probability any retriever assigned it.
+    """
+    by_id = {}
+    for name, results in runs.items():
+        r = retrievers[name]
+        for rank, item in enumerate(results):
+            cand = by_id.get(item["id"])
+            if cand is None:
+                cand = by_id[item["id"]] = dict(item, fused=0.0, confidence=0.0, scores={})
+            prob = r.calibrate(item["score"])
+            cand["scores"][name] = item["score"]
+            cand["confidence"] = max(cand["confidence"], prob)
+            if method == "weighted":
+                cand["fused"] += r.weight * prob
+            else:
+                cand["fused"] += r.weight / (RRF_K + rank + 1)
+
+    ranked = sorted(by_id.values(), key=lambda c: c["fused"], reverse=True)
+    return ranked[:top_n]
+
+
+# ---------------------- PIPELINE ----------------------
+
+def _collect(done, futures, runs):
+    for f in done:
+        try:
+            runs[futures[f]] = f.result()
+        except Exception as e:
+            _count("retriever_errors")
+            metrics.record_error("retriever", e, retriever=futures[f])
+    return runs
+
+
+def _run_retrievers(queries, retrievers, k, budget_s, timeout_s):
+    """Run all retrievers in parallel, one or several alike.
+
+    Retrievers that succeed within the budget are used; the rest are
+    dropped for this batch. If none did, the first to succeed within
+    ``timeout_s`` (None: no limit) is used, and if none does the batch
+    gets no results (answered without context) rather than an error.
+    """
+    # Each search runs in the caller's context so per-request state
+    # (e.g. a sampled trace) follows it into the pool thread.
+    futures = {
+        _POOL.submit(contextvars.copy_context().run, r.search, queries, k): name
+        for name, r in retrievers.items()
+    }
+    done, pending = wait(futures, timeout=budget_s)
+    runs = _collect(done, futures, {})
+
+    deadline = None if timeout_s is None else time.monotonic() + max(0.0, timeout_s - budget_s)
+    while not runs and pending:
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        _collect(done, futures, runs)
+
+    if pending:
+        _count("retriever_timeouts", len(pending))
+        for f in pending:
+            f.cancel()
+            metrics.record_error("retriever_timeout", TimeoutError("no results in time"),
+                                 retriever=futures[f], queries=len(queries))
+    return runs
+
+
+def rank_many(queries, retrievers, top_k=3, reranker=None, fusion=FUSION,
+              candidates=CANDIDATES, retrieval_budget_ms=RETRIEVAL_BUDGET_MS,
+              retrieval_timeout_ms=RETRIEVAL_TIMEOUT_MS,
+              rerank_top_n=RERANK_TOP_N, rerank_budget_ms=RERANK_BUDGET_MS):
+    """Retrieve → fuse → (rerank) for a batch of queries.
+
+    Every result carries ``score`` (fused/reranked score), ``confidence``
+    (calibrated probability used for the grounding decision) and the
+    per-retriever raw ``scores``.
+    """
+    _count("queries", len(queries))
+    k = max(top_k, candidates)
+    timeout_s = None if retrieval_timeout_ms is None else retrieval_timeout_ms / 1000.0
+    runs = _run_retrievers(queries, retrievers, k, retrieval_budget_ms / 1000.0, timeout_s)
+
+    out = []
+    for qi, query in enumerate(queries):
+        per_query = {name: results[qi] for name, results in runs.items()}
+        if len(per_query) == 1:
+            (name, results), = per_query.items()
+            r = retrievers[name]
+            fused = [
+                dict(item, confidence=r.calibrate(item["score"]), scores={name: item["score"]})
+                for item in results
+            ]
+        else:
+            fused = fuse(per_query, retrievers, max(top_k, rerank_top_n), fusion)
+            for cand in fused:
+                cand["score"] = cand.pop("fused")
+        out.append(fused)
+
+    if reranker is not None:
+        out = _rerank(queries, out, reranker, rerank_top_n, rerank_budget_ms / 1000.0)
+
+    return [results[:top_k] for results in out]
+
+
+def _rerank(queries, ranked, reranker, top_n, budget_s):
+    """Rerank only the head of each list; keep the fused order on
+    timeout, error, or when RERANK_MAX_IN_FLIGHT reranks are running."""
+    pairs = [(qi, c) for qi, cands in enumerate(ranked) for c in cands[:top_n]]
+    if not pairs:
+        return ranked
+
+    if not _RERANK_SLOTS.acquire(blocking=False):
+        _count("rerank_skipped")
+        return ranked
+    start = time.monotonic()
+    try:
+        future = _POOL.submit(
+            reranker, [(queries[qi], f"{c['question']} {c['answer']}") for qi, c in pairs]
+        )
+    except Exception:
+        _RERANK_SLOTS.release()
+        raise
+    # The slot is held until the rerank really ends, not just until we
+    # stop waiting for it.
+    future.add_done_callback(lambda f: _RERANK_SLOTS.release())
+    try:
+        scores = future.result(timeout=budget_s)
+    except Exception as e:
+        future.cancel()
+        timed_out = isinstance(e, TimeoutError)
+        _count("rerank_timeouts" if timed_out else "rerank_errors")
+        metrics.record_error("rerank_timeout" if timed_out else "rerank", e,
+                             seconds=round(time.monotonic() - start, 3), pairs=len(pairs))
+        return ranked
+
+    _count("reranked", len(queries))
+    for (qi, cand), score in zip(pairs, scores):
+        cand["rerank_score"] = float(score)
+        cand["confidence"] = float(score)
+
+    result = []
+    for qi, cands in enumerate(ranked):
+        head = sorted(cands[:top_n], key=lambda c: c["rerank_score"], reverse=True)
+        result.append(head + cands[top_n:])
+    return result
+
+
+# ---------------------- RERANKER ----------------------
+
+class CrossEncoderReranker:
+    """Cross-encoder from a local path (RERANKER_MODEL_PATH).
+
+    Returns probabilities in [0, 1], which double as calibrated
+    confidence.
+    """
+
+    def __init__(self, model_path):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise RuntimeError("Reranking needs `pip install sentence-transformers`")
+        self.model = CrossEncoder(model_path, device="cpu")
+
+    def __call__(self, pairs):
+        scores = [float(x) for x in self.model.predict(pairs)]
+        if all(0.0 <= x <= 1.0 for x in scores):
+            return scores  # model already applies a sigmoid
+        return [1.0 / (1.0 + math.exp(-x)) for x in scores]
@@ -0,0 +1,71 @@
+import time
+
+import numpy as np
+
+
+# ---------------------- TOP-K SELECTION ----------------------
+
+def select_top_k(scores, ids, k):
+    """Return (scores, ids) of the k best entries, best first.
+
+    Uses argpartition (O(n)) and only sorts the k survivors.
+    """
+    if len(scores) > k:
+        part = np.argpartition(scores, -k)[-k:]
+        scores, ids = scores[part], ids[part]
+    order = np.argsort(scores)[::-1]
+    return scores[order], ids[order]
+
+
+# ---------------------- RETRIEVAL ----------------------
+
+def retrieve_many(index, queries, top_k=3, min_score=0.0, timings=None):
+    """Score a batch of queries against the index in one sparse matmul.
+
+    TF-IDF rows are already L2-normalized, so the dot product is the
+    cosine similarity. Only non-zero scores are materialized and the
+    threshold is applied before top-k selection. Returns one result list
+    per query. ``timings``, if given, receives the seconds spent in
+    ``transform`` and ``similarity``.
+    """
+    results = [[] for _ in queries]
+    live = [i for i, q in enumerate(queries) if q and q.strip()]
+    if not live:
+        return results
+
+    began = time.perf_counter()
+    query_vecs = index.transform([queries[i] for i in live])
+    transformed = time.perf_counter()
+    sims = (query_vecs @ index.matrix.T).tocsr()
+    if timings is not None:
+        timings["transform"] = transformed - began
+        timings["similarity"] = time.perf_counter() - transformed
+
+    for row, qi in enumerate(live):
+        start, end = sims.indptr[row], sims.indptr[row + 1]
+        scores = sims.data[start:end]
+        ids = sims.indices[start:end]
+
+        keep = scores > min_score
+        if not keep.all():
+            scores, ids = scores[keep], ids[keep]
+        if not len(scores):
+            continue
+
+        scores, ids = select_top_k(scores, ids, top_k)
+        results[qi] = [
+            {
+                "id": int(idx),
+                "version": index.version,
+                "question": index.questions[idx],
+                "answer": index.answers[idx],
+                "score": float(score),
+            }
+            for score, idx in zip(scores, ids)
+        ]
+
+    return results
+
+
+def retrieve(index, query, top_k=3, min_score=0.0):
+    return retrieve_many(index, [query], top_k, min_score)[0]
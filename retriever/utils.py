@@ -0,0 +1,39 @@
+import os
+import json
+import hashlib
+
+
+# ---------------------- SHARED PIPELINE HELPERS ----------------------
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, used to key derived artifacts."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def record_hash(record):
+    """Stable content hash of a JSON-serializable record."""
+    data = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def write_json_if_changed(path, data, indent=2):
+    """Write only when the serialized content differs; returns True if written.
+
+    Leaves the file (and its hash) untouched for downstream stages when a
+    rerun produces identical output.
+    """
+    new = json.dumps(data, indent=indent, ensure_ascii=False)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == new:
+                return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(new)
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,242 @@
+import os
+import re
+import time
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+import metrics
+
+
+COOKIE_NAME = os.getenv("SESSION_COOKIE", "gmu_sid")
+MAX_TURNS = int(os.getenv("SESSION_TURNS", 4))
+TTL_SECONDS = int(os.getenv("SESSION_TTL", 30 * 60))                 # idle timeout
+MAX_SESSION_BYTES = int(os.getenv("SESSION_MAX_BYTES", 4096))        # per session
+MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 10000))         # in-process store
+DB_PATH = os.getenv("SESSION_DB", "")  # empty → in-process only
+
+REPLY_CHARS = 300  # only the head of a reply is remembered
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def _turn(user, bot):
+    return user, (bot or "")[:REPLY_CHARS]
+
+
+def _turn_size(turn):
+    return len(turn[0].encode("utf-8")) + len(turn[1].encode("utf-8"))
+
+
+# ----------------- QUERY REWRITING -----------------
+
+_FOLLOW_UP = re.compile(
+    r"^(and|also|what about|how about|same for|then|but|or)\b"
+    r"|\b(it|its|they|them|their|those|these|this one|that one|the same)\b",
+    re.IGNORECASE,
+)
+CARRY_WORDS = 24  # most of the previous question carried into a rewrite
+
+
+def is_follow_up(message):
+    """Explicit follow-up: an opener ("and ...", "what about ...") or a
+    pronoun that needs an antecedent ("their fees")."""
+    return bool(_FOLLOW_UP.search(message))
+
+
+def rewrite_query(message, turns):
+    """Retrieval query for ``message``: a follow-up is prefixed with the
+    previous question.
+
+    "and what about PG?" after "What programs are offered in Engineering
+    UG?" retrieves on both. Self-contained questions are returned as-is.
+    Turns hold the user's own messages, so a previous question that was
+    itself a follow-up is expanded the same way first; only the last
+    CARRY_WORDS words carry. The rewrite is for retrieval only: the
+    prompt, caches and stored turn keep the original message.
+    """
+    if not turns or not is_follow_up(message):
+        return message
+    previous = rewrite_query(turns[-1][0], turns[:-1])
+    previous = " ".join(previous.split()[-CARRY_WORDS:])
+    return f"{previous} {message}"
+
+
+# ----------------- IN-PROCESS STORE -----------------
+
+class _Session:
+    __slots__ = ("turns", "bytes", "touched")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)
+        self.bytes = 0
+        self.touched = time.time()
+
+
+class SessionStore:
+    """Last ``max_turns`` (question, reply head) pairs per session.
+
+    Each session is a ring buffer that also drops its oldest turns once
+    over ``max_bytes``; idle sessions expire after ``ttl`` seconds and the
+    least recently used are evicted past ``max_sessions``. With
+    ``db_path`` the turns live in sqlite instead, so every worker sees
+    the same sessions.
+    """
+
+    def __init__(self, max_turns=MAX_TURNS, ttl=TTL_SECONDS, max_bytes=MAX_SESSION_BYTES,
+                 max_sessions=MAX_SESSIONS, db_path=DB_PATH):
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"appended": 0, "rewrites": 0, "expired": 0, "evictions": 0}
+
+        self._db = None
+        if db_path:
+            self._open_db(db_path)
+
+    # ---- public API ----
+
+    def history(self, sid):
+        """Turns of ``sid``, oldest first; [] for unknown or expired sessions."""
+        if not sid or self.max_turns <= 0:
+            return []
+        if self._db is not None:
+            return self._db_history(sid)
+
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                return []
+            if now - session.touched > self.ttl:
+                self._drop(sid)
+                self.stats["expired"] += 1
+                return []
+            return list(session.turns)
+
+    def append(self, sid, user, bot):
+        if not sid or self.max_turns <= 0:
+            return
+        turn = _turn(user, bot)
+        if self._db is not None:
+            self._db_append(sid, turn)
+            with self._lock:
+                self.stats["appended"] += 1
+            return
+
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(sid)
+            if session is None:
+                session = self._sessions[sid] = _Session(self.max_turns)
+            self._sessions.move_to_end(sid)
+            session.touched = now
+
+            if len(session.turns) == session.turns.maxlen:
+                session.bytes -= _turn_size(session.turns[0])
+            session.turns.append(turn)
+            session.bytes += _turn_size(turn)
+            while session.bytes > self.max_bytes and len(session.turns) > 1:
+                session.bytes -= _turn_size(session.turns.popleft())
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evictions"] += 1
+            self.stats["appended"] += 1
+
+    def rewrite(self, sid, message):
+        """(retrieval query, history) for a new message in ``sid``."""
+        turns = self.history(sid)
+        query = rewrite_query(message, turns)
+        if query != message:
+            with self._lock:
+                self.stats["rewrites"] += 1
+        return query, turns
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            if self._db is None:
+                stats["sessions"] = len(self._sessions)
+                stats["bytes"] = sum(s.bytes for s in self._sessions.values())
+        stats["store"] = "sqlite" if self._db is not None else "memory"
+        return stats
+
+    # ---- internals (call with lock held) ----
+
+    def _drop(self, sid):
+        self._sessions.pop(sid, None)
+
+    def _expire(self, now):
+        # Ordered by last use, so expired sessions are at the front.
+        while self._sessions:
+            sid, session = next(iter(self._sessions.items()))
+            if now - session.touched <= self.ttl:
+                break
+            self._drop(sid)
+            self.stats["expired"] += 1
+
+    # ---- sqlite store ----
+
+    def _open_db(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            " sid TEXT, created REAL, user TEXT, bot TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS turns_sid ON turns (sid, created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS turns_created ON turns (created)")
+        self._db_lock = threading.Lock()
+        self._db_purged = 0.0
+
+    def _db_history(self, sid):
+        cutoff = time.time() - self.ttl
+        try:
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT user, bot, created FROM turns WHERE sid = ?"
+                    " ORDER BY created DESC LIMIT ?", (sid, self.max_turns)
+                ).fetchall()
+        except sqlite3.Error as e:
+            metrics.record_error("session_db", e)
+            return []
+        if not rows or rows[0][2] < cutoff:
+            return []
+
+        turns, size = [], 0
+        for user, bot, _ in rows:  # newest first
+            size += _turn_size((user, bot))
+            if turns and size > self.max_bytes:
+                break
+            turns.append((user, bot))
+        return turns[::-1]
+
+    def _db_append(self, sid, turn):
+        now = time.time()
+        try:
+            with self._db_lock:
+                self._db.execute("INSERT INTO turns VALUES (?, ?, ?, ?)", (sid, now, *turn))
+                self._db.execute(
+                    "DELETE FROM turns WHERE sid = ? AND created NOT IN ("
+                    " SELECT created FROM turns WHERE sid = ? ORDER BY created DESC LIMIT ?)",
+                    (sid, sid, self.max_turns),
+                )
+                if now - self._db_purged > 60:
+                    self._db_purged = now
+                    self._db.execute(
+                        "DELETE FROM turns WHERE sid IN ("
+                        " SELECT sid FROM turns GROUP BY sid HAVING MAX(created) < ?)",
+                        (now - self.ttl,),
+                    )
+        except sqlite3.Error as e:
+            metrics.record_error("session_db", e)
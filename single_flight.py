@@ -0,0 +1,79 @@
+import asyncio
+import threading
+
+
+# ----------------- THREADED -----------------
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one.
+
+    The first caller for a key (the leader) runs ``fn``; callers arriving
+    while it is in flight wait for and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+# ----------------- ASYNCIO -----------------
+
+class AsyncSingleFlight:
+    """asyncio flavour of :class:`SingleFlight`.
+
+    The shared work runs in its own task, so a leader whose client
+    disconnects (and gets cancelled) does not cancel it for followers.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.stats["leaders"] += 1
+        return await asyncio.shield(task)
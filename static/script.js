@@ -34,6 +34,71 @@ function addMessage(text, sender = "bot") {
 
   chatWindow.appendChild(msgDiv);
   chatWindow.scrollTop = chatWindow.scrollHeight;
+
+  return bubbleDiv;
+}
+
+/* ------------------ STREAMED REPLY (SSE over fetch) ------------------ */
+
+async function streamReply(text) {
+  const res = await fetch("/chat/stream", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ message: text }),
+  });
+
+  // Rate limited (429) or too busy (503): the server sends a reply to show
+  if (res.status === 429 || res.status === 503) {
+    const data = await res.json();
+    typingIndicator.classList.add("hidden");
+    addMessage(data.reply, "bot");
+    return true;
+  }
+
+  if (!res.ok || !res.body) throw new Error("stream unavailable");
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let bubble = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      }
+      const payload = data ? JSON.parse(data) : {};
+
+      if (event === "error") throw new Error(payload.error);
+      if (event === "done") return bubble !== null;
+
+      if (payload.delta) {
+        if (bubble === null) {
+          typingIndicator.classList.add("hidden");
+          bubble = addMessage("", "bot");
+        }
+        bubble.textContent += payload.delta;
+        chatWindow.scrollTop = chatWindow.scrollHeight;
+      }
+    }
+  }
+
+  return bubble !== null;
 }
 
 /* ------------------ SEND MESSAGE ------------------ */
@@ -52,22 +117,9 @@ async function sendMessage() {
   typingIndicator.classList.remove("hidden");
 
   try {
-    const res = await fetch("/chat", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ message: text }),
-    });
-
-    const data = await res.json();
-    const botReply = data.reply || "Sorry, I couldn't understand that.";
-
-    // Delay to feel more human-like
-    setTimeout(() => {
-      addMessage(botReply, "bot");
-      typingIndicator.classList.add("hidden");
-    }, 500);
+    const gotReply = await streamReply(text);
+    typingIndicator.classList.add("hidden");
+    if (!gotReply) addMessage("Sorry, I couldn't understand that.", "bot");
   } catch (error) {
     typingIndicator.classList.add("hidden");
     addMessage("I'm having trouble connecting right now. Please try again soon.", "bot");
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The modules under test live at the repository root and in retriever/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Before anything imports metrics or chat_logger: keep errors.log and the
+# chat log written by the tests out of logs/.
+os.environ.setdefault("CHAT_LOG_DIR", tempfile.mkdtemp(prefix="gmu-test-logs-"))
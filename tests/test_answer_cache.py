@@ -0,0 +1,49 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from answer_cache import AnswerCache
+
+FAQ_QUESTIONS = [
+    "What programs are offered under Engineering (UG)?",
+    "What is the fee structure for Engineering?",
+]
+RETRIEVED = [{"id": 0, "version": "v1", "question": FAQ_QUESTIONS[0]}]
+
+
+def make_cache():
+    vectorizer = TfidfVectorizer(stop_words="english").fit(FAQ_QUESTIONS)
+    return AnswerCache(vectorize=vectorizer.transform)
+
+
+def put(cache, query, answer):
+    norm, ctx, key = cache.keys(query, RETRIEVED)
+    cache.put(norm, ctx, key, answer)
+
+
+def get(cache, query):
+    return cache.get(*cache.keys(query, RETRIEVED))
+
+
+def test_distinct_questions_with_same_context_do_not_collide():
+    cache = make_cache()
+    put(cache, "What is the eligibility for Engineering UG?", "eligibility answer")
+
+    # Same TF-IDF vector (only "engineering" and "ug" are in the
+    # vocabulary), same retrieved context, different question.
+    assert get(cache, "What is the placement record of Engineering UG?") is None
+    assert cache.stats["hits_near"] == 0
+
+
+def test_rephrased_question_hits_near_tier():
+    cache = make_cache()
+    put(cache, "What are the fees for Engineering UG?", "fee answer")
+
+    assert get(cache, "engineering UG fees?") == "fee answer"
+    assert cache.stats["hits_near"] == 1
+
+
+def test_exact_tier_ignores_case_and_punctuation():
+    cache = make_cache()
+    put(cache, "Is there a hostel?", "hostel answer")
+
+    assert get(cache, "is there a HOSTEL") == "hostel answer"
+    assert cache.stats["hits_exact"] == 1
@@ -0,0 +1,24 @@
+import json
+
+from chat_logger import iter_chat_logs, migrate_json_log
+
+
+def users(path, **kwargs):
+    return [e["user"] for e in iter_chat_logs(str(path), **kwargs)]
+
+
+def test_legacy_log_is_read_before_the_jsonl(tmp_path):
+    (tmp_path / "chat_logs.json").write_text(json.dumps([{"user": "old"}]))
+    (tmp_path / "chat_logs.jsonl").write_text(json.dumps({"user": "new"}) + "\n")
+    path = tmp_path / "chat_logs.jsonl"
+
+    assert users(path) == ["new"]
+    assert users(path, include_legacy=True) == ["old", "new"]
+
+
+def test_migrated_entries_are_read_once(tmp_path):
+    (tmp_path / "chat_logs.json").write_text(json.dumps([{"user": "old"}]))
+    path = tmp_path / "chat_logs.jsonl"
+    assert migrate_json_log(str(tmp_path / "chat_logs.json"), str(path)) == 1
+
+    assert users(path, include_legacy=True) == ["old"]
@@ -0,0 +1,129 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from retriever.crawler import Crawler
+
+
+class Site:
+    """Local pages with ETags; ``fail`` makes the next N requests answer 503."""
+
+    def __init__(self):
+        self.pages = {}  # path → (etag, body)
+        self.fail = 0
+        self.requests = []  # (path, If-None-Match)
+        self.lock = threading.Lock()
+
+
+def make_handler(site):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with site.lock:
+                site.requests.append((self.path, self.headers.get("If-None-Match")))
+                failing = site.fail > 0
+                site.fail -= failing
+            if failing:
+                return self._send(503, b"busy")
+            if self.path not in site.pages:
+                return self._send(404, b"not found")
+            etag, body = site.pages[self.path]
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", etag)
+            self._send(200, body.encode("utf-8"), etag)
+
+        def _send(self, status, data, etag=None):
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+            if status != 304:
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+@pytest.fixture
+def site():
+    site = Site()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield site
+    server.shutdown()
+
+
+def crawler(tmp_path, **kwargs):
+    return Crawler(cache_dir=str(tmp_path / "raw"), rate=1000, burst=100, **kwargs)
+
+
+def test_unchanged_page_is_served_from_cache_on_304(site, tmp_path):
+    site.pages["/a"] = ('"v1"', "<p>first</p>")
+    assert crawler(tmp_path).fetch(site.url + "/a") == "<p>first</p>"
+
+    second = crawler(tmp_path)  # new run, same cache dir
+    assert second.fetch(site.url + "/a") == "<p>first</p>"
+    assert site.requests[-1] == ("/a", '"v1"')
+    assert second.stats["not_modified"] == 1 and second.stats["fetched"] == 0
+
+
+def test_changed_page_is_refetched_and_cached(site, tmp_path):
+    site.pages["/a"] = ('"v1"', "<p>first</p>")
+    crawler(tmp_path).fetch(site.url + "/a")
+    site.pages["/a"] = ('"v2"', "<p>second</p>")
+
+    second = crawler(tmp_path)
+    assert second.fetch(site.url + "/a") == "<p>second</p>"
+    assert second.stats["fetched"] == 1
+
+    crawler(tmp_path).fetch(site.url + "/a")
+    assert site.requests[-1] == ("/a", '"v2"')
+
+
+def test_5xx_is_retried(site, tmp_path):
+    site.pages["/a"] = ('"v1"', "<p>first</p>")
+    site.fail = 1
+
+    c = crawler(tmp_path)
+    assert c.fetch(site.url + "/a") == "<p>first</p>"
+    assert len(site.requests) == 2
+    assert c.stats["fetched"] == 1 and c.stats["errors"] == 0
+
+
+def test_error_falls_back_to_the_cached_copy(site, tmp_path):
+    site.pages["/a"] = ('"v1"', "<p>first</p>")
+    crawler(tmp_path).fetch(site.url + "/a")
+    del site.pages["/a"]
+
+    c = crawler(tmp_path)
+    assert c.fetch(site.url + "/a") == "<p>first</p>"
+    assert c.stats["errors"] == 1
+
+
+def test_fresh_cache_skips_the_request(site, tmp_path):
+    site.pages["/a"] = ('"v1"', "<p>first</p>")
+    crawler(tmp_path).fetch(site.url + "/a")
+
+    c = crawler(tmp_path, fresh_seconds=60)
+    assert c.fetch(site.url + "/a") == "<p>first</p>"
+    assert len(site.requests) == 1
+    assert c.stats["fresh"] == 1
+
+
+def test_fetch_many_requests_each_url_once(site, tmp_path):
+    for name in "abc":
+        site.pages[f"/{name}"] = (f'"{name}"', f"<p>{name}</p>")
+    urls = [f"{site.url}/{name}" for name in "abcab"]
+
+    pages = crawler(tmp_path).fetch_many(urls)
+    assert pages == {f"{site.url}/{name}": f"<p>{name}</p>" for name in "abc"}
+    assert sorted(path for path, _ in site.requests) == ["/a", "/b", "/c"]
@@ -0,0 +1,34 @@
+import pytest
+
+from retriever.intents import IntentRouter, match_pattern, normalize
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("hi", "greeting"),
+    ("Thank you so much!", "thanks"),
+    ("ok bye", "goodbye"),
+    ("who are you", "identity"),
+    ("contact details", "contact"),
+    ("Phone number?", "contact"),
+    ("GMU email id", "contact"),
+    ("address of the university", "contact"),
+    ("how can I contact GMU", "contact"),
+    ("tell me a joke", "out_of_scope"),
+    ("what's the weather today?", "out_of_scope"),
+])
+def test_pattern_table_routes_bare_requests(message, intent):
+    assert match_pattern(normalize(message)) == intent
+
+
+@pytest.mark.parametrize("message", [
+    "email of cse hod",
+    "phone number of the hostel warden",
+    "contact details of phd supervisors",
+    "what is the address of the admission office",
+    "Is there a movie club?",
+    "song competition in fest",
+    "What programs are offered under Engineering (UG)?",
+])
+def test_questions_about_gmu_go_to_retrieval(message):
+    assert match_pattern(normalize(message)) is None
+    assert IntentRouter(model=None).classify(message) is None
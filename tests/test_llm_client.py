@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from groq import InternalServerError
+
+import fake_llm
+import llm_client
+from llm_client import AsyncLLM
+
+MESSAGES = [{"role": "user", "content": "What programs are offered?"}]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0.0)
+
+
+@pytest.fixture
+def fake():
+    servers = []
+
+    def start(**config):
+        server, url, cfg = fake_llm.serve_in_thread(latency=0.0, words=8, **config)
+        servers.append(server)
+        return url, cfg
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def run(url, use, **kwargs):
+    async def main():
+        llm = AsyncLLM(api_key="test", base_url=url, **kwargs)
+        try:
+            return await use(llm), llm.stats
+        finally:
+            await llm.close()
+    return asyncio.run(main())
+
+
+async def collect(stream):
+    return "".join([delta async for delta in stream])
+
+
+def test_chat_retries_a_503(fake):
+    url, cfg = fake(fail_first=2)
+    reply, stats = run(url, lambda llm: llm.chat(MESSAGES), max_retries=3)
+
+    assert reply.startswith("Fake answer to: What programs are offered?")
+    assert cfg.calls == 3
+    assert stats["retries"] == 2 and stats["failures"] == 0
+
+
+def test_stream_retries_opening_the_stream(fake):
+    url, cfg = fake(fail_first=1)
+    text, stats = run(url, lambda llm: collect(llm.stream(MESSAGES)), max_retries=3)
+
+    assert text.startswith("Fake answer to:")
+    assert cfg.calls == 2
+    assert stats["retries"] == 1 and stats["in_flight"] == 0
+
+
+def test_gives_up_after_max_retries(fake):
+    url, cfg = fake(fail_rate=1.0)
+
+    async def use(llm):
+        with pytest.raises(InternalServerError):
+            await collect(llm.stream(MESSAGES))
+
+    _, stats = run(url, use, max_retries=2)
+    assert cfg.calls == 3
+    assert stats["failures"] == 1 and stats["in_flight"] == 0
+
+
+def test_timeout_is_retried(fake):
+    url, cfg = fake()
+    cfg.latency = 0.5
+
+    async def use(llm):
+        with pytest.raises(asyncio.TimeoutError):
+            await llm.chat(MESSAGES)
+
+    _, stats = run(url, use, timeout=0.1, max_retries=1)
+    assert cfg.calls == 2
+    assert stats["retries"] == 1 and stats["failures"] == 1
+
+
+def test_closing_a_stream_releases_its_slot(fake):
+    url, _ = fake()
+
+    async def use(llm):
+        stream = llm.stream(MESSAGES)
+        first = await stream.__anext__()
+        in_flight = llm.stats["in_flight"]
+        await stream.aclose()
+        return first, in_flight
+
+    (first, in_flight), stats = run(url, use)
+    assert first
+    assert in_flight == 1 and stats["in_flight"] == 0
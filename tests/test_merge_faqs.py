@@ -0,0 +1,23 @@
+from retriever.chunk_faqs import CHUNK_WORDS
+from retriever.merge_faqs import merge_same_question
+
+
+def program(name):
+    return {"question": "What programs are offered under Engineering (UG)?",
+            "answer": f"{name} is offered under Engineering (UG) at GM University."}
+
+
+def test_grouped_answers_stay_within_a_chunk():
+    faqs = [program(f"Program {i}") for i in range(30)]
+    out, groups = merge_same_question(faqs)
+    assert len(out) > 1
+    assert all(len(f["answer"].split()) <= CHUNK_WORDS for f in out)
+    assert sum(f.get("merged", 1) for f in out) == len(faqs)
+    assert len(groups) == len(out)
+
+
+def test_passages_of_a_split_answer_are_not_grouped():
+    passages = [dict(program("CSE"), parent_id="p", chunk_id=f"p#{i}") for i in range(2)]
+    out, groups = merge_same_question(passages)
+    assert out == passages
+    assert groups == []
@@ -0,0 +1,93 @@
+import pytest
+
+from retriever import pipeline
+
+
+@pytest.fixture
+def ran(tmp_path, monkeypatch):
+    """Stage names run, in order; stages are stubbed and state goes to tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline, "STATE_DIR", str(tmp_path / "pipeline"))
+    monkeypatch.delenv("EMBEDDING_MODEL_PATH", raising=False)
+    calls = []
+    for stage in pipeline.STAGES:
+        monkeypatch.setattr(stage, "run", lambda dry_run, name=stage.name: calls.append(name) or {})
+    return calls
+
+
+ALL_BUT_BUILD = ["clean", "generate", "chunk", "merge", "index", "bm25", "intent", "facts"]
+
+
+def test_first_run_skips_the_crawl(ran):
+    pipeline.run_pipeline()
+    assert ran == ALL_BUT_BUILD
+
+
+def test_scrape_runs_the_crawl(ran):
+    pipeline.run_pipeline(scrape=True)
+    assert ran == ["build"] + ALL_BUT_BUILD
+
+
+def test_up_to_date_stages_are_skipped(ran):
+    pipeline.run_pipeline()
+    ran.clear()
+    pipeline.run_pipeline()
+    assert ran == []
+
+
+def test_scrape_on_an_up_to_date_tree_only_crawls(ran):
+    pipeline.run_pipeline()
+    ran.clear()
+    pipeline.run_pipeline(scrape=True)
+    assert ran == ["build"]
+
+
+def test_since_forces_the_stage_and_its_downstream(ran):
+    pipeline.run_pipeline()
+    ran.clear()
+    pipeline.run_pipeline(since="chunk")
+    assert ran == ["chunk", "merge", "index", "bm25", "intent"]
+
+
+def test_since_build_crawls_without_scrape(ran):
+    pipeline.run_pipeline()
+    ran.clear()
+    pipeline.run_pipeline(since="build")
+    assert ran == ["build"] + ALL_BUT_BUILD
+
+
+def test_force_rebuilds_everything_but_the_crawl(ran):
+    pipeline.run_pipeline()
+    ran.clear()
+    pipeline.run_pipeline(force=True)
+    assert ran == ALL_BUT_BUILD
+
+
+def test_dry_run_records_nothing(ran, tmp_path):
+    pipeline.run_pipeline(dry_run=True)
+    assert ran == ALL_BUT_BUILD
+    assert not (tmp_path / "pipeline" / "manifest.json").exists()
+
+
+def write(tmp_path, name, text="[]"):
+    data = tmp_path / "data"
+    data.mkdir(exist_ok=True)
+    (data / name).write_text(text)
+
+
+def test_edited_output_reruns_its_stage_and_downstream(ran, tmp_path):
+    pipeline.run_pipeline()
+    ran.clear()
+    write(tmp_path, "faqs_final.json")
+    pipeline.run_pipeline()
+    assert ran == ["merge", "index", "bm25", "intent"]
+
+
+def test_unchanged_output_stops_the_rebuild(ran, tmp_path):
+    pipeline.run_pipeline()
+    ran.clear()
+    # chunk reruns (its output was edited) and so does merge (its input
+    # changed), but the stubbed merge leaves faqs_final.json alone.
+    write(tmp_path, "faqs_chunked.json")
+    pipeline.run_pipeline()
+    assert ran == ["chunk", "merge"]
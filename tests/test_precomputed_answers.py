@@ -0,0 +1,41 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from precomputed_answers import PrecomputedAnswers, faq_groups
+
+FAQS = [
+    {"question": "What programs are offered under Engineering (UG)?", "answer": "B.Tech CSE."},
+    {"question": "What programs are offered under Engineering (PG)?", "answer": "M.Tech CSE."},
+    {"question": "Who are the PhD supervisors at GMU?", "answer": "Dr. A and Dr. B."},
+]
+
+
+@pytest.fixture
+def answers(tmp_path):
+    path = tmp_path / "precomputed_answers.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for g in faq_groups(FAQS).values():
+            f.write(json.dumps({"question": g["question"], "answer": "canned: " + g["question"],
+                                "hash": g["hash"]}) + "\n")
+    vectorizer = TfidfVectorizer(stop_words="english").fit([f["question"] for f in FAQS])
+    snapshot = SimpleNamespace(transform=vectorizer.transform, version="v1",
+                               tfidf=SimpleNamespace(faqs=FAQS))
+    precomputed = PrecomputedAnswers(path=str(path))
+    return lambda query, faq: precomputed.match(query, [faq], snapshot)
+
+
+@pytest.mark.parametrize("query, faq", [
+    ("What is the hostel fee for Engineering UG programs?", FAQS[0]),
+    ("what is the eligibility for engineering pg programs", FAQS[1]),
+    ("What are the PhD admission dates at GMU?", FAQS[2]),
+])
+def test_other_questions_about_the_same_topic_do_not_match(answers, query, faq):
+    assert answers(query, faq) is None
+
+
+def test_rephrased_question_matches(answers):
+    assert answers("Which programs are offered under Engineering UG?", FAQS[0]) == \
+        "canned: " + FAQS[0]["question"]
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from retriever import ranking
+
+
+def results(name, n=2):
+    return [{"id": f"{name}{i}", "question": f"q{i}", "answer": "a", "score": 1.0 - i / 10}
+            for i in range(n)]
+
+
+def retriever(name, delay=0.0, error=None):
+    def search(queries, k):
+        time.sleep(delay)
+        if error:
+            raise error
+        return [results(name) for _ in queries]
+    return ranking.Retriever(name, search, 0.25)
+
+
+def rank(retrievers, **kwargs):
+    kwargs.setdefault("retrieval_budget_ms", 20)
+    kwargs.setdefault("retrieval_timeout_ms", 500)
+    return ranking.rank_many(["query"], {r.name: r for r in retrievers}, **kwargs)[0]
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    monkeypatch.setattr(ranking, "STATS", dict.fromkeys(ranking.STATS, 0))
+    return ranking.STATS
+
+
+def test_failing_single_retriever_gives_no_results(stats):
+    assert rank([retriever("tfidf", error=RuntimeError("boom"))]) == []
+    assert stats["retriever_errors"] == 1
+
+
+def test_failing_retriever_is_dropped(stats):
+    ranked = rank([retriever("tfidf"), retriever("dense", error=RuntimeError("boom"))])
+    assert [c["id"] for c in ranked] == ["tfidf0", "tfidf1"]
+    assert stats["retriever_errors"] == 1
+
+
+def test_slow_retriever_is_dropped_after_the_budget(stats):
+    ranked = rank([retriever("tfidf"), retriever("dense", delay=0.3)])
+    assert {c["id"] for c in ranked} == {"tfidf0", "tfidf1"}
+    assert stats["retriever_timeouts"] == 1
+
+
+def test_first_to_finish_is_used_when_all_miss_the_budget(stats):
+    start = time.monotonic()
+    ranked = rank([retriever("tfidf", delay=0.05), retriever("dense", delay=0.4)])
+    assert {c["id"] for c in ranked} == {"tfidf0", "tfidf1"}
+    assert time.monotonic() - start < 0.3
+
+
+def test_wait_is_capped_by_the_timeout(stats):
+    start = time.monotonic()
+    assert rank([retriever("tfidf", delay=0.5)], retrieval_timeout_ms=100) == []
+    assert time.monotonic() - start < 0.4
+    assert stats["retriever_timeouts"] == 1
+
+
+def test_reranks_in_flight_are_bounded(stats, monkeypatch):
+    monkeypatch.setattr(ranking, "_RERANK_SLOTS", threading.BoundedSemaphore(1))
+    release = threading.Event()
+
+    def stuck(pairs):
+        release.wait(5)
+        return [0.5] * len(pairs)
+
+    rank([retriever("tfidf")], reranker=stuck, rerank_budget_ms=10)
+    assert stats["rerank_timeouts"] == 1
+
+    # The timed-out rerank still holds the only slot.
+    rank([retriever("tfidf")], reranker=stuck, rerank_budget_ms=10)
+    assert stats["rerank_skipped"] == 1
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while not ranking._RERANK_SLOTS.acquire(blocking=False):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    ranking._RERANK_SLOTS.release()
+
+    ranked = rank([retriever("tfidf")], reranker=lambda pairs: [0.1, 0.9])
+    assert [c["id"] for c in ranked] == ["tfidf1", "tfidf0"]
+    assert stats["reranked"] == 1
+
+
+def test_failing_reranker_keeps_the_fused_order(stats):
+    def broken(pairs):
+        raise RuntimeError("boom")
+
+    ranked = rank([retriever("tfidf")], reranker=broken)
+    assert [c["id"] for c in ranked] == ["tfidf0", "tfidf1"]
+    assert stats["rerank_errors"] == 1
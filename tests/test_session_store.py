@@ -0,0 +1,39 @@
+from session_store import SessionStore, rewrite_query
+
+ENGINEERING = "What programs are offered under Engineering (UG)?"
+
+
+def test_self_contained_questions_are_not_rewritten():
+    turns = [(ENGINEERING, "reply")]
+    for message in ("What is the fee structure?", "Is there a hostel?",
+                    "How do I apply for admission to GMU?"):
+        assert rewrite_query(message, turns) == message
+
+
+def test_follow_ups_carry_the_previous_question():
+    turns = [(ENGINEERING, "reply")]
+    assert rewrite_query("and what about PG?", turns) == f"{ENGINEERING} and what about PG?"
+    assert rewrite_query("what are their fees?", turns) == f"{ENGINEERING} what are their fees?"
+
+
+def test_chained_follow_ups_keep_the_topic():
+    turns = [(ENGINEERING, "reply"), ("and what about PG?", "reply")]
+    query = rewrite_query("what are their fees?", turns)
+    assert query == f"{ENGINEERING} and what about PG? what are their fees?"
+
+
+def test_carried_context_is_bounded():
+    turns = [(f"and what about topic {i}?", "reply") for i in range(20)]
+    query = rewrite_query("and PG?", turns)
+    assert len(query.split()) <= 24 + 2
+
+
+def test_store_keeps_the_message_as_typed():
+    store = SessionStore()
+    store.append("sid", ENGINEERING, "reply")
+    query, turns = store.rewrite("sid", "and what about PG?")
+    store.append("sid", "and what about PG?", "reply")
+
+    assert query == f"{ENGINEERING} and what about PG?"
+    assert [user for user, _ in store.history("sid")] == [ENGINEERING, "and what about PG?"]
+    assert store.stats["rewrites"] == 1